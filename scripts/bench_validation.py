@@ -0,0 +1,62 @@
+# Per-row cost of turning normalized invoice rows into InvoiceRow models.
+# Usage: PYTHONPATH=. python scripts/bench_validation.py [rows]
+from __future__ import annotations
+import sys
+import time
+from typing import Callable, List
+from jsonschema import Draft202012Validator
+from src.state import InvoiceRow
+from src.utils.validation import (
+    invoices_from_rows,
+    load_invoice_schema,
+    validate_rows,
+)
+
+
+def build_rows(count: int) -> List[dict]:
+    tags = ["new", "recurring", "vip", "risky"]
+    return [
+        dict(
+            client_name=f"Client {index % 500}",
+            invoice_id=f"INV-{index}",
+            invoice_amount=float(100 + index % 9_000),
+            currency="USD",
+            invoice_issue_date="2025-01-01",
+            days_overdue=index % 120,
+            last_followup_date="2025-02-01" if index % 3 else None,
+            relationship_tag=tags[index % 4],
+            notes="",
+        )
+        for index in range(count)
+    ]
+
+
+def per_row_jsonschema_then_pydantic(rows: List[dict]) -> None:
+    # the original loader: a fresh validator per row, then InvoiceRow(**row)
+    schema = load_invoice_schema()
+    for row in rows:
+        list(Draft202012Validator(schema).iter_errors(row))
+    [InvoiceRow(**row) for row in rows]
+
+
+def column_masks_then_pydantic(rows: List[dict]) -> None:
+    # what the loader does
+    invoices_from_rows(validate_rows(rows).valid_rows)
+
+
+def measure(label: str, func: Callable[[List[dict]], None], rows: List[dict]) -> None:
+    started = time.perf_counter()
+    func(rows)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<36} {elapsed / len(rows) * 1e6:8.2f} us/row")
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    rows = build_rows(count)
+    measure("jsonschema per row + pydantic", per_row_jsonschema_then_pydantic, rows)
+    measure("column masks + pydantic", column_masks_then_pydantic, rows)
+
+
+if __name__ == "__main__":
+    main()
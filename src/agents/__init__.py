@@ -1,11 +1,28 @@
-from .context_agent import run_context_agent
-from .decision_agent import run_decision_agent
-from .message_agent import run_message_agent
-from .control_agent import run_control_agent
+from .context_agent import run_context_agent, run_context_agent_batch
+from .decision_agent import run_decision_agent, run_decision_agent_batch
+from .message_agent import (
+    arun_message_agent,
+    message_call_avoided,
+    needs_message,
+    run_message_agent,
+    run_message_agent_batched,
+    run_message_agent_consolidated,
+)
+from .control_agent import run_control_agent, run_control_agent_batch
+from .batch import iter_batch_states
 
 __all__ = [
     "run_context_agent",
+    "run_context_agent_batch",
     "run_decision_agent",
+    "run_decision_agent_batch",
     "run_message_agent",
+    "arun_message_agent",
+    "run_message_agent_batched",
+    "run_message_agent_consolidated",
+    "needs_message",
+    "message_call_avoided",
     "run_control_agent",
+    "run_control_agent_batch",
+    "iter_batch_states",
 ]
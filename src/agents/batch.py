@@ -0,0 +1,88 @@
+from __future__ import annotations
+from typing import Iterator, Optional
+from src.agents.context_agent import (
+    build_context_summary,
+    build_invoice_status_summary,
+    build_relationship_summary,
+)
+from src.agents.control_agent import decision_control_result
+from src.agents.decision_agent import build_explanation
+from src.state import (
+    FollowupDecision,
+    FollowupState,
+    InvoiceBatch,
+    InvoiceContext,
+    InvoiceSignals,
+)
+from src.state.batch import NO_FOLLOWUP, RISK_LEVELS, TIMINGS, TONES
+
+
+def iter_batch_states(batch: InvoiceBatch) -> Iterator[FollowupState]:
+    for index in range(len(batch)):
+        yield materialize_state(batch, index)
+
+
+def materialize_state(batch: InvoiceBatch, index: int) -> FollowupState:
+    # builds the same FollowupState the per-invoice agents would have produced
+    invoice = batch.invoice(index)
+    state: FollowupState = {"invoice_data": invoice}
+
+    days_since_followup: Optional[int] = None
+    if batch.days_since_followup is not None:
+        days = int(batch.days_since_followup[index])
+        days_since_followup = None if days == NO_FOLLOWUP else days
+
+    context: Optional[InvoiceContext] = None
+    if batch.risk_code is not None:
+        notes_signals = batch.notes_signals[batch.notes_code[index]]
+        risk_level = RISK_LEVELS[batch.risk_code[index]]
+        risk_score = int(batch.risk_score[index])
+        context = InvoiceContext(
+            risk_level=risk_level,
+            relationship_summary=build_relationship_summary(invoice, notes_signals),
+            invoice_status_summary=build_invoice_status_summary(
+                invoice, days_since_followup
+            ),
+            days_since_last_followup=days_since_followup,
+            context_summary=build_context_summary(
+                invoice=invoice,
+                days_since_followup=days_since_followup,
+                notes_signals=notes_signals,
+                risk_level=risk_level,
+                risk_score=risk_score,
+            ),
+        )
+        state["context"] = context
+        state["signals"] = InvoiceSignals(
+            notes=notes_signals,
+            days_since_followup=days_since_followup,
+            risk_level=risk_level,
+            risk_score=risk_score,
+        )
+
+    tone: Optional[str] = None
+    if batch.timing_code is not None:
+        tone = TONES[batch.tone_code[index]]
+        decision = FollowupDecision(
+            followup_required=bool(batch.followup_required[index]),
+            recommended_timing=TIMINGS[batch.timing_code[index]],
+            tone=tone,
+            explanation="",
+        )
+        explanation = build_explanation(
+            invoice=invoice,
+            context=context,
+            days_since_followup=days_since_followup,
+            rules=list(batch.rule_sets[batch.rules_code[index]]),
+            decision=decision,
+        )
+        state["decision"] = decision.model_copy(update={"explanation": explanation})
+
+    if batch.control_passed is not None:
+        cap_code = int(batch.tone_cap_code[index])
+        state["control_decision"] = decision_control_result(
+            passed=bool(batch.control_passed[index]),
+            tone_cap=TONES[cap_code] if cap_code >= 0 else None,
+            tone=tone,
+        )
+    return state
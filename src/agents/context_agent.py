@@ -1,17 +1,22 @@
 from __future__ import annotations
-from dataclasses import dataclass
+from dataclasses import replace
 from datetime import date
-from typing import Iterable, List, Optional, Sequence, Tuple
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
 from src.config import settings
-from src.state import FollowupState, InvoiceContext, InvoiceRow
-
-
-@dataclass(frozen=True)
-class NotesSignals:
-    high: List[str]
-    low: List[str]
-    soften: List[str]
-    no_followup: List[str]
+from src.state import (
+    FollowupState,
+    InvoiceBatch,
+    InvoiceContext,
+    InvoiceRow,
+    InvoiceSignals,
+    NotesSignals,
+)
+from src.state.batch import NO_FOLLOWUP
+from src.agents.risk_scoring import score_risk_batch
+from src.utils.keyword_matcher import KeywordMatcher
 
 
 def run_context_agent(state: FollowupState, today: Optional[date] = None) -> FollowupState:
@@ -42,9 +47,67 @@ def run_context_agent(state: FollowupState, today: Optional[date] = None) -> Fol
 
     next_state = dict(state)
     next_state["context"] = context
+    next_state["signals"] = InvoiceSignals(
+        notes=notes_signals,
+        days_since_followup=days_since_followup,
+        risk_level=risk_level,
+        risk_score=risk_score,
+    )
     return next_state
 
 
+def run_context_agent_batch(
+    batch: InvoiceBatch, today: Optional[date] = None
+) -> InvoiceBatch:
+    days_since_followup = compute_days_since_followup_batch(batch, today=today)
+    notes_code, notes_signals = extract_notes_signals_batch(batch.notes)
+    risk_code, risk_score = compute_risk_level_batch(
+        batch, notes_code, notes_signals
+    )
+    return replace(
+        batch,
+        days_since_followup=days_since_followup,
+        notes_code=notes_code,
+        notes_signals=notes_signals,
+        risk_code=risk_code,
+        risk_score=risk_score,
+    )
+
+
+def compute_days_since_followup_batch(
+    batch: InvoiceBatch, today: Optional[date] = None
+) -> np.ndarray:
+    today_day = np.datetime64(today or date.today(), "D")
+    missing = np.isnat(batch.last_followup_date)
+    delta = (today_day - batch.last_followup_date).astype(np.int64)
+    return np.where(missing, NO_FOLLOWUP, np.maximum(delta, 0))
+
+
+def extract_notes_signals_batch(
+    notes: np.ndarray,
+) -> Tuple[np.ndarray, Tuple[NotesSignals, ...]]:
+    # notes repeat a lot (boilerplate, blanks), extract each distinct one once
+    codes, uniques = pd.factorize(pd.Series(notes, dtype=object))
+    signals = tuple(extract_notes_signals(note) for note in uniques)
+    return codes.astype(np.int32), signals
+
+
+def compute_risk_level_batch(
+    batch: InvoiceBatch,
+    notes_code: np.ndarray,
+    notes_signals: Sequence[NotesSignals],
+) -> Tuple[np.ndarray, np.ndarray]:
+    has_high = np.array([bool(item.high) for item in notes_signals], dtype=bool)
+    has_low = np.array([bool(item.low) for item in notes_signals], dtype=bool)
+    return score_risk_batch(
+        days_overdue=batch.days_overdue,
+        invoice_amount=batch.invoice_amount,
+        relationship_code=batch.relationship_code,
+        has_high_notes=has_high[notes_code],
+        has_low_notes=has_low[notes_code],
+    )
+
+
 def compute_days_since_followup(
     invoice: InvoiceRow, today: Optional[date] = None
 ) -> Optional[int]:
@@ -79,14 +142,11 @@ def compute_risk_level(
 
 
 def extract_notes_signals(notes: str) -> NotesSignals:
-    text = (notes or "").lower()
-    high = _find_keywords(text, settings.RISK_SCORE_NOTES_KEYWORDS["high"])
-    low = _find_keywords(text, settings.RISK_SCORE_NOTES_KEYWORDS["low"])
-    soften = _find_keywords(text, settings.RISK_SCORE_NOTES_KEYWORDS["soften"])
-    no_followup = _find_keywords(
-        text, settings.RISK_SCORE_NOTES_KEYWORDS["no_followup"]
-    )
-    return NotesSignals(high=high, low=low, soften=soften, no_followup=no_followup)
+    return _memoized_notes_signals(notes_matcher(), notes or "")
+
+
+def notes_matcher() -> KeywordMatcher:
+    return _compile_notes_matcher(_notes_settings_key())
 
 
 def build_relationship_summary(invoice: InvoiceRow, notes_signals: NotesSignals) -> str:
@@ -147,12 +207,33 @@ def _score_by_thresholds(
     return rules[-1][1] if rules else 0
 
 
-def _find_keywords(text: str, keywords: Iterable[str]) -> List[str]:
-    found: List[str] = []
-    for keyword in keywords:
-        if keyword in text:
-            found.append(keyword)
-    return found
+@lru_cache(maxsize=settings.NOTES_SIGNALS_CACHE_SIZE)
+def _memoized_notes_signals(matcher: KeywordMatcher, notes: str) -> NotesSignals:
+    # keyed by matcher too, so a settings change never serves stale signals
+    matches = matcher.match(notes)
+    return NotesSignals(
+        high=tuple(matches["high"]),
+        low=tuple(matches["low"]),
+        soften=tuple(matches["soften"]),
+        no_followup=tuple(matches["no_followup"]),
+    )
+
+
+@lru_cache(maxsize=8)
+def _compile_notes_matcher(key: tuple) -> KeywordMatcher:
+    categories, word_boundary = key
+    return KeywordMatcher(dict(categories), word_boundary=word_boundary)
+
+
+def _notes_settings_key() -> tuple:
+    keywords = settings.RISK_SCORE_NOTES_KEYWORDS
+    return (
+        tuple(
+            (category, tuple(keywords.get(category, ())))
+            for category in ("high", "low", "soften", "no_followup")
+        ),
+        settings.RISK_SCORE_NOTES_WORD_BOUNDARY,
+    )
 
 
 def _flatten_notes_flags(
@@ -1,11 +1,23 @@
 from __future__ import annotations
+from dataclasses import replace
 from typing import Iterable, List, Optional
+import numpy as np
 from src.config import settings
-from src.state import ControlResult, FollowupDecision, FollowupMessage, FollowupState, InvoiceRow
+from src.state import (
+    ControlResult,
+    FollowupDecision,
+    FollowupMessage,
+    FollowupState,
+    InvoiceBatch,
+    InvoiceRow,
+)
+from src.state.batch import RELATIONSHIP_TAGS, TONES
+from src.utils.keyword_matcher import StreamingPhraseMatcher
 
 
 
 TONE_ORDER = {"soft": 0, "neutral": 1, "firm": 2}
+NO_TONE_CAP = -1
 
 def run_control_agent(state: FollowupState, stage: str) -> FollowupState:
     if stage not in {"decision", "message"}:
@@ -23,6 +35,55 @@ def run_control_agent(state: FollowupState, stage: str) -> FollowupState:
     return next_state
 
 
+def run_control_agent_batch(batch: InvoiceBatch, stage: str) -> InvoiceBatch:
+    if stage != "decision":
+        raise ValueError(f"Batch control only supports the decision stage: {stage}")
+    if batch.tone_code is None:
+        # every row fails with DECISION_MISSING, like the per-invoice check
+        return replace(
+            batch,
+            control_passed=np.zeros(len(batch), dtype=bool),
+            tone_cap_code=np.full(len(batch), NO_TONE_CAP, dtype=np.int8),
+        )
+
+    tone_cap_code = _resolve_tone_cap_batch(batch)
+    tone_rank = _tone_ranks(TONES)[batch.tone_code]
+    return replace(
+        batch,
+        control_passed=tone_rank <= _cap_ranks(tone_cap_code),
+        tone_cap_code=tone_cap_code,
+    )
+
+
+def decision_control_result(
+    passed: bool, tone_cap: Optional[str], tone: Optional[str]
+) -> ControlResult:
+    # rebuilds the per-invoice ControlResult for a batch row
+    if tone is None:
+        return ControlResult(
+            stage="decision", passed=False, violations=["DECISION_MISSING"]
+        )
+    violations = [] if passed else [f"TONE_CAP_EXCEEDED:cap={tone_cap},tone={tone}"]
+    return ControlResult(stage="decision", passed=passed, violations=violations)
+
+
+def consolidated_tone(states: Iterable[FollowupState]) -> str:
+    # firmest tone requested for any invoice in the group, limited by the
+    # strictest cap of any of them
+    states = list(states)
+    tone = max(
+        (state["decision"].tone for state in states),
+        key=lambda tone: TONE_ORDER.get(tone, -1),
+    )
+    caps = [_resolve_tone_cap(state.get("invoice_data")) for state in states]
+    caps = [cap for cap in caps if cap]
+    if caps:
+        cap = min(caps, key=lambda tone: TONE_ORDER.get(tone, 99))
+        if TONE_ORDER.get(tone, -1) > TONE_ORDER.get(cap, 99):
+            tone = cap
+    return tone
+
+
 def _control_decision(state: FollowupState) -> ControlResult:
     violations: List[str] = []
     decision = state.get("decision")
@@ -58,6 +119,9 @@ def _control_message(state: FollowupState) -> ControlResult:
 
     if message is None:
         violations.append("MESSAGE_MISSING")
+        generation = state.get("generation")
+        if generation is not None and generation.aborted:
+            violations.append(f"STREAM_ABORTED:{generation.aborted[-1]}")
         return ControlResult(stage="message", passed=False, violations=violations)
 
     _validate_required_fields(
@@ -81,6 +145,16 @@ def _control_message(state: FollowupState) -> ControlResult:
     return ControlResult(stage="message", passed=not violations, violations=violations)
 
 
+def message_phrase_matcher() -> StreamingPhraseMatcher:
+    # the phrase checks of the message stage, applied to a draft as it streams
+    return StreamingPhraseMatcher(
+        {
+            "FORBIDDEN_PHRASE": settings.CONTROL_FORBIDDEN_PHRASES,
+            "UNSUPPORTED_CLAIM": settings.CONTROL_UNSUPPORTED_CLAIMS,
+        }
+    )
+
+
 def _validate_required_fields(
     model: object, fields: Iterable[str], violations: List[str], prefix: str
 ) -> None:
@@ -109,6 +183,39 @@ def _resolve_tone_cap(invoice: Optional[InvoiceRow]) -> Optional[str]:
     return min(caps, key=lambda tone: TONE_ORDER.get(tone, 99))
 
 
+def _resolve_tone_cap_batch(batch: InvoiceBatch) -> np.ndarray:
+    tone_code = {tone: code for code, tone in enumerate(TONES)}
+    relationship_caps = np.array(
+        [
+            tone_code.get(
+                settings.CONTROL_TONE_CAPS_BY_RELATIONSHIP.get(tag), NO_TONE_CAP
+            )
+            for tag in RELATIONSHIP_TAGS
+        ],
+        dtype=np.int8,
+    )
+    caps = relationship_caps[batch.relationship_code]
+
+    day_caps = np.full(len(batch), NO_TONE_CAP, dtype=np.int8)
+    unmatched = np.ones(len(batch), dtype=bool)
+    for max_days, tone in settings.CONTROL_TONE_CAPS_BY_DAYS_OVERDUE:
+        hit = unmatched & (batch.days_overdue <= max_days)
+        day_caps[hit] = tone_code.get(tone, NO_TONE_CAP)
+        unmatched &= ~hit
+
+    stricter = _cap_ranks(day_caps) < _cap_ranks(caps)
+    return np.where(stricter, day_caps, caps).astype(np.int8)
+
+
+def _cap_ranks(cap_codes: np.ndarray) -> np.ndarray:
+    ranks = np.append(_tone_ranks(TONES), 99)
+    return ranks[np.where(cap_codes == NO_TONE_CAP, len(TONES), cap_codes)]
+
+
+def _tone_ranks(tones: Iterable[str]) -> np.ndarray:
+    return np.array([TONE_ORDER.get(tone, 99) for tone in tones], dtype=np.int64)
+
+
 def _tone_cap_by_days_overdue(days_overdue: int) -> Optional[str]:
     for max_days, tone in settings.CONTROL_TONE_CAPS_BY_DAYS_OVERDUE:
         if days_overdue <= max_days:
@@ -1,9 +1,23 @@
 from __future__ import annotations
+from dataclasses import replace
 from datetime import date
 from typing import List, Optional, Tuple
+import numpy as np
 from src.config import settings
-from src.state import FollowupDecision, FollowupState, InvoiceContext, InvoiceRow
-from src.agents.context_agent import compute_days_since_followup, extract_notes_signals
+from src.state import (
+    FollowupDecision,
+    FollowupState,
+    InvoiceBatch,
+    InvoiceContext,
+    InvoiceRow,
+)
+from src.agents.context_agent import (
+    compute_days_since_followup,
+    compute_days_since_followup_batch,
+    extract_notes_signals,
+    extract_notes_signals_batch,
+)
+from src.agents.decision_table import DecisionTable, compile_decision_table
 
 
 TONE_RANK = {"soft": 0, "neutral": 1, "firm": 2}
@@ -12,10 +26,15 @@ TONE_RANK = {"soft": 0, "neutral": 1, "firm": 2}
 def run_decision_agent(state: FollowupState, today: Optional[date] = None) -> FollowupState:
     invoice = state["invoice_data"]
     context = state.get("context")
-    days_since_followup = _resolve_days_since_followup(
-        invoice, context, today=today
-    )
-    notes_signals = extract_notes_signals(invoice.notes)
+    signals = state.get("signals")
+    if signals is not None:
+        days_since_followup = signals.days_since_followup
+        notes_signals = signals.notes
+    else:
+        days_since_followup = _resolve_days_since_followup(
+            invoice, context, today=today
+        )
+        notes_signals = extract_notes_signals(invoice.notes)
 
     decision, rules = determine_decision(
         invoice=invoice,
@@ -44,38 +63,57 @@ def run_decision_agent(state: FollowupState, today: Optional[date] = None) -> Fo
     return next_state
 
 
+def run_decision_agent_batch(
+    batch: InvoiceBatch, today: Optional[date] = None
+) -> InvoiceBatch:
+    days_since_followup = batch.days_since_followup
+    if days_since_followup is None:
+        days_since_followup = compute_days_since_followup_batch(batch, today=today)
+    notes_code, notes_signals = batch.notes_code, batch.notes_signals
+    if notes_code is None or notes_signals is None:
+        notes_code, notes_signals = extract_notes_signals_batch(batch.notes)
+    soften = np.array([bool(item.soften) for item in notes_signals], dtype=bool)
+    no_followup = np.array(
+        [bool(item.no_followup) for item in notes_signals], dtype=bool
+    )
+
+    table = decision_table()
+    index = table.index_batch(
+        days_overdue=batch.days_overdue,
+        relationship_code=batch.relationship_code,
+        risk_code=batch.risk_code,
+        days_since_followup=days_since_followup,
+        soften=soften[notes_code],
+        no_followup=no_followup[notes_code],
+    )
+
+    return replace(
+        batch,
+        days_since_followup=days_since_followup,
+        notes_code=notes_code,
+        notes_signals=notes_signals,
+        followup_required=table.followup_required[index],
+        timing_code=table.timing_code[index],
+        tone_code=table.tone_code[index],
+        rules_code=table.rules_code[index],
+        rule_sets=table.rule_sets,
+    )
+
+
 def determine_decision(
     invoice: InvoiceRow,
     context: Optional[InvoiceContext],
     days_since_followup: Optional[int],
     notes_signals,
 ) -> Tuple[FollowupDecision, List[str]]:
-    rules: List[str] = []
-
-    if notes_signals.no_followup:
-        rules.append("NO_FOLLOWUP_KEYWORD")
-        decision = FollowupDecision(
-            followup_required=False,
-            recommended_timing="skip",
-            tone="soft",
-            explanation="",
-        )
-        return decision, rules
-
-    if invoice.days_overdue <= 0:
-        rules.append("NOT_OVERDUE")
-        decision = FollowupDecision(
-            followup_required=False,
-            recommended_timing="skip",
-            tone="soft",
-            explanation="",
-        )
-        return decision, rules
-
-    followup_required = True
-    timing = determine_timing(invoice, context, days_since_followup, rules)
-    tone = determine_tone(invoice, context, notes_signals, rules)
-
+    followup_required, timing, tone, rules = decision_table().lookup(
+        days_overdue=invoice.days_overdue,
+        relationship_tag=invoice.relationship_tag,
+        risk_level=context.risk_level if context else None,
+        days_since_followup=days_since_followup,
+        soften=bool(notes_signals.soften),
+        no_followup=bool(notes_signals.no_followup),
+    )
     decision = FollowupDecision(
         followup_required=followup_required,
         recommended_timing=timing,
@@ -85,11 +123,68 @@ def determine_decision(
     return decision, rules
 
 
+def decision_table() -> DecisionTable:
+    return compile_decision_table(decide)
+
+
+def decide(
+    days_overdue: int,
+    relationship_tag: str,
+    risk_level: Optional[str],
+    days_since_followup: Optional[int],
+    soften: bool,
+    no_followup: bool,
+) -> Tuple[bool, str, str, List[str]]:
+    # the branching reference; decision_table() enumerates it once per
+    # settings version and the agents only look results up
+    rules: List[str] = []
+
+    if no_followup:
+        rules.append("NO_FOLLOWUP_KEYWORD")
+        return False, "skip", "soft", rules
+
+    if days_overdue <= 0:
+        rules.append("NOT_OVERDUE")
+        return False, "skip", "soft", rules
+
+    timing = _timing_for(days_overdue, risk_level, days_since_followup, rules)
+    tone = _tone_for(relationship_tag, risk_level, soften, rules)
+    return True, timing, tone, rules
+
+
 def determine_timing(
     invoice: InvoiceRow,
     context: Optional[InvoiceContext],
     days_since_followup: Optional[int],
     rules: List[str],
+) -> str:
+    return _timing_for(
+        invoice.days_overdue,
+        context.risk_level if context else None,
+        days_since_followup,
+        rules,
+    )
+
+
+def determine_tone(
+    invoice: InvoiceRow,
+    context: Optional[InvoiceContext],
+    notes_signals,
+    rules: List[str],
+) -> str:
+    return _tone_for(
+        invoice.relationship_tag,
+        context.risk_level if context else None,
+        bool(notes_signals.soften),
+        rules,
+    )
+
+
+def _timing_for(
+    days_overdue: int,
+    risk_level: Optional[str],
+    days_since_followup: Optional[int],
+    rules: List[str],
 ) -> str:
     timing_rules = settings.FOLLOWUP_TIMING_RULES
     min_gap = timing_rules["min_days_between_followups"]
@@ -105,15 +200,15 @@ def determine_timing(
             else "wait_7_days"
         )
 
-    if invoice.days_overdue >= urgent_days:
+    if days_overdue >= urgent_days:
         rules.append("URGENT_OVERDUE")
         return "now"
 
-    if context and context.risk_level == "high":
+    if risk_level == "high":
         rules.append("RISK_HIGH_TIMING")
         return "now"
 
-    if invoice.days_overdue >= standard_days:
+    if days_overdue >= standard_days:
         rules.append("STANDARD_OVERDUE")
         return "now"
 
@@ -121,23 +216,23 @@ def determine_timing(
     return "wait_3_days"
 
 
-def determine_tone(
-    invoice: InvoiceRow,
-    context: Optional[InvoiceContext],
-    notes_signals,
+def _tone_for(
+    relationship_tag: str,
+    risk_level: Optional[str],
+    soften: bool,
     rules: List[str],
 ) -> str:
-    risk_level = context.risk_level if context else "medium"
+    risk_level = risk_level or "medium"
     tone = _tone_from_risk(risk_level)
 
-    if invoice.relationship_tag in {"vip", "new"}:
+    if relationship_tag in {"vip", "new"}:
         if risk_level == "high":
             tone = "neutral"
             rules.append("RELATIONSHIP_SOFTEN_HIGH")
         else:
             tone = "soft"
             rules.append("RELATIONSHIP_SOFTEN")
-    elif invoice.relationship_tag == "risky":
+    elif relationship_tag == "risky":
         if risk_level == "low":
             tone = "neutral"
             rules.append("RELATIONSHIP_FIRM_LOW")
@@ -145,7 +240,7 @@ def determine_tone(
             tone = "firm"
             rules.append("RELATIONSHIP_FIRM")
 
-    if notes_signals.soften:
+    if soften:
         if tone == "firm":
             tone = "neutral"
             rules.append("SOFTEN_NOTES_DOWNGRADE")
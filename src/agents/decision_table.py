@@ -0,0 +1,156 @@
+from __future__ import annotations
+from bisect import bisect_right
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import product
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from src.config import settings
+from src.state.batch import NO_FOLLOWUP, RELATIONSHIP_TAGS, RISK_LEVELS, TIMINGS, TONES
+
+# risk axis: code 0 is "no context", then RISK_LEVELS shifted by one
+RISK_AXIS: Tuple[Optional[str], ...] = (None, *RISK_LEVELS)
+
+Decide = Callable[..., Tuple[bool, str, str, List[str]]]
+
+
+@dataclass(frozen=True)
+class DecisionTable:
+    # every array is indexed by
+    # [no_followup, soften, days_bucket, followup_bucket, risk, relationship];
+    # followup bucket 0 means no previous follow-up
+    days_breaks: Tuple[int, ...]
+    followup_breaks: Tuple[int, ...]
+    followup_required: np.ndarray
+    timing_code: np.ndarray
+    tone_code: np.ndarray
+    rules_code: np.ndarray
+    rule_sets: Tuple[Tuple[str, ...], ...]
+
+    def lookup(
+        self,
+        days_overdue: int,
+        relationship_tag: str,
+        risk_level: Optional[str],
+        days_since_followup: Optional[int],
+        soften: bool,
+        no_followup: bool,
+    ) -> Tuple[bool, str, str, List[str]]:
+        key = (
+            int(no_followup),
+            int(soften),
+            bisect_right(self.days_breaks, days_overdue),
+            0
+            if days_since_followup is None
+            else 1 + bisect_right(self.followup_breaks, days_since_followup),
+            RISK_AXIS.index(risk_level),
+            RELATIONSHIP_TAGS.index(relationship_tag),
+        )
+        return (
+            bool(self.followup_required[key]),
+            TIMINGS[self.timing_code[key]],
+            TONES[self.tone_code[key]],
+            list(self.rule_sets[self.rules_code[key]]),
+        )
+
+    def index_batch(
+        self,
+        days_overdue: np.ndarray,
+        relationship_code: np.ndarray,
+        risk_code: Optional[np.ndarray],
+        days_since_followup: np.ndarray,
+        soften: np.ndarray,
+        no_followup: np.ndarray,
+    ) -> Tuple[np.ndarray, ...]:
+        # risk_code uses RISK_LEVELS codes (None when there is no context) and
+        # days_since_followup uses NO_FOLLOWUP for missing values
+        followup_bucket = 1 + np.searchsorted(
+            np.asarray(self.followup_breaks, dtype=np.int64),
+            days_since_followup,
+            side="right",
+        )
+        followup_bucket[days_since_followup == NO_FOLLOWUP] = 0
+        risk = (
+            np.zeros(len(days_overdue), dtype=np.intp)
+            if risk_code is None
+            else risk_code.astype(np.intp) + 1
+        )
+        return (
+            no_followup.astype(np.intp),
+            soften.astype(np.intp),
+            np.searchsorted(
+                np.asarray(self.days_breaks, dtype=np.int64), days_overdue, side="right"
+            ),
+            followup_bucket,
+            risk,
+            relationship_code.astype(np.intp),
+        )
+
+
+def compile_decision_table(decide: Decide) -> DecisionTable:
+    return _compile_decision_table(decide, _settings_key())
+
+
+@lru_cache(maxsize=8)
+def _compile_decision_table(decide: Decide, key: tuple) -> DecisionTable:
+    timing_rules = dict(key)
+    min_gap = timing_rules["min_days_between_followups"]
+    # the branches only compare days_overdue against these values (<= 0 is
+    # the same as < 1), so each bucket decides like its lowest member
+    days_breaks = tuple(
+        sorted(
+            {
+                1,
+                timing_rules["standard_days_overdue"],
+                timing_rules["urgent_days_overdue"],
+            }
+        )
+    )
+    followup_breaks = tuple(
+        sorted({min_gap - timing_rules["wait_short_days"], min_gap})
+    )
+    days_values = [days_breaks[0] - 1, *days_breaks]
+    followup_values = [None, followup_breaks[0] - 1, *followup_breaks]
+
+    shape = (
+        2,
+        2,
+        len(days_values),
+        len(followup_values),
+        len(RISK_AXIS),
+        len(RELATIONSHIP_TAGS),
+    )
+    followup_required = np.zeros(shape, dtype=bool)
+    timing_code = np.zeros(shape, dtype=np.int8)
+    tone_code = np.zeros(shape, dtype=np.int8)
+    rules_code = np.zeros(shape, dtype=np.int32)
+    rule_sets: Dict[Tuple[str, ...], int] = {}
+    for index in product(*(range(size) for size in shape)):
+        no_followup, soften, days, followup, risk, relationship = index
+        required, timing, tone, rules = decide(
+            days_overdue=days_values[days],
+            relationship_tag=RELATIONSHIP_TAGS[relationship],
+            risk_level=RISK_AXIS[risk],
+            days_since_followup=followup_values[followup],
+            soften=bool(soften),
+            no_followup=bool(no_followup),
+        )
+        followup_required[index] = required
+        timing_code[index] = TIMINGS.index(timing)
+        tone_code[index] = TONES.index(tone)
+        rules_code[index] = rule_sets.setdefault(tuple(rules), len(rule_sets))
+
+    return DecisionTable(
+        days_breaks=days_breaks,
+        followup_breaks=followup_breaks,
+        followup_required=followup_required,
+        timing_code=timing_code,
+        tone_code=tone_code,
+        rules_code=rules_code,
+        rule_sets=tuple(rule_sets),
+    )
+
+
+def _settings_key() -> tuple:
+    # settings are plain module globals, so recompile whenever they change
+    return tuple(sorted(settings.FOLLOWUP_TIMING_RULES.items()))
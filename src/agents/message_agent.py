@@ -1,11 +1,20 @@
 from __future__ import annotations
 import json
 import logging
-from typing import Any, Optional
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    BadRequestError,
+    RateLimitError,
+)
 from pydantic import ValidationError
 from tenacity import (
+    RetryCallState,
     before_sleep_log,
     retry,
     retry_if_exception_type,
@@ -13,37 +22,463 @@ from tenacity import (
     wait_exponential,
 )
 from src.config import prompts, settings
-from src.state import FollowupMessage, FollowupState
+from src.agents.control_agent import consolidated_tone, message_phrase_matcher
+from src.agents.templates import render_template_message
+from src.io.draft_cache import DraftCache, draft_key
+from src.state import DraftGeneration, FollowupMessage, FollowupState
+from src.utils.llm_client import (
+    disable_structured_output,
+    get_chat_model,
+    get_structured_model,
+)
+from src.utils.rate_limit import estimate_tokens, get_rate_limiter, retry_after_seconds
 
 logger = logging.getLogger(__name__)
 
 
+# llm: always draft with the model; hybrid: templates for standard cases and
+# the model for the rest; templates: never call the model
+LLM_POLICIES = ("llm", "hybrid", "templates")
+
+
 class MessageGenerationError(RuntimeError):
     pass
 
 
-def run_message_agent(state: FollowupState) -> FollowupState:
+class DraftAbortedError(MessageGenerationError):
+    def __init__(self, violation: str) -> None:
+        super().__init__(f"Draft stream aborted on {violation}")
+        self.violation = violation
+
+
+class GenerationStats:
+    # per-run counters: drafts taken from structured output or parsed from
+    # free text, responses that failed to parse, retried requests and streams
+    # cut off by a control phrase
+    FIELDS = (
+        "structured",
+        "parsed_from_text",
+        "parse_failures",
+        "retries",
+        "stream_aborts",
+    )
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            for field in self.FIELDS:
+                setattr(self, field, 0)
+
+    def record(self, field: str, count: int = 1) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + count)
+
+
+generation_stats = GenerationStats()
+
+
+class RateLimitedError(MessageGenerationError):
+    def __init__(self, message: str, retry_after: Optional[float]) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TransientAPIError(MessageGenerationError):
+    # connection resets, timeouts and 5xx responses on the async path, where
+    # the SDK's own retries are off
+    pass
+
+
+def run_message_agent(
+    state: FollowupState,
+    cache: Optional[DraftCache] = None,
+    policy: str = "llm",
+    stream: bool = False,
+) -> FollowupState:
+    input_json = build_message_input(state)
+    if input_json is None:
+        return state
+    if policy != "llm":
+        template = render_template_message(state)
+        if template is not None:
+            return _with_message(state, template)
+        if policy == "templates":
+            return state
+
+    key = draft_key(input_json) if cache is not None else None
+    message = cache.get(key) if cache is not None else None
+    if message is not None:
+        return _with_message(state, message)
+    if not stream:
+        message = _generate_message(input_json=input_json)
+        if cache is not None:
+            cache.put(key, message)
+        return _with_message(state, message)
+
+    generation = DraftGeneration()
+    try:
+        message = _generate_message(input_json=input_json, generation=generation)
+    except DraftAbortedError:
+        # every attempt ran into a control phrase; control reports the
+        # missing draft together with the last violation
+        return _with_generation(state, generation)
+    if cache is not None:
+        cache.put(key, message)
+    return _with_generation(_with_message(state, message), generation)
+
+
+async def arun_message_agent(
+    state: FollowupState,
+    cache: Optional[DraftCache] = None,
+    policy: str = "llm",
+    stream: bool = False,
+) -> FollowupState:
+    input_json = build_message_input(state)
+    if input_json is None:
+        return state
+    if policy != "llm":
+        template = render_template_message(state)
+        if template is not None:
+            return _with_message(state, template)
+        if policy == "templates":
+            return state
+
+    key = draft_key(input_json) if cache is not None else None
+    message = await cache.aget(key) if cache is not None else None
+    if message is not None:
+        return _with_message(state, message)
+    if not stream:
+        message = await _agenerate_message(input_json=input_json)
+        if cache is not None:
+            await cache.aput(key, message)
+        return _with_message(state, message)
+
+    generation = DraftGeneration()
+    try:
+        message = await _agenerate_message(
+            input_json=input_json, generation=generation
+        )
+    except DraftAbortedError:
+        return _with_generation(state, generation)
+    if cache is not None:
+        await cache.aput(key, message)
+    return _with_generation(_with_message(state, message), generation)
+
+
+def run_message_agent_batched(
+    states: Sequence[FollowupState],
+    cache: Optional[DraftCache] = None,
+    max_items: int = 10,
+    policy: str = "llm",
+) -> List[FollowupState]:
+    # packs up to max_items drafts into each request, fewer when the token
+    # budget runs out; the escalation thresholds are sent once per request
+    results = list(states)
+    pending: List[Tuple[int, Optional[str], dict]] = []
+    for position, state in enumerate(states):
+        payload = _message_payload(state)
+        if payload is None:
+            continue
+        if policy != "llm":
+            template = render_template_message(state)
+            if template is not None:
+                results[position] = _with_message(state, template)
+                continue
+            if policy == "templates":
+                continue
+        payload.pop("escalation_thresholds")
+        key = None
+        if cache is not None:
+            # the thresholds go into the request once, so they are keyed
+            # separately from the item
+            key = draft_key(
+                json.dumps([payload, settings.ESCALATION_THRESHOLDS], default=str),
+                prompts.MESSAGE_AGENT_BATCH_SYSTEM_PROMPT,
+                prompts.MESSAGE_AGENT_BATCH_USER_PROMPT,
+            )
+            message = cache.get(key)
+            if message is not None:
+                results[position] = _with_message(state, message)
+                continue
+        pending.append((position, key, payload))
+
+    items = [
+        json.dumps({"id": str(index), **payload}, default=str)
+        for index, (_, _, payload) in enumerate(pending)
+    ]
+    for group in plan_message_batches(items, max_items):
+        drafted = _generate_message_group(
+            [(str(index), items[index]) for index in group]
+        )
+        # the group's valid drafts are kept (and cached) before items that
+        # never came back are drafted on their own
+        missing = []
+        for index in group:
+            message = drafted.get(str(index))
+            if message is None:
+                missing.append(index)
+                continue
+            _store_batched_draft(results, states, pending[index], cache, message)
+        for index in missing:
+            position = pending[index][0]
+            results[position] = _draft_on_its_own(states[position], cache)
+    return results
+
+
+def _store_batched_draft(
+    results: List[FollowupState],
+    states: Sequence[FollowupState],
+    item: Tuple[int, Optional[str], dict],
+    cache: Optional[DraftCache],
+    message: FollowupMessage,
+) -> None:
+    position, key, _ = item
+    if cache is not None:
+        cache.put(key, message)
+    results[position] = _with_message(states[position], message)
+
+
+def _draft_on_its_own(
+    state: FollowupState, cache: Optional[DraftCache]
+) -> FollowupState:
+    # drafted with the single-invoice prompt, so it is cached under that
+    # prompt's key and not the batch one
+    input_json = build_message_input(state)
+    key = draft_key(input_json) if cache is not None else None
+    message = cache.get(key) if cache is not None else None
+    if message is None:
+        message = _generate_message(input_json=input_json)
+        if cache is not None:
+            cache.put(key, message)
+    return _with_message(state, message)
+
+
+def run_message_agent_consolidated(
+    states: Sequence[FollowupState],
+    cache: Optional[DraftCache] = None,
+    policy: str = "llm",
+) -> List[FollowupState]:
+    # one draft per client and timing covering all of the client's invoices,
+    # attached to every invoice of the group
+    results = list(states)
+    for group in group_message_states(states):
+        if len(group) == 1 or policy == "templates":
+            for position in group:
+                results[position] = run_message_agent(
+                    states[position], cache=cache, policy=policy
+                )
+            continue
+        input_json = build_consolidated_message_input([states[p] for p in group])
+        key = None
+        message = None
+        if cache is not None:
+            key = draft_key(
+                input_json,
+                prompts.MESSAGE_AGENT_SYSTEM_PROMPT,
+                prompts.MESSAGE_AGENT_CONSOLIDATED_USER_PROMPT,
+            )
+            message = cache.get(key)
+        if message is None:
+            message = _generate_consolidated_message(input_json)
+            if cache is not None:
+                cache.put(key, message)
+        for position in group:
+            results[position] = _with_message(states[position], message)
+    return results
+
+
+def group_message_states(states: Sequence[FollowupState]) -> List[List[int]]:
+    # positions of the states that need a draft, grouped by client and timing
+    # in order of first appearance
+    groups: Dict[Tuple[str, str], List[int]] = {}
+    for position, state in enumerate(states):
+        if needs_message(state):
+            key = (
+                state["invoice_data"].client_name,
+                state["decision"].recommended_timing,
+            )
+            groups.setdefault(key, []).append(position)
+    return list(groups.values())
+
+
+def build_consolidated_message_input(states: Sequence[FollowupState]) -> str:
+    first = states[0]
+    totals: Dict[str, float] = {}
+    for state in states:
+        invoice = state["invoice_data"]
+        totals[invoice.currency] = round(
+            totals.get(invoice.currency, 0.0) + invoice.invoice_amount, 2
+        )
+    payload = {
+        "client_name": first["invoice_data"].client_name,
+        "relationship_tag": first["invoice_data"].relationship_tag,
+        "invoices": [
+            {
+                "invoice": _model_to_dict(state["invoice_data"]),
+                "context": _model_to_dict(state.get("context")),
+            }
+            for state in states
+        ],
+        "totals": totals,
+        "decision": {
+            "followup_required": True,
+            "recommended_timing": first["decision"].recommended_timing,
+            "tone": consolidated_tone(states),
+        },
+        "escalation_thresholds": settings.ESCALATION_THRESHOLDS,
+    }
+    return json.dumps(payload, default=str)
+
+
+def plan_message_batches(
+    items: Sequence[str], max_items: int, token_budget: Optional[int] = None
+) -> List[List[int]]:
+    budget = token_budget or settings.LLM_BATCH_TOKEN_BUDGET
+    overhead = estimate_tokens(
+        prompts.MESSAGE_AGENT_BATCH_SYSTEM_PROMPT
+        + prompts.MESSAGE_AGENT_BATCH_USER_PROMPT
+        + json.dumps(settings.ESCALATION_THRESHOLDS)
+    )
+    groups: List[List[int]] = []
+    group: List[int] = []
+    used = overhead
+    for index, item in enumerate(items):
+        cost = estimate_tokens(item, settings.LLM_MESSAGE_COMPLETION_TOKENS_ESTIMATE)
+        if group and (len(group) >= max_items or used + cost > budget):
+            groups.append(group)
+            group, used = [], overhead
+        group.append(index)
+        used += cost
+    if group:
+        groups.append(group)
+    return groups
+
+
+def _with_message(state: FollowupState, message: FollowupMessage) -> FollowupState:
+    next_state = dict(state)
+    next_state["message"] = message
+    return next_state
+
+
+def _with_generation(
+    state: FollowupState, generation: DraftGeneration
+) -> FollowupState:
+    next_state = dict(state)
+    next_state["generation"] = generation
+    return next_state
+
+
+def build_message_input(state: FollowupState) -> Optional[str]:
+    payload = _message_payload(state)
+    if payload is None:
+        return None
+    return json.dumps(payload, default=str)
+
+
+def message_request_body(input_json: str) -> dict:
+    # chat completions body equivalent to what _generate_message sends, for
+    # offline batch submission
+    return {
+        "model": settings.LLM_MESSAGE_MODEL,
+        "temperature": settings.LLM_MESSAGE_TEMPERATURE,
+        "messages": [
+            {"role": "system", "content": prompts.MESSAGE_AGENT_SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": prompts.MESSAGE_AGENT_USER_PROMPT.format(
+                    input_json=input_json
+                ),
+            },
+        ],
+    }
+
+
+def message_from_content(content: str) -> FollowupMessage:
+    return _parse_message(SimpleNamespace(content=content))
+
+
+def needs_message(state: FollowupState) -> bool:
     decision = state.get("decision")
     if decision is None:
         raise ValueError("Message agent requires decision in state.")
 
     if not decision.followup_required or decision.recommended_timing == "skip":
-        return state
+        return False
+    # the report withholds drafts whose decision failed control, so they are
+    # never generated
+    control = state.get("control_decision")
+    return control is None or control.passed
+
+
+def message_call_avoided(state: FollowupState) -> bool:
+    decision = state.get("decision")
+    control = state.get("control_decision")
+    return bool(
+        decision
+        and decision.followup_required
+        and decision.recommended_timing != "skip"
+        and control is not None
+        and not control.passed
+    )
 
+
+def _message_payload(state: FollowupState) -> Optional[dict]:
+    if not needs_message(state):
+        return None
+
+    decision = state["decision"]
     invoice = state["invoice_data"]
     context = state.get("context")
-    input_payload = {
+    return {
         "invoice": _model_to_dict(invoice),
         "context": _model_to_dict(context),
         "decision": _model_to_dict(decision),
         "escalation_thresholds": settings.ESCALATION_THRESHOLDS,
     }
-    input_json = json.dumps(input_payload, default=str)
 
-    message = _generate_message(input_json=input_json)
-    next_state = dict(state)
-    next_state["message"] = message
-    return next_state
+
+_exponential_wait = wait_exponential(
+    min=settings.LLM_MESSAGE_BACKOFF_MIN_SECONDS,
+    max=settings.LLM_MESSAGE_BACKOFF_MAX_SECONDS,
+)
+
+
+def _backoff_wait(retry_state: RetryCallState) -> float:
+    # after a rate limit the shared limiter already holds every request back
+    # until Retry-After has passed, and an aborted stream is simply sampled
+    # again, so only other failures back off here
+    exc = retry_state.outcome.exception() if retry_state.outcome else None
+    if isinstance(exc, (RateLimitedError, DraftAbortedError)):
+        return 0.0
+    return _exponential_wait(retry_state)
+
+
+_log_retry = before_sleep_log(logger, logging.WARNING)
+
+
+def _before_retry(retry_state: RetryCallState) -> None:
+    generation_stats.record("retries")
+    _log_retry(retry_state)
+
+
+@retry(
+    retry=retry_if_exception_type(MessageGenerationError),
+    stop=stop_after_attempt(settings.LLM_MESSAGE_MAX_RETRIES),
+    wait=_backoff_wait,
+    before_sleep=_before_retry,
+    reraise=True,
+)
+def _generate_message(
+    input_json: str, generation: Optional[DraftGeneration] = None
+) -> FollowupMessage:
+    llm = get_chat_model()
+    messages = _build_messages(input_json)
+    if generation is not None:
+        return _stream_message_model(llm, messages, generation)
+    return _invoke_message_model(llm, messages)
 
 
 @retry(
@@ -53,27 +488,243 @@ def run_message_agent(state: FollowupState) -> FollowupState:
         min=settings.LLM_MESSAGE_BACKOFF_MIN_SECONDS,
         max=settings.LLM_MESSAGE_BACKOFF_MAX_SECONDS,
     ),
-    before_sleep=before_sleep_log(logger, logging.WARNING),
+    before_sleep=_before_retry,
+    reraise=True,
+)
+def _generate_consolidated_message(input_json: str) -> FollowupMessage:
+    llm = get_chat_model()
+    return _invoke_message_model(
+        llm,
+        _build_messages(input_json, prompts.MESSAGE_AGENT_CONSOLIDATED_USER_PROMPT),
+    )
+
+
+@retry(
+    retry=retry_if_exception_type(MessageGenerationError),
+    stop=stop_after_attempt(settings.LLM_MESSAGE_MAX_RETRIES),
+    wait=_backoff_wait,
+    before_sleep=_before_retry,
     reraise=True,
 )
-def _generate_message(input_json: str) -> FollowupMessage:
-    llm = ChatOpenAI(
-        model=settings.LLM_MESSAGE_MODEL,
-        temperature=settings.LLM_MESSAGE_TEMPERATURE,
+async def _agenerate_message(
+    input_json: str, generation: Optional[DraftGeneration] = None
+) -> FollowupMessage:
+    llm = get_chat_model(max_retries=0)
+    messages = _build_messages(input_json)
+    limiter = get_rate_limiter()
+    await limiter.acquire(
+        estimate_tokens(
+            "".join(message.content for message in messages),
+            settings.LLM_MESSAGE_COMPLETION_TOKENS_ESTIMATE,
+        )
     )
-    messages = [
+    try:
+        if generation is not None:
+            return await _astream_message_model(llm, messages, generation)
+        return await _ainvoke_message_model(llm, messages)
+    except RateLimitError as exc:
+        retry_after = retry_after_seconds(exc.response.headers)
+        limiter.pause(
+            retry_after
+            if retry_after is not None
+            else settings.LLM_MESSAGE_BACKOFF_MIN_SECONDS
+        )
+        raise RateLimitedError(str(exc), retry_after) from exc
+    except APIConnectionError as exc:
+        # includes APITimeoutError; retried with backoff, and the next attempt
+        # goes through the limiter again
+        raise TransientAPIError(str(exc)) from exc
+    except APIStatusError as exc:
+        if exc.status_code < 500:
+            raise
+        raise TransientAPIError(str(exc)) from exc
+
+
+def _invoke_message_model(llm: Any, messages: list) -> FollowupMessage:
+    structured = get_structured_model(llm, FollowupMessage)
+    if structured is not None:
+        try:
+            return _message_from_structured(structured.invoke(messages))
+        except BadRequestError as exc:
+            _structured_output_rejected(llm, exc)
+    return _parse_message(llm.invoke(messages))
+
+
+async def _ainvoke_message_model(llm: Any, messages: list) -> FollowupMessage:
+    structured = get_structured_model(llm, FollowupMessage)
+    if structured is not None:
+        try:
+            return _message_from_structured(await structured.ainvoke(messages))
+        except BadRequestError as exc:
+            _structured_output_rejected(llm, exc)
+    return _parse_message(await llm.ainvoke(messages))
+
+
+def _stream_message_model(
+    llm: Any, messages: list, generation: DraftGeneration
+) -> FollowupMessage:
+    generation.attempts += 1
+    matcher = message_phrase_matcher()
+    started = time.monotonic()
+    first_byte = None
+    parts: List[str] = []
+    stream = llm.stream(messages)
+    try:
+        for chunk in stream:
+            if not isinstance(chunk.content, str) or not chunk.content:
+                continue
+            if first_byte is None:
+                first_byte = time.monotonic() - started
+            parts.append(chunk.content)
+            _check_stream(matcher.feed(chunk.content), generation)
+    finally:
+        # closing the generator drops the HTTP response, which also stops the
+        # completion on the server side
+        stream.close()
+    generation.first_byte_seconds = first_byte
+    return _parse_message(SimpleNamespace(content="".join(parts)))
+
+
+async def _astream_message_model(
+    llm: Any, messages: list, generation: DraftGeneration
+) -> FollowupMessage:
+    generation.attempts += 1
+    matcher = message_phrase_matcher()
+    started = time.monotonic()
+    first_byte = None
+    parts: List[str] = []
+    stream = llm.astream(messages)
+    try:
+        async for chunk in stream:
+            if not isinstance(chunk.content, str) or not chunk.content:
+                continue
+            if first_byte is None:
+                first_byte = time.monotonic() - started
+            parts.append(chunk.content)
+            _check_stream(matcher.feed(chunk.content), generation)
+    finally:
+        await stream.aclose()
+    generation.first_byte_seconds = first_byte
+    return _parse_message(SimpleNamespace(content="".join(parts)))
+
+
+def _check_stream(
+    hit: Optional[Tuple[str, str]], generation: DraftGeneration
+) -> None:
+    if hit is None:
+        return
+    violation = f"{hit[0]}:{hit[1]}"
+    generation.aborted.append(violation)
+    generation_stats.record("stream_aborts")
+    raise DraftAbortedError(violation)
+
+
+def _message_from_structured(result: dict) -> FollowupMessage:
+    parsed = result.get("parsed")
+    if isinstance(parsed, FollowupMessage):
+        generation_stats.record("structured")
+        return parsed
+    # refusals and truncated output still go through the text parser
+    logger.warning("Structured output unavailable: %s", result.get("parsing_error"))
+    return _parse_message(result["raw"])
+
+
+def _structured_output_rejected(llm: Any, exc: BadRequestError) -> None:
+    # only a backend without response_format support falls back to free text
+    # for the rest of the process; other bad requests are real errors
+    if exc.param != "response_format":
+        raise exc
+    logger.warning("Backend rejected structured output, parsing text: %s", exc)
+    disable_structured_output(llm, FollowupMessage)
+
+
+def _generate_message_group(
+    items: List[Tuple[str, str]],
+) -> Dict[str, FollowupMessage]:
+    # items that come back missing or invalid are re-requested on their own
+    # next attempt; items that already validated are kept. Items still
+    # missing after the last attempt are left out of the result
+    remaining = dict(items)
+    drafted: Dict[str, FollowupMessage] = {}
+    for attempt in range(settings.LLM_MESSAGE_MAX_RETRIES):
+        if attempt:
+            generation_stats.record("retries")
+            time.sleep(
+                min(
+                    settings.LLM_MESSAGE_BACKOFF_MIN_SECONDS * 2 ** (attempt - 1),
+                    settings.LLM_MESSAGE_BACKOFF_MAX_SECONDS,
+                )
+            )
+        try:
+            drafted.update(_request_message_batch(remaining))
+        except MessageGenerationError as exc:
+            generation_stats.record("parse_failures")
+            logger.warning("Batched draft request failed: %s", exc)
+        remaining = {
+            item_id: item
+            for item_id, item in remaining.items()
+            if item_id not in drafted
+        }
+        if not remaining:
+            return drafted
+        logger.warning("Re-requesting %d of %d drafts", len(remaining), len(items))
+    logger.warning(
+        "No valid batched draft for %d of %d items, drafting them one by one",
+        len(remaining),
+        len(items),
+    )
+    return drafted
+
+
+def _request_message_batch(items: Dict[str, str]) -> Dict[str, FollowupMessage]:
+    llm = get_chat_model()
+    response = llm.invoke(
+        [
+            SystemMessage(content=prompts.MESSAGE_AGENT_BATCH_SYSTEM_PROMPT),
+            HumanMessage(
+                content=prompts.MESSAGE_AGENT_BATCH_USER_PROMPT.format(
+                    thresholds_json=json.dumps(settings.ESCALATION_THRESHOLDS),
+                    items_json="[" + ",\n".join(items.values()) + "]",
+                )
+            ),
+        ]
+    )
+    content = response.content if hasattr(response, "content") else str(response)
+    drafted: Dict[str, FollowupMessage] = {}
+    for entry in _parse_json_array(content):
+        if not isinstance(entry, dict):
+            continue
+        item_id = str(entry.pop("id", ""))
+        if item_id not in items or item_id in drafted:
+            continue
+        try:
+            drafted[item_id] = FollowupMessage(**entry)
+        except ValidationError as exc:
+            generation_stats.record("parse_failures")
+            logger.warning("Invalid draft for batched item %s: %s", item_id, exc)
+    return drafted
+
+
+def _build_messages(input_json: str, user_prompt: Optional[str] = None) -> list:
+    user_prompt = user_prompt or prompts.MESSAGE_AGENT_USER_PROMPT
+    return [
         SystemMessage(content=prompts.MESSAGE_AGENT_SYSTEM_PROMPT),
-        HumanMessage(
-            content=prompts.MESSAGE_AGENT_USER_PROMPT.format(input_json=input_json)
-        ),
+        HumanMessage(content=user_prompt.format(input_json=input_json)),
     ]
-    response = llm.invoke(messages)
+
+
+def _parse_message(response: Any) -> FollowupMessage:
     content = response.content if hasattr(response, "content") else str(response)
-    data = _parse_json(content)
     try:
-        return FollowupMessage(**data)
+        message = FollowupMessage(**_parse_json(content))
+    except MessageGenerationError:
+        generation_stats.record("parse_failures")
+        raise
     except ValidationError as exc:
+        generation_stats.record("parse_failures")
         raise MessageGenerationError(f"Invalid message JSON: {exc}") from exc
+    generation_stats.record("parsed_from_text")
+    return message
 
 
 def _parse_json(content: str) -> dict[str, Any]:
@@ -91,6 +742,24 @@ def _parse_json(content: str) -> dict[str, Any]:
         raise MessageGenerationError("No JSON object found in response.")
 
 
+def _parse_json_array(content: str) -> list:
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        trimmed = content.strip()
+        start = trimmed.find("[")
+        end = trimmed.rfind("]")
+        if start < 0 or end <= start:
+            raise MessageGenerationError("No JSON array found in response.")
+        try:
+            data = json.loads(trimmed[start : end + 1])
+        except json.JSONDecodeError as exc:
+            raise MessageGenerationError("Failed to parse JSON response.") from exc
+    if not isinstance(data, list):
+        raise MessageGenerationError("Expected a JSON array of drafts.")
+    return data
+
+
 def _model_to_dict(model: Optional[Any]) -> Optional[dict]:
     if model is None:
         return None
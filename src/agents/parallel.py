@@ -0,0 +1,64 @@
+from __future__ import annotations
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import MISSING, fields, replace
+from typing import Deque, Dict, Iterable, Iterator, Optional, Tuple
+from src.agents.context_agent import run_context_agent_batch
+from src.agents.control_agent import run_control_agent_batch
+from src.agents.decision_agent import run_decision_agent_batch
+from src.config import settings
+from src.state import InvoiceBatch
+
+# input columns go to the workers, only the stage columns (small integer
+# arrays plus the per-chunk signal and rule tables) come back
+INPUT_FIELDS = tuple(
+    item.name for item in fields(InvoiceBatch) if item.default is MISSING
+)
+STAGE_FIELDS = tuple(
+    item.name for item in fields(InvoiceBatch) if item.default is not MISSING
+)
+
+
+def run_deterministic_batch(batch: InvoiceBatch) -> InvoiceBatch:
+    batch = run_context_agent_batch(batch)
+    batch = run_decision_agent_batch(batch)
+    return run_control_agent_batch(batch, stage="decision")
+
+
+def iter_deterministic_parallel(
+    batches: Iterable[InvoiceBatch],
+    workers: int,
+    chunk_size: Optional[int] = None,
+) -> Iterator[InvoiceBatch]:
+    # splits every batch into chunks for a process pool and yields the
+    # processed chunks in input order; at most two chunks per worker are in
+    # flight, so streamed input stays bounded
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending: Deque[Tuple[InvoiceBatch, Future]] = deque()
+        for chunk in _chunks(batches, workers, chunk_size):
+            columns = {name: getattr(chunk, name) for name in INPUT_FIELDS}
+            pending.append((chunk, executor.submit(_stage_columns, columns)))
+            if len(pending) >= workers * 2:
+                yield _merge(*pending.popleft())
+        while pending:
+            yield _merge(*pending.popleft())
+
+
+def _chunks(
+    batches: Iterable[InvoiceBatch], workers: int, chunk_size: Optional[int]
+) -> Iterator[InvoiceBatch]:
+    limit = chunk_size or settings.WORKER_CHUNK_SIZE
+    for batch in batches:
+        # spread a small batch over every worker rather than filling one chunk
+        size = max(1, min(limit, -(-len(batch) // workers)))
+        for start in range(0, len(batch), size):
+            yield batch.take(slice(start, start + size))
+
+
+def _stage_columns(columns: Dict[str, object]) -> Dict[str, object]:
+    batch = run_deterministic_batch(InvoiceBatch(**columns))
+    return {name: getattr(batch, name) for name in STAGE_FIELDS}
+
+
+def _merge(chunk: InvoiceBatch, future: Future) -> InvoiceBatch:
+    return replace(chunk, **future.result())
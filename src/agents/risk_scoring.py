@@ -0,0 +1,95 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Sequence, Tuple
+import numpy as np
+from src.config import settings
+from src.state.batch import RELATIONSHIP_TAGS, RISK_LEVELS
+
+
+@dataclass(frozen=True)
+class ThresholdTable:
+    # breaks are strictly increasing; scores has one extra trailing entry for
+    # values above every break
+    breaks: np.ndarray
+    scores: np.ndarray
+
+    def score(self, values: np.ndarray) -> np.ndarray:
+        return self.scores[np.searchsorted(self.breaks, values, side="left")]
+
+
+@dataclass(frozen=True)
+class RiskTables:
+    days_overdue: ThresholdTable
+    amount: ThresholdTable
+    relationship: np.ndarray
+    low_max: int
+    medium_max: int
+
+
+def compile_risk_tables() -> RiskTables:
+    return _compile_risk_tables(_settings_key())
+
+
+def score_risk_batch(
+    days_overdue: np.ndarray,
+    invoice_amount: np.ndarray,
+    relationship_code: np.ndarray,
+    has_high_notes: np.ndarray,
+    has_low_notes: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    tables = compile_risk_tables()
+    score = tables.days_overdue.score(days_overdue)
+    score = score + tables.amount.score(invoice_amount)
+    score += tables.relationship[relationship_code]
+    score += np.where(has_high_notes, 2, 0)
+    score -= np.where(has_low_notes, 1, 0)
+    score = np.maximum(score, 0)
+
+    risk_code = np.full(len(score), RISK_LEVELS.index("high"), dtype=np.int8)
+    risk_code[score <= tables.medium_max] = RISK_LEVELS.index("medium")
+    risk_code[score <= tables.low_max] = RISK_LEVELS.index("low")
+    return risk_code, score
+
+
+def compile_thresholds(rules: Sequence[Tuple[float, int]]) -> ThresholdTable:
+    # _score_by_thresholds returns the first rule with value <= max_value, so
+    # a rule whose max does not exceed an earlier one can never match
+    breaks = []
+    scores = []
+    for max_value, score in rules:
+        if not breaks or max_value > breaks[-1]:
+            breaks.append(max_value)
+            scores.append(score)
+    fallback = rules[-1][1] if rules else 0
+    return ThresholdTable(
+        breaks=np.array(breaks, dtype=np.float64),
+        scores=np.array(scores + [fallback], dtype=np.int64),
+    )
+
+
+@lru_cache(maxsize=8)
+def _compile_risk_tables(key: tuple) -> RiskTables:
+    days_rules, amount_rules, relationship, low_max, medium_max = key
+    relationship_scores = dict(relationship)
+    return RiskTables(
+        days_overdue=compile_thresholds(days_rules),
+        amount=compile_thresholds(amount_rules),
+        relationship=np.array(
+            [relationship_scores.get(tag, 0) for tag in RELATIONSHIP_TAGS],
+            dtype=np.int64,
+        ),
+        low_max=low_max,
+        medium_max=medium_max,
+    )
+
+
+def _settings_key() -> tuple:
+    # settings are plain module globals, so recompile whenever they change
+    return (
+        tuple(map(tuple, settings.RISK_SCORE_DAYS_OVERDUE)),
+        tuple(map(tuple, settings.RISK_SCORE_AMOUNT)),
+        tuple(sorted(settings.RISK_SCORE_RELATIONSHIP.items())),
+        settings.RISK_LEVEL_THRESHOLDS["low_max"],
+        settings.RISK_LEVEL_THRESHOLDS["medium_max"],
+    )
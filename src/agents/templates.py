@@ -0,0 +1,126 @@
+from __future__ import annotations
+from typing import Dict, Optional, Tuple
+from src.agents.context_agent import extract_notes_signals
+from src.state import FollowupState, FollowupMessage
+
+# wording is kept inside the control policy: no fees, legal language or
+# automatic actions (see CONTROL_FORBIDDEN_PHRASES / CONTROL_UNSUPPORTED_CLAIMS)
+TEMPLATE_SUBJECTS: Dict[str, str] = {
+    "soft": "Friendly reminder: invoice {invoice_id}",
+    "neutral": "Payment reminder for invoice {invoice_id}",
+    "firm": "Invoice {invoice_id} is now {days_overdue} days overdue",
+}
+
+TEMPLATE_OPENINGS: Dict[str, str] = {
+    "vip": "Thank you for your continued partnership with us.",
+    "recurring": "Thank you for continuing to work with us.",
+    "new": "Thank you again for choosing to work with us.",
+    "risky": "I am following up on your account with us.",
+}
+
+TEMPLATE_BODIES: Dict[Tuple[str, str], str] = {
+    ("soft", "now"): (
+        "Our records show that invoice {invoice_id} for {amount} is currently "
+        "{days_overdue} days past its due date. It may simply have slipped "
+        "through, so this is a gentle reminder. If payment is already on its "
+        "way, please disregard this note, and if anything about the invoice "
+        "needs clarifying, just reply and we will be glad to help."
+    ),
+    ("soft", "wait_3_days"): (
+        "Invoice {invoice_id} for {amount} is {days_overdue} days past its due "
+        "date. There is no need to act today; we will check in again in a few "
+        "days. If payment is already scheduled, thank you, and if you have any "
+        "questions about the invoice, just reply to this message."
+    ),
+    ("soft", "wait_7_days"): (
+        "Invoice {invoice_id} for {amount} is {days_overdue} days past its due "
+        "date. We plan to check in again next week. If payment is already "
+        "scheduled, thank you, and if you have any questions about the "
+        "invoice, just reply to this message."
+    ),
+    ("neutral", "now"): (
+        "This is a reminder that invoice {invoice_id} for {amount} is "
+        "{days_overdue} days past its due date. Please arrange payment at your "
+        "earliest convenience, or let us know the expected payment date. If "
+        "you have already paid, please send the payment details so we can "
+        "update our records."
+    ),
+    ("neutral", "wait_3_days"): (
+        "Invoice {invoice_id} for {amount} is {days_overdue} days past its due "
+        "date. Please let us know when we can expect payment; we will follow "
+        "up again in a few days. If you have already paid, please send the "
+        "payment details so we can update our records."
+    ),
+    ("neutral", "wait_7_days"): (
+        "Invoice {invoice_id} for {amount} is {days_overdue} days past its due "
+        "date. Please let us know when we can expect payment; we will follow "
+        "up again next week. If you have already paid, please send the "
+        "payment details so we can update our records."
+    ),
+    ("firm", "now"): (
+        "Invoice {invoice_id} for {amount} is {days_overdue} days past its due "
+        "date and remains unpaid. Please arrange payment now, or reply today "
+        "with a confirmed payment date. If there is a problem with the "
+        "invoice, tell us so we can resolve it quickly."
+    ),
+    ("firm", "wait_3_days"): (
+        "Invoice {invoice_id} for {amount} is {days_overdue} days past its due "
+        "date and remains unpaid. Please confirm a payment date; we will "
+        "follow up again in a few days. If there is a problem with the "
+        "invoice, tell us so we can resolve it quickly."
+    ),
+    ("firm", "wait_7_days"): (
+        "Invoice {invoice_id} for {amount} is {days_overdue} days past its due "
+        "date and remains unpaid. Please confirm a payment date; we will "
+        "follow up again next week. If there is a problem with the invoice, "
+        "tell us so we can resolve it quickly."
+    ),
+}
+
+# (tone, relationship) pairs the decision logic only produces in unusual
+# cases; those still go to the LLM
+UNUSUAL_COMBINATIONS = {
+    ("firm", "vip"),
+    ("firm", "new"),
+    ("soft", "risky"),
+}
+
+
+def render_template_message(state: FollowupState) -> Optional[FollowupMessage]:
+    # returns None when the invoice needs an LLM draft: notes carry signals
+    # or the tone/timing/relationship combination has no template
+    invoice = state["invoice_data"]
+    decision = state["decision"]
+    signals = state.get("signals")
+    notes = signals.notes if signals is not None else extract_notes_signals(
+        invoice.notes
+    )
+    if notes.high or notes.low or notes.soften or notes.no_followup:
+        return None
+    tone = decision.tone
+    key = (tone, decision.recommended_timing)
+    if key not in TEMPLATE_BODIES:
+        return None
+    if (tone, invoice.relationship_tag) in UNUSUAL_COMBINATIONS:
+        return None
+
+    values = {
+        "client_name": invoice.client_name,
+        "invoice_id": invoice.invoice_id,
+        "amount": f"{invoice.invoice_amount:,.2f} {invoice.currency}",
+        "days_overdue": invoice.days_overdue,
+    }
+    body = (
+        f"Hello {invoice.client_name},\n\n"
+        f"{TEMPLATE_OPENINGS[invoice.relationship_tag]} "
+        f"{TEMPLATE_BODIES[key].format(**values)}\n\n"
+        "Best regards,\nAccounts Receivable"
+    )
+    return FollowupMessage(
+        subject=TEMPLATE_SUBJECTS[tone].format(**values),
+        body=body,
+        reasoning=(
+            f"Template {tone}/{decision.recommended_timing}/"
+            f"{invoice.relationship_tag}: standard case without notes signals."
+        ),
+    )
@@ -24,6 +24,49 @@ Guidance:
 - If timing is "wait_3_days" or "wait_7_days", you may still draft a polite reminder noting a planned follow-up.
 """
 
+MESSAGE_AGENT_BATCH_SYSTEM_PROMPT = """You are a business-safe follow-up drafting assistant.
+Your task: produce one professional payment follow-up message for each invoice item provided, based on that item's invoice context and decision.
+
+Safety constraints (non-negotiable):
+- No threats, intimidation, or harassment.
+- No legal claims, legal advice, or implications of enforcement actions.
+- Do not mention collections, litigation, or authorities.
+- Do not claim the message was sent or will be sent automatically; this is a draft for human review.
+
+Formatting requirements:
+- Output must be a valid JSON array and nothing else, with one object per input item.
+- Use the exact keys: id, subject, body, reasoning. Copy id unchanged from the item.
+- Do not include markdown, code fences, or extra commentary.
+"""
+
+MESSAGE_AGENT_BATCH_USER_PROMPT = """Draft one follow-up message per item.
+Escalation thresholds shared by all items:
+{thresholds_json}
+
+Items:
+{items_json}
+
+Guidance:
+- Treat every item independently; never mix facts between items.
+- Match each item's requested tone (soft / neutral / firm).
+- Keep each subject concise (5-12 words).
+- Keep each body short (80-180 words).
+- Be specific about invoice and timing facts when available.
+- If timing is "wait_3_days" or "wait_7_days", you may still draft a polite reminder noting a planned follow-up.
+"""
+
+MESSAGE_AGENT_CONSOLIDATED_USER_PROMPT = """Draft one follow-up message covering all of this client's overdue invoices:
+{input_json}
+
+Guidance:
+- Match the requested tone (soft / neutral / firm).
+- Keep the subject concise (5-12 words).
+- Keep the body short (100-220 words).
+- List every invoice with its ID, amount and days overdue; never omit or merge invoices.
+- Use the totals provided rather than adding amounts yourself.
+- If timing is "wait_3_days" or "wait_7_days", you may still draft a polite reminder noting a planned follow-up.
+"""
+
 CONTROL_POLICY_SUMMARY = """Control policy goals:
 - Enforce business-safe language (no threats, legal claims, or intimidation).
 - Keep tone within relationship and timing caps.
@@ -27,6 +27,10 @@ RISK_SCORE_NOTES_KEYWORDS = {
     "soften": ["dispute", "billing issue", "invoice error", "incorrect"],
     "no_followup": ["paid", "settled", "resolved", "closed"],
 }
+# match notes keywords as whole words only ("unpaid" no longer counts as "paid")
+RISK_SCORE_NOTES_WORD_BOUNDARY = False
+# distinct note texts whose extracted signals are memoized across invoices
+NOTES_SIGNALS_CACHE_SIZE = 4096
 
 RISK_LEVEL_THRESHOLDS = {
     "low_max": 2,
@@ -48,11 +52,48 @@ TONE_PREFERENCE_BY_RELATIONSHIP = {
     "risky": "firm",
 }
 
+LOADER_CHUNK_SIZE = 50_000
+# upper bound on rows per process-pool task (--workers)
+WORKER_CHUNK_SIZE = 10_000
+
 LLM_MESSAGE_MODEL = "gpt-4o"
 LLM_MESSAGE_TEMPERATURE = 0.2
 LLM_MESSAGE_MAX_RETRIES = 3
 LLM_MESSAGE_BACKOFF_MIN_SECONDS = 1
 LLM_MESSAGE_BACKOFF_MAX_SECONDS = 8
+# schema-constrained drafts: "json_schema", "json_mode" for backends without
+# schema support, or None to parse free text; the text parser stays as fallback
+LLM_STRUCTURED_OUTPUT = "json_schema"
+# None uses the OpenAI default (or OPENAI_BASE_URL)
+LLM_BASE_URL = None
+LLM_HTTP_MAX_CONNECTIONS = 20
+LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS = 20
+LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS = 60
+LLM_HTTP_CONNECT_TIMEOUT_SECONDS = 10
+LLM_HTTP_READ_TIMEOUT_SECONDS = 120
+# shared budgets for concurrent drafting (--concurrency); None disables a limit
+LLM_REQUESTS_PER_MINUTE = 500
+LLM_TOKENS_PER_MINUTE = 150_000
+LLM_RATE_LIMIT_BURST_SECONDS = 1.0
+LLM_MESSAGE_COMPLETION_TOKENS_ESTIMATE = 400
+# batched drafting (--batch-size): invoices per request also stop growing once
+# the estimated prompt plus completions would exceed the token budget
+LLM_BATCH_TOKEN_BUDGET = 16_000
+LLM_BATCH_WINDOW = 500
+
+# staged runtime (--pipeline): bounded queue between stages, invoices read
+# per loader call
+PIPELINE_QUEUE_SIZE = 64
+PIPELINE_LOAD_CHUNK_SIZE = 256
+# invoices listed in the console summary table; the report has every row
+CONSOLE_SUMMARY_ROWS = 20
+# rows buffered per Parquet row group (--format parquet)
+PARQUET_ROW_GROUP_SIZE = 50_000
+# per-node workflow checkpoints, used by --resume
+CHECKPOINT_PATH = "outputs/.checkpoints.sqlite"
+DRAFT_CACHE_PATH = "outputs/.draft_cache.sqlite"
+DRAFT_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+DRAFT_CACHE_MAX_ENTRIES = 200_000
 
 ESCALATION_THRESHOLDS = {
     "urgent_days_overdue": FOLLOWUP_TIMING_RULES["urgent_days_overdue"],
@@ -1,3 +1,19 @@
-from .workflow import build_workflow
+from .pipeline import run_pipeline
+from .workflow import (
+    ainvoke_in_order,
+    aiter_in_order,
+    build_workflow,
+    invoke_resumable,
+    run_batched,
+    run_consolidated,
+)
 
-__all__ = ["build_workflow"]
+__all__ = [
+    "ainvoke_in_order",
+    "aiter_in_order",
+    "build_workflow",
+    "invoke_resumable",
+    "run_batched",
+    "run_consolidated",
+    "run_pipeline",
+]
@@ -0,0 +1,128 @@
+from __future__ import annotations
+import asyncio
+from itertools import islice
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional
+from src.agents import arun_message_agent
+from src.config import settings
+from src.io.draft_cache import DraftCache
+from src.state import FollowupState, InvoiceRow
+from .workflow import (
+    MESSAGE_NODE,
+    route_after_decision_control,
+    run_decision_stages,
+    run_message_control_stage,
+)
+
+# end-of-input marker; a stage forwards one per worker of the next stage
+_DONE = object()
+
+
+async def run_pipeline(
+    invoices: Iterable[InvoiceRow],
+    sink: Callable[[FollowupState], None],
+    draft_cache: Optional[DraftCache] = None,
+    llm_policy: str = "llm",
+    stream_drafts: bool = False,
+    message_workers: int = 4,
+    queue_size: Optional[int] = None,
+) -> int:
+    # the workflow's nodes (and its routing) as stages joined by bounded queues:
+    # load -> context/decision/control -> message -> message control -> sink.
+    # Input for later invoices is loaded and decided while earlier drafts are
+    # in flight; full queues hold the upstream stages back, and at most
+    # max_in_flight invoices are between loading and the sink, which receives
+    # states in input order. The rule-based stages are short CPU work that
+    # runs on the loop, so each has a single worker; only drafting is
+    # concurrent
+    queue_size = queue_size or settings.PIPELINE_QUEUE_SIZE
+    max_in_flight = queue_size * 4 + message_workers
+    window = asyncio.Semaphore(max_in_flight)
+    decide_queue: asyncio.Queue = asyncio.Queue(queue_size)
+    message_queue: asyncio.Queue = asyncio.Queue(queue_size)
+    control_queue: asyncio.Queue = asyncio.Queue(queue_size)
+    write_queue: asyncio.Queue = asyncio.Queue(queue_size)
+
+    async def decide(item: tuple) -> None:
+        position, state = item
+        state = run_decision_stages(state)
+        if route_after_decision_control(state) == MESSAGE_NODE:
+            queue = message_queue
+        else:
+            queue = write_queue
+        await queue.put((position, state))
+
+    async def draft(item: tuple) -> None:
+        position, state = item
+        state = await arun_message_agent(
+            state, cache=draft_cache, policy=llm_policy, stream=stream_drafts
+        )
+        await control_queue.put((position, state))
+
+    async def control(item: tuple) -> None:
+        position, state = item
+        await write_queue.put((position, run_message_control_stage(state)))
+
+    written = 0
+
+    async def write() -> None:
+        nonlocal written
+        pending: Dict[int, FollowupState] = {}
+        while (item := await write_queue.get()) is not _DONE:
+            position, state = item
+            pending[position] = state
+            while written in pending:
+                sink(pending.pop(written))
+                written += 1
+                window.release()
+
+    async with asyncio.TaskGroup() as group:
+        group.create_task(_load(invoices, decide_queue, window))
+        group.create_task(
+            _stage(decide_queue, 1, decide, message_queue, message_workers)
+        )
+        group.create_task(
+            _stage(message_queue, message_workers, draft, control_queue, 1)
+        )
+        group.create_task(_stage(control_queue, 1, control, write_queue, 1))
+        group.create_task(write())
+    return written
+
+
+async def _load(
+    invoices: Iterable[InvoiceRow],
+    outbox: asyncio.Queue,
+    window: asyncio.Semaphore,
+) -> None:
+    # reading and validating the input blocks, so chunks are read in a thread,
+    # the next one while the current one is being queued
+    iterator = iter(invoices)
+    size = settings.PIPELINE_LOAD_CHUNK_SIZE
+    position = 0
+    upcoming = asyncio.ensure_future(asyncio.to_thread(_take, iterator, size))
+    while chunk := await upcoming:
+        upcoming = asyncio.ensure_future(asyncio.to_thread(_take, iterator, size))
+        for invoice in chunk:
+            await window.acquire()
+            await outbox.put((position, {"invoice_data": invoice}))
+            position += 1
+    await outbox.put(_DONE)
+
+
+async def _stage(
+    inbox: asyncio.Queue,
+    workers: int,
+    handle: Callable[[Any], Awaitable[None]],
+    outbox: asyncio.Queue,
+    outbox_workers: int,
+) -> None:
+    async def work() -> None:
+        while (item := await inbox.get()) is not _DONE:
+            await handle(item)
+
+    await asyncio.gather(*(work() for _ in range(workers)))
+    for _ in range(outbox_workers):
+        await outbox.put(_DONE)
+
+
+def _take(iterator: Iterator[InvoiceRow], size: int) -> List[InvoiceRow]:
+    return list(islice(iterator, size))
@@ -1,12 +1,36 @@
 from __future__ import annotations
+import asyncio
+from collections import deque
+from functools import partial
+from itertools import islice
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Deque,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+from langchain_core.runnables import RunnableLambda
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import END, StateGraph
 from src.agents import (
+    arun_message_agent,
+    needs_message,
     run_context_agent,
     run_decision_agent,
     run_message_agent,
+    run_message_agent_batched,
+    run_message_agent_consolidated,
     run_control_agent,
 )
-from src.state import FollowupState
+from src.config import settings
+from src.io.checkpoints import restore_state
+from src.io.draft_cache import DraftCache
+from src.state import FollowupState, InvoiceRow
 
 def _context_node(state: FollowupState) -> FollowupState:
     return run_context_agent(state)
@@ -16,31 +40,224 @@ def _decision_node(state: FollowupState) -> FollowupState:
     return run_decision_agent(state)
 
 
-def _message_node(state: FollowupState) -> FollowupState:
-    return run_message_agent(state)
+def _message_node(
+    state: FollowupState,
+    cache: Optional[DraftCache] = None,
+    policy: str = "llm",
+    stream: bool = False,
+) -> FollowupState:
+    return run_message_agent(state, cache=cache, policy=policy, stream=stream)
+
+
+async def _amessage_node(
+    state: FollowupState,
+    cache: Optional[DraftCache] = None,
+    policy: str = "llm",
+    stream: bool = False,
+) -> FollowupState:
+    return await arun_message_agent(
+        state, cache=cache, policy=policy, stream=stream
+    )
 
 
 def _control_decision_node(state: FollowupState) -> FollowupState:
     return run_control_agent(state, stage="decision")
 
 
-def _control_message_node(state: FollowupState) -> FollowupState:
+# nodes ahead of the message branch, in graph order
+DECISION_STAGES: Tuple[Tuple[str, Callable[[FollowupState], FollowupState]], ...] = (
+    ("context_node", _context_node),
+    ("decision_node", _decision_node),
+    ("control_decision_node", _control_decision_node),
+)
+MESSAGE_NODE = "message_node"
+
+
+def run_decision_stages(state: FollowupState) -> FollowupState:
+    # the graph's steps up to the message branch, for the runtimes that do
+    # not go through the graph (batched, consolidated, pipeline)
+    for _, node in DECISION_STAGES:
+        state = node(state)
+    return state
+
+
+def route_after_decision_control(state: FollowupState) -> str:
+    # no-follow-up and failed-control states have nothing to draft or check
+    return MESSAGE_NODE if needs_message(state) else END
+
+
+def run_message_control_stage(state: FollowupState) -> FollowupState:
     return run_control_agent(state, stage="message")
 
 
-def build_workflow():
+def build_workflow(
+    draft_cache: Optional[DraftCache] = None,
+    llm_policy: str = "llm",
+    stream_drafts: bool = False,
+    checkpointer: Optional[BaseCheckpointSaver] = None,
+):
     graph = StateGraph(FollowupState)
-    graph.add_node("context_node", _context_node)
-    graph.add_node("decision_node", _decision_node)
-    graph.add_node("control_decision_node", _control_decision_node)
-    graph.add_node("message_node", _message_node)
-    graph.add_node("control_message_node", _control_message_node)
-
-    graph.set_entry_point("context_node")
-    graph.add_edge("context_node", "decision_node")
-    graph.add_edge("decision_node", "control_decision_node")
-    graph.add_edge("control_decision_node", "message_node")
-    graph.add_edge("message_node", "control_message_node")
+    for name, node in DECISION_STAGES:
+        graph.add_node(name, _inline(node))
+    graph.add_node(
+        MESSAGE_NODE,
+        RunnableLambda(
+            partial(
+                _message_node,
+                cache=draft_cache,
+                policy=llm_policy,
+                stream=stream_drafts,
+            ),
+            afunc=partial(
+                _amessage_node,
+                cache=draft_cache,
+                policy=llm_policy,
+                stream=stream_drafts,
+            ),
+            name=MESSAGE_NODE,
+        ),
+    )
+    graph.add_node("control_message_node", _inline(run_message_control_stage))
+
+    names = [name for name, _ in DECISION_STAGES]
+    graph.set_entry_point(names[0])
+    for previous, name in zip(names, names[1:]):
+        graph.add_edge(previous, name)
+    graph.add_conditional_edges(
+        names[-1], route_after_decision_control, [MESSAGE_NODE, END]
+    )
+    graph.add_edge(MESSAGE_NODE, "control_message_node")
     graph.add_edge("control_message_node", END)
 
-    return graph.compile()
+    return graph.compile(checkpointer=checkpointer)
+
+
+def invoke_resumable(
+    workflow: Any, invoice: InvoiceRow, config: dict
+) -> FollowupState:
+    # with a checkpointer: finished invoices come from the store, interrupted
+    # ones continue after their last completed node
+    snapshot = workflow.get_state(config)
+    if not snapshot.values:
+        return workflow.invoke({"invoice_data": invoice}, config)
+    if snapshot.next:
+        return workflow.invoke(None, config)
+    return restore_state(snapshot.values)
+
+
+async def ainvoke_resumable(
+    workflow: Any, invoice: InvoiceRow, config: dict
+) -> FollowupState:
+    snapshot = await workflow.aget_state(config)
+    if not snapshot.values:
+        return await workflow.ainvoke({"invoice_data": invoice}, config)
+    if snapshot.next:
+        return await workflow.ainvoke(None, config)
+    return restore_state(snapshot.values)
+
+
+async def ainvoke_in_order(
+    workflow: Any,
+    invoices: Iterable[InvoiceRow],
+    concurrency: int,
+    config_for: Optional[Callable[[int, str], dict]] = None,
+) -> List[FollowupState]:
+    return [
+        state
+        async for state in aiter_in_order(workflow, invoices, concurrency, config_for)
+    ]
+
+
+async def aiter_in_order(
+    workflow: Any,
+    invoices: Iterable[InvoiceRow],
+    concurrency: int,
+    config_for: Optional[Callable[[int, str], dict]] = None,
+) -> AsyncIterator[FollowupState]:
+    # at most `concurrency` invoices run at once and only a small window is
+    # scheduled ahead, so streamed input is never read in full; states are
+    # yielded from the head of the window as soon as it finishes, in input
+    # order
+    semaphore = asyncio.Semaphore(concurrency)
+
+    # config_for(position, invoice_id) gives the checkpoint config of a
+    # resumable run
+    async def run(invoice: InvoiceRow, config: Optional[dict]) -> FollowupState:
+        async with semaphore:
+            if config is not None:
+                return await ainvoke_resumable(workflow, invoice, config)
+            return await workflow.ainvoke({"invoice_data": invoice})
+
+    pending: Deque[asyncio.Task] = deque()
+    try:
+        for position, invoice in enumerate(invoices):
+            config = (
+                config_for(position, invoice.invoice_id) if config_for else None
+            )
+            pending.append(asyncio.create_task(run(invoice, config)))
+            if len(pending) >= concurrency * 4:
+                yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def run_batched(
+    invoices: Iterable[InvoiceRow],
+    batch_size: int,
+    draft_cache: Optional[DraftCache] = None,
+    window: Optional[int] = None,
+    llm_policy: str = "llm",
+) -> Iterator[FollowupState]:
+    # same stages as build_workflow, but the message stage drafts several
+    # invoices per request; input is consumed one window at a time
+    for states in _decided_windows(invoices, window):
+        states = run_message_agent_batched(
+            states, cache=draft_cache, max_items=batch_size, policy=llm_policy
+        )
+        for state in states:
+            if route_after_decision_control(state) == MESSAGE_NODE:
+                state = run_message_control_stage(state)
+            yield state
+
+
+def run_consolidated(
+    invoices: Iterable[InvoiceRow],
+    draft_cache: Optional[DraftCache] = None,
+    window: Optional[int] = None,
+    llm_policy: str = "llm",
+) -> Iterator[FollowupState]:
+    # same stages as build_workflow, but invoices of one client due at the
+    # same time share a single draft; clients are grouped within each window
+    for states in _decided_windows(invoices, window):
+        states = run_message_agent_consolidated(
+            states, cache=draft_cache, policy=llm_policy
+        )
+        for state in states:
+            if route_after_decision_control(state) == MESSAGE_NODE:
+                state = run_message_control_stage(state)
+            yield state
+
+
+def _decided_windows(
+    invoices: Iterable[InvoiceRow], window: Optional[int]
+) -> Iterator[List[FollowupState]]:
+    # states through decision control, one window of input at a time
+    invoices = iter(invoices)
+    window = window or settings.LLM_BATCH_WINDOW
+    while True:
+        chunk = list(islice(invoices, window))
+        if not chunk:
+            return
+        yield [run_decision_stages({"invoice_data": invoice}) for invoice in chunk]
+
+
+def _inline(func: Callable[[FollowupState], FollowupState]) -> RunnableLambda:
+    # deterministic nodes take microseconds; run them on the event loop rather
+    # than handing each one to a worker thread under ainvoke
+    async def afunc(state: FollowupState) -> FollowupState:
+        return func(state)
+
+    return RunnableLambda(func, afunc=afunc, name=func.__name__)
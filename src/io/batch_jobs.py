@@ -0,0 +1,92 @@
+from __future__ import annotations
+import json
+import logging
+from pathlib import Path
+from typing import IO, Dict, Iterator, Optional, Tuple
+from src.agents.message_agent import build_message_input, message_request_body
+from src.io.draft_cache import draft_key
+from src.state import FollowupState
+from src.state.serialization import state_from_dict, state_to_dict
+
+logger = logging.getLogger(__name__)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+REQUESTS_FILE = "requests.jsonl"
+STATES_FILE = "states.jsonl"
+
+
+class BatchJobWriter:
+    # prepare phase output: requests.jsonl holds one chat completions request
+    # per pending draft in the OpenAI batch input format, states.jsonl every
+    # processed state plus the custom_id of its request (None if no draft)
+    def __init__(self, directory: str) -> None:
+        self.directory = Path(directory)
+        self.state_count = 0
+        self.request_count = 0
+        self._states: Optional[IO[str]] = None
+        self._requests: Optional[IO[str]] = None
+
+    def __enter__(self) -> "BatchJobWriter":
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._states = (self.directory / STATES_FILE).open("w", encoding="utf-8")
+        self._requests = (self.directory / REQUESTS_FILE).open("w", encoding="utf-8")
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        for handle in (self._states, self._requests):
+            if handle is not None:
+                handle.close()
+        self._states = self._requests = None
+
+    def write(self, state: FollowupState) -> Optional[str]:
+        custom_id = None
+        input_json = build_message_input(state)
+        if input_json is not None:
+            # position plus content hash: unique within the file and stable
+            # across re-runs over the same input
+            custom_id = f"draft-{self.state_count:07d}-{draft_key(input_json)[:16]}"
+            request = {
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": message_request_body(input_json),
+            }
+            self._requests.write(json.dumps(request) + "\n")
+            self.request_count += 1
+        record = {"custom_id": custom_id, "state": state_to_dict(state)}
+        self._states.write(json.dumps(record) + "\n")
+        self.state_count += 1
+        return custom_id
+
+
+def iter_prepared_states(
+    directory: str,
+) -> Iterator[Tuple[Optional[str], FollowupState]]:
+    with (Path(directory) / STATES_FILE).open("r", encoding="utf-8") as handle:
+        for line in handle:
+            if line.strip():
+                record = json.loads(line)
+                yield record["custom_id"], state_from_dict(record["state"])
+
+
+def read_batch_results(path: str) -> Dict[str, Optional[str]]:
+    # custom_id -> assistant message content; None when the request failed
+    results: Dict[str, Optional[str]] = {}
+    with Path(path).open("r", encoding="utf-8") as handle:
+        for line in handle:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            custom_id = record.get("custom_id")
+            response = record.get("response") or {}
+            body = response.get("body") or {}
+            if record.get("error") or response.get("status_code", 200) != 200:
+                logger.warning("Batch request %s failed: %s", custom_id, record)
+                results[custom_id] = None
+                continue
+            try:
+                results[custom_id] = body["choices"][0]["message"]["content"]
+            except (KeyError, IndexError, TypeError):
+                logger.warning("Batch request %s has no message content", custom_id)
+                results[custom_id] = None
+    return results
@@ -0,0 +1,182 @@
+from __future__ import annotations
+import hashlib
+import sqlite3
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+import aiosqlite
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from src.config import settings
+from src.state import FollowupState, InvoiceSignals, NotesSignals
+from src.state.serialization import STATE_MODELS, state_from_dict, state_to_dict
+
+# state types the checkpoint serializer may rebuild
+CHECKPOINT_TYPES = sorted(
+    {
+        (model.__module__, model.__name__)
+        for model in (*STATE_MODELS.values(), InvoiceSignals, NotesSignals)
+    }
+)
+
+
+def new_run_id() -> str:
+    return f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+
+
+def checkpoint_serializer() -> JsonPlusSerializer:
+    return JsonPlusSerializer(allowed_msgpack_modules=CHECKPOINT_TYPES)
+
+
+def input_fingerprint(path: str, limit: Optional[int] = None) -> str:
+    # identifies the input of a run: file path, size, content hash and row
+    # limit; a resume with another fingerprint would mix up positions
+    source = Path(path)
+    digest = hashlib.sha256()
+    with source.open("rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return (
+        f"{source.resolve()}|{source.stat().st_size}|{digest.hexdigest()}|"
+        f"limit={limit}"
+    )
+
+
+class RunStore:
+    # on-disk record of workflow runs: LangGraph's SqliteSaver keeps the state
+    # after every node of every invoice (one thread per run and invoice_id),
+    # run_invoices maps a run to its threads so delete_run and prune can drop
+    # them, and runs holds each run's input fingerprint; the report itself is
+    # streamed as invoices finish, not rebuilt from the store
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.saver = SqliteSaver(self._connection, serde=checkpoint_serializer())
+        self.saver.setup()
+        # the saver writes from LangGraph's background thread on the same
+        # connection, so both sides take its lock
+        self._lock = self.saver.lock
+        with self._lock:
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS run_invoices ("
+                "run_id TEXT NOT NULL, position INTEGER NOT NULL, "
+                "thread_id TEXT NOT NULL, PRIMARY KEY (run_id, position))"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS runs (run_id TEXT PRIMARY KEY, "
+                "fingerprint TEXT NOT NULL, created_at TEXT NOT NULL)"
+            )
+            self._connection.commit()
+        self._occurrences: Dict[tuple, int] = {}
+
+    def __enter__(self) -> "RunStore":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def start_run(self, run_id: str, fingerprint: str) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO runs (run_id, fingerprint, created_at) "
+                "VALUES (?, ?, ?)",
+                (run_id, fingerprint, datetime.now().isoformat(timespec="seconds")),
+            )
+            self._connection.commit()
+
+    def run_fingerprint(self, run_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT fingerprint FROM runs WHERE run_id = ?", (run_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def run_ids(self) -> List[str]:
+        # in start order, oldest first
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT run_id FROM runs ORDER BY rowid"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def delete_run(self, run_id: str) -> None:
+        for thread_id in self.thread_ids(run_id):
+            self.saver.delete_thread(thread_id)
+        with self._lock:
+            self._connection.execute(
+                "DELETE FROM run_invoices WHERE run_id = ?", (run_id,)
+            )
+            self._connection.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+            self._connection.commit()
+
+    def prune(self, keep: int) -> List[str]:
+        # deletes all but the newest `keep` runs and returns their ids; the
+        # file is vacuumed so the space goes back to the disk
+        run_ids = self.run_ids()
+        removed = run_ids[: max(0, len(run_ids) - keep)]
+        for run_id in removed:
+            self.delete_run(run_id)
+        if removed:
+            with self._lock:
+                self._connection.execute("VACUUM")
+        return removed
+
+    def register(self, run_id: str, position: int, invoice_id: str) -> dict:
+        # graph config for the invoice at this input position; a repeated
+        # invoice_id gets its own thread ("INV-1#2") so it is not mistaken
+        # for the first one on resume
+        seen = self._occurrences.get((run_id, invoice_id), 0) + 1
+        self._occurrences[(run_id, invoice_id)] = seen
+        thread_id = f"{run_id}:{invoice_id}" + (f"#{seen}" if seen > 1 else "")
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR IGNORE INTO run_invoices (run_id, position, thread_id) "
+                "VALUES (?, ?, ?)",
+                (run_id, position, thread_id),
+            )
+            self._connection.commit()
+        return thread_config(thread_id)
+
+    def thread_ids(self, run_id: str) -> List[str]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT thread_id FROM run_invoices WHERE run_id = ? "
+                "ORDER BY position",
+                (run_id,),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self) -> None:
+        if self._connection is None:
+            return
+        self._connection.close()
+        self._connection = None
+
+
+def thread_config(thread_id: str) -> dict:
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def restore_state(values: dict) -> FollowupState:
+    # checkpoints come back with lists where the state holds tuples
+    return state_from_dict(state_to_dict(values))
+
+
+@asynccontextmanager
+async def open_async_saver(path: str) -> AsyncIterator[AsyncSqliteSaver]:
+    # concurrent runs need the aiosqlite-backed saver; it shares the file
+    # with RunStore
+    async with aiosqlite.connect(path) as connection:
+        await connection.execute("PRAGMA synchronous=NORMAL")
+        saver = AsyncSqliteSaver(connection, serde=checkpoint_serializer())
+        await saver.setup()
+        yield saver
+
+
+def open_run_store(path: Optional[str] = None) -> RunStore:
+    return RunStore(path or settings.CHECKPOINT_PATH)
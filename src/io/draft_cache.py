@@ -0,0 +1,141 @@
+from __future__ import annotations
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+from src.config import prompts, settings
+from src.state import FollowupMessage
+
+
+def draft_key(
+    input_json: str,
+    system_prompt: Optional[str] = None,
+    user_prompt: Optional[str] = None,
+) -> str:
+    # everything that can change the generated draft is part of the key
+    material = json.dumps(
+        [
+            input_json,
+            system_prompt or prompts.MESSAGE_AGENT_SYSTEM_PROMPT,
+            user_prompt or prompts.MESSAGE_AGENT_USER_PROMPT,
+            settings.LLM_MESSAGE_MODEL,
+            settings.LLM_MESSAGE_TEMPERATURE,
+        ]
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class DraftCache:
+    # content-addressed store of generated drafts; entries expire after
+    # ttl_seconds and the least recently used ones are dropped beyond
+    # max_entries whenever the cache is opened or closed
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS drafts ("
+            "key TEXT PRIMARY KEY, subject TEXT NOT NULL, body TEXT NOT NULL, "
+            "reasoning TEXT NOT NULL, created_at REAL NOT NULL, "
+            "accessed_at REAL NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS drafts_accessed ON drafts (accessed_at)"
+        )
+        self.prune()
+
+    def __enter__(self) -> "DraftCache":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def get(self, key: str) -> Optional[FollowupMessage]:
+        now = self._clock()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT subject, body, reasoning, created_at FROM drafts WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None or self._expired(row[3], now):
+                self.misses += 1
+                return None
+            self._connection.execute(
+                "UPDATE drafts SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._connection.commit()
+            self.hits += 1
+        return FollowupMessage(subject=row[0], body=row[1], reasoning=row[2])
+
+    def put(self, key: str, message: FollowupMessage) -> None:
+        now = self._clock()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO drafts "
+                "(key, subject, body, reasoning, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, message.subject, message.body, message.reasoning, now, now),
+            )
+            self._connection.commit()
+
+    # for callers on an event loop: the sqlite calls run in a worker thread so
+    # concurrent drafts do not wait on each other's disk I/O
+    async def aget(self, key: str) -> Optional[FollowupMessage]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aput(self, key: str, message: FollowupMessage) -> None:
+        await asyncio.to_thread(self.put, key, message)
+
+    def prune(self) -> None:
+        with self._lock:
+            if self.ttl_seconds is not None:
+                self._connection.execute(
+                    "DELETE FROM drafts WHERE created_at < ?",
+                    (self._clock() - self.ttl_seconds,),
+                )
+            if self.max_entries is not None:
+                self._connection.execute(
+                    "DELETE FROM drafts WHERE key IN ("
+                    "SELECT key FROM drafts ORDER BY accessed_at DESC "
+                    "LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            self._connection.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM drafts").fetchone()[0]
+
+    def close(self) -> None:
+        if self._connection is None:
+            return
+        self.prune()
+        self._connection.close()
+        self._connection = None
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and created_at < now - self.ttl_seconds
+
+
+def open_draft_cache(path: Optional[str] = None) -> DraftCache:
+    return DraftCache(
+        path or settings.DRAFT_CACHE_PATH,
+        ttl_seconds=settings.DRAFT_CACHE_TTL_SECONDS,
+        max_entries=settings.DRAFT_CACHE_MAX_ENTRIES,
+    )
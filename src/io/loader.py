@@ -1,10 +1,20 @@
 from __future__ import annotations
-import re
+from datetime import datetime
 from pathlib import Path
-from typing import Any, List
+from typing import Any, Callable, Iterator, List, Optional
+import numpy as np
 import pandas as pd
-from src.state import InvoiceRow
-from src.utils.validation import InvoiceValidationError, validate_rows
+from src.config import settings
+from src.state import InvoiceBatch, InvoiceRow
+from src.utils.validation import (
+    InvoiceValidationError,
+    RejectedRow,
+    frame_to_rows,
+    invoices_from_rows,
+    validate_columns,
+)
+
+RejectedRowHandler = Callable[[RejectedRow], None]
 
 
 EXPECTED_COLUMNS = [
@@ -19,14 +29,79 @@ EXPECTED_COLUMNS = [
     "notes",
 ]
 
-
-def load_invoices(path: str) -> List[InvoiceRow]:
-    df = _read_file(path)
-    rows = _normalize_df(df)
-    validation = validate_rows(rows)
-    if validation.errors:
-        raise InvoiceValidationError(validation.errors)
-    return [InvoiceRow(**row) for row in validation.valid_rows]
+NUMBER_PATTERN = r"-?(?:\d+\.?\d*|\.\d+)"
+
+
+def load_invoices(
+    path: str, on_invalid: Optional[RejectedRowHandler] = None
+) -> List[InvoiceRow]:
+    return _to_invoices(_read_file(path), 1, on_invalid)
+
+
+def iter_invoices(
+    path: str,
+    chunk_size: Optional[int] = None,
+    on_invalid: Optional[RejectedRowHandler] = None,
+) -> Iterator[InvoiceRow]:
+    # rows are validated one chunk at a time, so without on_invalid a bad row
+    # only raises once the rows of the chunks before it have been yielded
+    chunk_size = chunk_size or settings.LOADER_CHUNK_SIZE
+    row_offset = 0
+    for df in _iter_file_chunks(path, chunk_size):
+        invoices = _to_invoices(df, row_offset + 1, on_invalid)
+        row_offset += len(df)
+        yield from invoices
+
+
+def load_invoice_batch(
+    path: str, on_invalid: Optional[RejectedRowHandler] = None
+) -> InvoiceBatch:
+    return _to_batch(_read_file(path), 1, on_invalid)
+
+
+def iter_invoice_batches(
+    path: str,
+    chunk_size: Optional[int] = None,
+    on_invalid: Optional[RejectedRowHandler] = None,
+) -> Iterator[InvoiceBatch]:
+    chunk_size = chunk_size or settings.LOADER_CHUNK_SIZE
+    row_offset = 0
+    for df in _iter_file_chunks(path, chunk_size):
+        yield _to_batch(df, row_offset + 1, on_invalid)
+        row_offset += len(df)
+
+
+def _to_invoices(
+    df: pd.DataFrame, start: int, on_invalid: Optional[RejectedRowHandler]
+) -> List[InvoiceRow]:
+    # same validation as _to_batch, so per-invoice and column-wise runs
+    # accept and reject the same rows
+    frame = _normalize_frame(df)
+    valid, rejected = validate_columns(frame, start=start)
+    _handle_rejected(rejected, on_invalid)
+    return invoices_from_rows(frame_to_rows(frame[valid]))
+
+
+def _to_batch(
+    df: pd.DataFrame, start: int, on_invalid: Optional[RejectedRowHandler]
+) -> InvoiceBatch:
+    frame = _normalize_frame(df)
+    valid, rejected = validate_columns(frame, start=start)
+    _handle_rejected(rejected, on_invalid)
+    return InvoiceBatch.from_frame(frame[valid])
+
+
+def _handle_rejected(
+    rejected: List[RejectedRow], on_invalid: Optional[RejectedRowHandler]
+) -> None:
+    if not rejected:
+        return
+    if on_invalid is None:
+        raise InvoiceValidationError(
+            [error for item in rejected for error in item.errors]
+        )
+    for item in rejected:
+        on_invalid(item)
 
 
 def _read_file(path: str) -> pd.DataFrame:
@@ -42,7 +117,70 @@ def _read_file(path: str) -> pd.DataFrame:
     raise ValueError(f"Unsupported file type: {suffix}")
 
 
-def _normalize_df(df: pd.DataFrame) -> List[dict]:
+def _iter_file_chunks(path: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    path_obj = Path(path)
+    if not path_obj.exists():
+        raise FileNotFoundError(f"File not found: {path_obj}")
+
+    suffix = path_obj.suffix.lower()
+    if suffix == ".csv":
+        with pd.read_csv(path_obj, dtype=str, chunksize=chunk_size) as reader:
+            yield from reader
+        return
+    if suffix == ".xlsx":
+        yield from _iter_xlsx_chunks(path_obj, chunk_size)
+        return
+    if suffix == ".xls":
+        # legacy workbooks have no row-streaming reader, slice the full frame
+        df = pd.read_excel(path_obj, dtype=str)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start : start + chunk_size]
+        return
+    raise ValueError(f"Unsupported file type: {suffix}")
+
+
+def _iter_xlsx_chunks(path: Path, chunk_size: int) -> Iterator[pd.DataFrame]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        values = workbook.active.iter_rows(values_only=True)
+        header = next(values, None)
+        if header is None:
+            return
+        columns = [
+            str(value) if value is not None else f"Unnamed: {index}"
+            for index, value in enumerate(header)
+        ]
+        buffer: List[List[Any]] = []
+        for raw_row in values:
+            row = [_stringify_cell(value) for value in raw_row[: len(columns)]]
+            if all(value is None for value in row):
+                continue
+            row.extend([None] * (len(columns) - len(row)))
+            buffer.append(row)
+            if len(buffer) >= chunk_size:
+                yield pd.DataFrame(buffer, columns=columns, dtype=object)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=columns, dtype=object)
+    finally:
+        workbook.close()
+
+
+def _stringify_cell(value: Any) -> Optional[str]:
+    # mirror pd.read_excel(dtype=str) so both readers normalize identically
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, datetime):
+        return str(pd.Timestamp(value))
+    text = str(value)
+    return text if text != "" else None
+
+
+def _normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
     df = df.copy()
     df.columns = [
         str(col).strip().lower().replace(" ", "_") for col in df.columns
@@ -53,56 +191,75 @@ def _normalize_df(df: pd.DataFrame) -> List[dict]:
             df[column] = None
 
     _coerce_dates(df, ["invoice_issue_date", "last_followup_date"])
-    _coerce_numeric(df, "invoice_amount")
-    _coerce_integer(df, "days_overdue")
-
-    rows: List[dict] = []
-    for raw_row in df.to_dict(orient="records"):
-        row = {key: _normalize_missing(value) for key, value in raw_row.items()}
-        row["currency"] = _default_currency(row.get("currency"))
-        row["notes"] = _default_notes(row.get("notes"))
-        row["relationship_tag"] = _normalize_relationship_tag(
-            row.get("relationship_tag")
-        )
-        row["client_name"] = _clean_string(row.get("client_name"))
-        row["invoice_id"] = _clean_string(row.get("invoice_id"))
-        rows.append(row)
-    return rows
 
+    normalizers = {
+        "invoice_amount": _coerce_numeric,
+        "days_overdue": _coerce_integer,
+        "currency": _default_currency,
+        "notes": _default_notes,
+        "relationship_tag": _normalize_relationship_tag,
+        "client_name": _clean_string,
+        "invoice_id": _clean_string,
+    }
+    return pd.DataFrame(
+        {
+            column: normalizers.get(column, _normalize_missing)(df[column])
+            for column in df.columns
+        },
+        index=df.index,
+    )
 
-def _normalize_missing(value: Any) -> Any:
-    if value is None:
-        return None
-    if isinstance(value, float) and pd.isna(value):
-        return None
-    if isinstance(value, str) and value.strip() == "":
-        return None
-    if pd.isna(value):
-        return None
-    return value
 
+def _map_unique(
+    series: pd.Series,
+    transform: Callable[[pd.Series], np.ndarray],
+    fill: Any = None,
+) -> pd.Series:
+    # invoice columns repeat heavily, so normalize each distinct value once
+    # and broadcast back; missing cells (code -1) pick up the trailing fill
+    codes, uniques = pd.factorize(series)
+    mapped = np.empty(len(uniques) + 1, dtype=object)
+    mapped[:-1] = transform(pd.Series(uniques, dtype=object))
+    mapped[-1] = fill
+    return pd.Series(mapped[codes], index=series.index, dtype=object)
 
-def _clean_string(value: Any) -> Any:
-    if value is None:
-        return None
-    return str(value).strip()
 
+def _blank_to_none(values: pd.Series) -> np.ndarray:
+    result = values.to_numpy(dtype=object, copy=True)
+    result[values.astype(str).str.strip().eq("").to_numpy(dtype=bool)] = None
+    return result
 
-def _default_currency(value: Any) -> str:
-    cleaned = _clean_string(value)
-    return cleaned if cleaned else "USD"
 
+def _stripped(values: pd.Series) -> pd.Series:
+    return values.astype(str).str.strip()
 
-def _default_notes(value: Any) -> str:
-    cleaned = _clean_string(value)
-    return cleaned if cleaned is not None else ""
 
+def _normalize_missing(series: pd.Series) -> pd.Series:
+    return _map_unique(series, _blank_to_none)
+
+
+def _clean_string(series: pd.Series) -> pd.Series:
+    return _map_unique(series, lambda values: _blank_to_none(_stripped(values)))
+
+
+def _default_currency(series: pd.Series) -> pd.Series:
+    def transform(values: pd.Series) -> np.ndarray:
+        cleaned = _stripped(values)
+        return cleaned.where(cleaned.ne(""), "USD").to_numpy(dtype=object)
+
+    return _map_unique(series, transform, fill="USD")
+
+
+def _default_notes(series: pd.Series) -> pd.Series:
+    return _map_unique(
+        series, lambda values: _stripped(values).to_numpy(dtype=object), fill=""
+    )
 
-def _normalize_relationship_tag(value: Any) -> Any:
-    cleaned = _clean_string(value)
-    if cleaned is None:
-        return None
-    return cleaned.lower()
+
+def _normalize_relationship_tag(series: pd.Series) -> pd.Series:
+    return _map_unique(
+        series, lambda values: _blank_to_none(_stripped(values).str.lower())
+    )
 
 
 def _coerce_dates(df: pd.DataFrame, cols: List[str]) -> None:
@@ -111,39 +268,35 @@ def _coerce_dates(df: pd.DataFrame, cols: List[str]) -> None:
         df[col] = parsed.dt.strftime("%Y-%m-%d")
 
 
-def _coerce_numeric(df: pd.DataFrame, col: str) -> None:
-    df[col] = df[col].apply(_parse_float)
+def _coerce_numeric(series: pd.Series) -> pd.Series:
+    def transform(values: pd.Series) -> np.ndarray:
+        parsed = _parse_float(values)
+        result = parsed.astype(object)
+        result[np.isnan(parsed)] = None
+        return result
 
+    return _map_unique(series, transform)
 
-def _coerce_integer(df: pd.DataFrame, col: str) -> None:
-    df[col] = df[col].apply(_parse_int)
 
+def _coerce_integer(series: pd.Series) -> pd.Series:
+    def transform(values: pd.Series) -> np.ndarray:
+        parsed = np.trunc(_parse_float(values))
+        result = np.empty(len(parsed), dtype=object)
+        missing = np.isnan(parsed)
+        in_range = ~missing & (np.abs(parsed) < 2**63)
+        result[in_range] = parsed[in_range].astype(np.int64).astype(object)
+        for index in np.flatnonzero(~missing & ~in_range):
+            result[index] = int(parsed[index])
+        return result
 
-def _parse_float(value: Any) -> Any:
-    if value is None or (isinstance(value, float) and pd.isna(value)):
-        return None
-    text = str(value).strip()
-    if not text:
-        return None
-    text = re.sub(r"[^\d.\-]", "", text)
-    if text in {"", "-", ".", "-."}:
-        return None
-    try:
-        return float(text)
-    except ValueError:
-        return None
+    return _map_unique(series, transform)
 
 
-def _parse_int(value: Any) -> Any:
-    if value is None or (isinstance(value, float) and pd.isna(value)):
-        return None
-    text = str(value).strip()
-    if not text:
-        return None
-    text = re.sub(r"[^\d.\-]", "", text)
-    if text in {"", "-", ".", "-."}:
-        return None
-    try:
-        return int(float(text))
-    except ValueError:
-        return None
+def _parse_float(values: pd.Series) -> np.ndarray:
+    # strip everything but digits, dots and minus signs, then keep only the
+    # strings float() accepts so the result matches a per-cell float(text)
+    text = _stripped(values).str.replace(r"[^\d.\-]", "", regex=True)
+    parsable = text.str.fullmatch(NUMBER_PATTERN).to_numpy(dtype=bool)
+    parsed = np.full(len(text), np.nan)
+    parsed[parsable] = text[parsable].to_numpy(dtype=object).astype(np.float64)
+    return parsed
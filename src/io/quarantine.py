@@ -0,0 +1,82 @@
+from __future__ import annotations
+import csv
+import json
+from pathlib import Path
+from typing import IO, Any, List, Optional
+from src.utils.validation import RejectedRow, ValidationErrorInfo
+
+QUARANTINE_FORMATS = {".jsonl", ".csv"}
+
+
+class QuarantineWriter:
+    # rejected rows go straight to disk; only the first max_summary_errors
+    # errors stay in memory for the run summary
+    def __init__(self, path: str, max_summary_errors: int = 20) -> None:
+        self.path = Path(path)
+        self.format = self.path.suffix.lower()
+        if self.format not in QUARANTINE_FORMATS:
+            raise ValueError(f"Unsupported quarantine file type: {self.format}")
+        self.max_summary_errors = max_summary_errors
+        self.row_count = 0
+        self.error_count = 0
+        self.summary_errors: List[ValidationErrorInfo] = []
+        self._handle: Optional[IO[str]] = None
+        self._csv_writer: Optional[Any] = None
+        self._csv_columns: List[str] = []
+
+    def __enter__(self) -> "QuarantineWriter":
+        # the file is only created on the first reject; a file left by an
+        # earlier run must not pass for this run's rejects
+        self.path.unlink(missing_ok=True)
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def __call__(self, rejected: RejectedRow) -> None:
+        self.write(rejected)
+
+    def write(self, rejected: RejectedRow) -> None:
+        handle = self._open()
+        if self.format == ".jsonl":
+            record = {
+                "row_index": rejected.row_index,
+                "row": rejected.row,
+                "errors": [
+                    error.model_dump(exclude={"row_index"})
+                    for error in rejected.errors
+                ],
+            }
+            handle.write(json.dumps(record, default=str) + "\n")
+        else:
+            self._write_csv_row(rejected)
+
+        self.row_count += 1
+        self.error_count += len(rejected.errors)
+        room = self.max_summary_errors - len(self.summary_errors)
+        if room > 0:
+            self.summary_errors.extend(rejected.errors[:room])
+
+    def close(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    def _open(self) -> IO[str]:
+        if self._handle is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._handle = self.path.open("w", encoding="utf-8", newline="")
+        return self._handle
+
+    def _write_csv_row(self, rejected: RejectedRow) -> None:
+        if self._csv_writer is None:
+            self._csv_columns = list(rejected.row)
+            self._csv_writer = csv.writer(self._open())
+            self._csv_writer.writerow(["row_index", *self._csv_columns, "errors"])
+        errors = "; ".join(
+            f"{error.field_path}: {error.message}" for error in rejected.errors
+        )
+        values = [rejected.row.get(column) for column in self._csv_columns]
+        self._csv_writer.writerow(
+            [rejected.row_index, *["" if v is None else v for v in values], errors]
+        )
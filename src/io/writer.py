@@ -1,9 +1,16 @@
 from __future__ import annotations
+import csv
+import json
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
 from datetime import date
 from pathlib import Path
-from typing import Iterable, List, Optional
+from typing import IO, Any, Dict, Iterable, List, Optional, Union
+from src.config import settings
 from src.state import (
     ControlResult,
+    DraftGeneration,
     FollowupDecision,
     FollowupMessage,
     FollowupState,
@@ -11,50 +18,341 @@ from src.state import (
 )
 
 
-def write_markdown_report(states: Iterable[FollowupState], output_path: str) -> str:
-    rows: List[FollowupState] = list(states)
-    lines: List[str] = ["# Follow-up Recommendations", ""]
+REPORT_TITLE = "# Follow-up Recommendations"
+# where MarkdownReportWriter puts the summary table: before the sections (the
+# sections are spooled to a temporary file until close), after them, or in a
+# separate <report>.index.md file; with end and index the report can be
+# tailed while the run progresses
+SUMMARY_PLACEMENTS = ("top", "end", "index")
 
-    lines.extend(_render_summary_table(rows))
-    lines.append("")
 
-    for index, state in enumerate(rows, start=1):
-        lines.extend(_render_invoice_section(state, index=index))
-        lines.append("")
+class MarkdownReportWriter:
+    # renders each state as it arrives; only the current section is held in
+    # memory, whatever the number of invoices
+    def __init__(self, output_path: str, summary: str = "top") -> None:
+        if summary not in SUMMARY_PLACEMENTS:
+            raise ValueError(f"Unsupported summary placement: {summary}")
+        self.path = Path(output_path)
+        self.summary = summary
+        self.index_path = (
+            self.path.with_suffix(".index.md") if summary == "index" else None
+        )
+        self.count = 0
+        self._report: Optional[IO[str]] = None
+        self._sections: Optional[IO[str]] = None
+        self._rows: Optional[IO[str]] = None
+
+    def __enter__(self) -> "MarkdownReportWriter":
+        self.open()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def open(self) -> None:
+        self._report = self.path.open("w", encoding="utf-8")
+        if self.summary == "top":
+            self._rows = self._report
+            self._sections = tempfile.TemporaryFile("w+", encoding="utf-8")
+            self._write_summary_header(self._report)
+        else:
+            self._report.write(f"{REPORT_TITLE}\n")
+            self._sections = self._report
+            if self.summary == "index":
+                self._rows = self.index_path.open("w", encoding="utf-8")
+                self._write_summary_header(self._rows)
+            else:
+                self._rows = tempfile.TemporaryFile("w+", encoding="utf-8")
+
+    def write(self, state: FollowupState) -> None:
+        self.count += 1
+        self._rows.write(_render_summary_row(state) + "\n")
+        section = "\n".join(_render_invoice_section(state, index=self.count))
+        self._sections.write(f"\n{section}\n")
+        # flushed per invoice so the report and index can be tailed
+        if self.summary != "top":
+            self._report.flush()
+        if self.summary == "index":
+            self._rows.flush()
+
+    def close(self) -> None:
+        if self._report is None:
+            return
+        if self.summary == "top":
+            shutil.copyfileobj(_rewound(self._sections), self._report)
+            self._sections.close()
+        elif self.summary == "end":
+            self._write_summary_header(self._report, title=False)
+            shutil.copyfileobj(_rewound(self._rows), self._report)
+            self._rows.close()
+        else:
+            self._rows.close()
+        self._report.close()
+        self._report = self._sections = self._rows = None
+
+    def _write_summary_header(self, handle: IO[str], title: bool = True) -> None:
+        if title:
+            handle.write(f"{REPORT_TITLE}\n")
+        handle.write("\n" + "\n".join(_summary_header()) + "\n")
+
+
+# one flat record per invoice for the machine-readable formats; violations
+# stay lists in JSONL and Parquet and are joined with "; " in CSV
+RECORD_COLUMNS = (
+    "invoice_id",
+    "client_name",
+    "invoice_amount",
+    "currency",
+    "invoice_issue_date",
+    "days_overdue",
+    "last_followup_date",
+    "relationship_tag",
+    "notes",
+    "followup_required",
+    "recommended_timing",
+    "tone",
+    "explanation",
+    "decision_control_passed",
+    "decision_control_violations",
+    "message_control_status",
+    "message_control_violations",
+    "message_withheld_reason",
+    "message_subject",
+    "message_body",
+)
+REPORT_FORMATS = ("md", "jsonl", "csv", "parquet")
+
+
+class RecordWriter(ABC):
+    # shared by the flat formats: subclasses open the file and write records
+    def __init__(self, output_path: str) -> None:
+        self.path = Path(output_path)
+        self.count = 0
+        self._handle: Optional[IO[str]] = None
+
+    def __enter__(self) -> "RecordWriter":
+        self.open()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def write(self, state: FollowupState) -> None:
+        self._write_record(report_record(state))
+        self.count += 1
+
+    @abstractmethod
+    def open(self) -> None: ...
+
+    @abstractmethod
+    def close(self) -> None: ...
+
+    @abstractmethod
+    def _write_record(self, record: Dict[str, Any]) -> None: ...
+
+
+class JsonlReportWriter(RecordWriter):
+    def open(self) -> None:
+        self._handle = self.path.open("w", encoding="utf-8")
+
+    def close(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    def _write_record(self, record: Dict[str, Any]) -> None:
+        self._handle.write(json.dumps(record, default=str) + "\n")
+
+
+class CsvReportWriter(RecordWriter):
+    def open(self) -> None:
+        self._handle = self.path.open("w", encoding="utf-8", newline="")
+        self._csv_writer = csv.writer(self._handle)
+        self._csv_writer.writerow(RECORD_COLUMNS)
+
+    def close(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    def _write_record(self, record: Dict[str, Any]) -> None:
+        values = []
+        for column in RECORD_COLUMNS:
+            value = record[column]
+            if isinstance(value, list):
+                value = "; ".join(value)
+            values.append("" if value is None else value)
+        self._csv_writer.writerow(values)
+
+
+class ParquetReportWriter(RecordWriter):
+    # records are buffered and written as one row group every
+    # PARQUET_ROW_GROUP_SIZE invoices, so memory stays bounded
+    def __init__(self, output_path: str, row_group_size: Optional[int] = None) -> None:
+        super().__init__(output_path)
+        self.row_group_size = row_group_size or settings.PARQUET_ROW_GROUP_SIZE
+        self._rows: List[Dict[str, Any]] = []
+        self._writer = None
+
+    def open(self) -> None:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as exc:
+            raise RuntimeError(
+                "--format parquet requires pyarrow (pip install pyarrow)."
+            ) from exc
+
+        self._pa = pa
+        self._schema = _parquet_schema(pa)
+        self._writer = pq.ParquetWriter(str(self.path), self._schema)
+
+    def close(self) -> None:
+        if self._writer is None:
+            return
+        self._flush()
+        self._writer.close()
+        self._writer = None
+
+    def _write_record(self, record: Dict[str, Any]) -> None:
+        self._rows.append(record)
+        if len(self._rows) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._rows:
+            return
+        table = self._pa.Table.from_pylist(self._rows, schema=self._schema)
+        self._writer.write_table(table)
+        self._rows = []
+
+
+def _parquet_schema(pa: Any) -> Any:
+    types = {
+        "invoice_amount": pa.float64(),
+        "invoice_issue_date": pa.date32(),
+        "days_overdue": pa.int64(),
+        "last_followup_date": pa.date32(),
+        "followup_required": pa.bool_(),
+        "decision_control_passed": pa.bool_(),
+        "decision_control_violations": pa.list_(pa.string()),
+        "message_control_violations": pa.list_(pa.string()),
+    }
+    return pa.schema(
+        [(column, types.get(column, pa.string())) for column in RECORD_COLUMNS]
+    )
 
-    content = "\n".join(lines).rstrip() + "\n"
-    Path(output_path).write_text(content, encoding="utf-8")
-    return content
 
+ReportWriter = Union[MarkdownReportWriter, RecordWriter]
 
-def _render_summary_table(states: List[FollowupState]) -> List[str]:
+
+def open_report_writer(
+    output_path: str, format: str = "md", summary: str = "top"
+) -> ReportWriter:
+    if format == "md":
+        return MarkdownReportWriter(output_path, summary=summary)
+    if format == "jsonl":
+        return JsonlReportWriter(output_path)
+    if format == "csv":
+        return CsvReportWriter(output_path)
+    if format == "parquet":
+        return ParquetReportWriter(output_path)
+    raise ValueError(f"Unsupported report format: {format}")
+
+
+def report_record(state: FollowupState) -> Dict[str, Any]:
+    invoice = state["invoice_data"]
+    decision = state.get("decision")
+    control_decision = state.get("control_decision")
+    control_message = state.get("control_message")
+    message = state.get("message")
+    withhold_reason = _message_withhold_reason(
+        decision, control_decision, control_message
+    )
+    if message is None and withhold_reason is None:
+        withhold_reason = "Message unavailable (not generated)."
+    sendable = message is not None and withhold_reason is None
+    return {
+        "invoice_id": invoice.invoice_id,
+        "client_name": invoice.client_name,
+        "invoice_amount": invoice.invoice_amount,
+        "currency": invoice.currency,
+        "invoice_issue_date": invoice.invoice_issue_date,
+        "days_overdue": invoice.days_overdue,
+        "last_followup_date": invoice.last_followup_date,
+        "relationship_tag": invoice.relationship_tag,
+        "notes": invoice.notes,
+        "followup_required": decision.followup_required if decision else None,
+        "recommended_timing": decision.recommended_timing if decision else None,
+        "tone": decision.tone if decision else None,
+        "explanation": decision.explanation if decision else None,
+        "decision_control_passed": (
+            control_decision.passed if control_decision else None
+        ),
+        "decision_control_violations": (
+            list(control_decision.violations) if control_decision else []
+        ),
+        "message_control_status": (
+            "skipped"
+            if _message_skipped(state)
+            else _control_status(control_message)
+        ),
+        "message_control_violations": (
+            list(control_message.violations) if control_message else []
+        ),
+        "message_withheld_reason": withhold_reason,
+        "message_subject": message.subject if sendable else None,
+        "message_body": message.body.strip() if sendable else None,
+    }
+
+
+def write_markdown_report(
+    states: Iterable[FollowupState], output_path: str, summary: str = "top"
+) -> int:
+    with MarkdownReportWriter(output_path, summary=summary) as writer:
+        for state in states:
+            writer.write(state)
+    return writer.count
+
+
+def _rewound(handle: IO[str]) -> IO[str]:
+    handle.seek(0)
+    return handle
+
+
+def _summary_header() -> List[str]:
     header = (
         "| Invoice ID | Client | Amount | Days Overdue | Timing | Tone | Follow-up | "
         "Decision Control | Message Control |"
     )
     separator = "| --- | --- | --- | --- | --- | --- | --- | --- | --- |"
-    lines = ["## Summary", "", header, separator]
-    for state in states:
-        invoice = state["invoice_data"]
-        decision = state.get("decision")
-        timing = decision.recommended_timing if decision else "unknown"
-        tone = decision.tone if decision else "unknown"
-        required = (
-            "yes"
-            if decision and decision.followup_required
-            else "no"
-            if decision
-            else "unknown"
-        )
-        amount = _format_amount(invoice)
-        control_decision = _control_status(state.get("control_decision"))
-        control_message = _control_status(state.get("control_message"))
-        lines.append(
-            f"| {invoice.invoice_id} | {invoice.client_name} | {amount} | "
-            f"{invoice.days_overdue} | {timing} | {tone} | {required} | "
-            f"{control_decision} | {control_message} |"
-        )
-    return lines
+    return ["## Summary", "", header, separator]
+
+
+def _render_summary_row(state: FollowupState) -> str:
+    invoice = state["invoice_data"]
+    decision = state.get("decision")
+    timing = decision.recommended_timing if decision else "unknown"
+    tone = decision.tone if decision else "unknown"
+    required = (
+        "yes"
+        if decision and decision.followup_required
+        else "no"
+        if decision
+        else "unknown"
+    )
+    amount = _format_amount(invoice)
+    control_decision = _control_status(state.get("control_decision"))
+    control_message = (
+        "skipped"
+        if _message_skipped(state)
+        else _control_status(state.get("control_message"))
+    )
+    return (
+        f"| {invoice.invoice_id} | {invoice.client_name} | {amount} | "
+        f"{invoice.days_overdue} | {timing} | {tone} | {required} | "
+        f"{control_decision} | {control_message} |"
+    )
 
 
 def _render_invoice_section(state: FollowupState, index: int) -> List[str]:
@@ -90,11 +388,15 @@ def _render_invoice_section(state: FollowupState, index: int) -> List[str]:
     lines.append("**Control Checks**")
     if control_decision or control_message:
         lines.extend(_render_control_block("Decision", control_decision))
-        lines.extend(_render_control_block("Message", control_message))
+        if _message_skipped(state):
+            lines.append("- Message Control: skipped (no draft requested)")
+        else:
+            lines.extend(_render_control_block("Message", control_message))
     else:
         lines.append("- Control: unavailable")
     lines.append("")
     lines.append("**Message Draft**")
+    lines.extend(_render_generation(state.get("generation")))
     withhold_reason = _message_withhold_reason(
         decision, control_decision, control_message
     )
@@ -159,6 +461,36 @@ def _render_control_block(
     return [f"- {label} Control: {status} ({violations})"]
 
 
+def _render_generation(generation: Optional[DraftGeneration]) -> List[str]:
+    if generation is None:
+        return []
+    lines = []
+    if generation.first_byte_seconds is not None:
+        lines.append(f"- First Byte: {generation.first_byte_seconds:.2f}s")
+    if generation.aborted:
+        lines.append(
+            f"- Aborted Attempts: {len(generation.aborted)} of "
+            f"{generation.attempts} ({'; '.join(generation.aborted)})"
+        )
+    return lines
+
+
+def _message_skipped(state: FollowupState) -> bool:
+    # the workflow ends before drafting for no-follow-up and failed-control
+    # states, so they never get a message control result
+    if state.get("control_message") is not None:
+        return False
+    decision = state.get("decision")
+    control_decision = state.get("control_decision")
+    if decision is None:
+        return False
+    return (
+        not decision.followup_required
+        or decision.recommended_timing == "skip"
+        or (control_decision is not None and not control_decision.passed)
+    )
+
+
 def _message_withhold_reason(
     decision: Optional[FollowupDecision],
     control_decision: Optional[ControlResult],
@@ -1,26 +1,69 @@
 from __future__ import annotations
+import asyncio
+import importlib.util
 import os
+from contextlib import nullcontext
+from functools import partial
+from itertools import islice
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
 import typer
 from dotenv import load_dotenv
 from rich.console import Console
 from rich.table import Table
-from src.agents import run_context_agent, run_decision_agent
-from src.graph import build_workflow
-from src.io.loader import load_invoices
-from src.io.writer import write_markdown_report
-from src.state import FollowupState
+from src.agents import iter_batch_states, message_call_avoided, run_control_agent
+from src.agents.message_agent import (
+    LLM_POLICIES,
+    MessageGenerationError,
+    generation_stats,
+    message_from_content,
+)
+from src.agents.parallel import iter_deterministic_parallel, run_deterministic_batch
+from src.config import settings
+from src.graph import (
+    aiter_in_order,
+    build_workflow,
+    invoke_resumable,
+    run_batched,
+    run_consolidated,
+    run_pipeline,
+)
+from src.io.loader import (
+    iter_invoice_batches,
+    iter_invoices,
+    load_invoice_batch,
+    load_invoices,
+)
+from src.io.batch_jobs import BatchJobWriter, iter_prepared_states, read_batch_results
+from src.io.checkpoints import (
+    RunStore,
+    input_fingerprint,
+    new_run_id,
+    open_async_saver,
+    open_run_store,
+)
+from src.io.draft_cache import open_draft_cache
+from src.io.quarantine import QuarantineWriter
+from src.io.writer import (
+    REPORT_FORMATS,
+    SUMMARY_PLACEMENTS,
+    MarkdownReportWriter,
+    ReportWriter,
+    open_report_writer,
+)
+from src.state import FollowupState, InvoiceBatch, InvoiceRow
+from src.utils.llm_client import aclose_llm_clients
+from src.utils.validation import format_validation_error
 
 app = typer.Typer(add_completion=False)
 console = Console()
 
 
-@app.command("run")
+@app.command("run", help="Process invoices end to end and write the report.")
 def run_followups(
     path: str = typer.Argument(..., help="Path to CSV or Excel invoice file."),
-    output: str = typer.Option(
-        "outputs/report.md", help="Output path for the Markdown report."
+    output: Optional[str] = typer.Option(
+        None, help="Output path for the report (default outputs/report.<format>)."
     ),
     limit: Optional[int] = typer.Option(
         None, help="Limit number of invoice rows processed."
@@ -29,46 +72,511 @@ def run_followups(
         False, "--dry-run", help="Skip LLM message generation."
     ),
     format: str = typer.Option(
-        "md", "--format", help="Output format (only md supported)."
+        "md", "--format", help="Report format: md, jsonl, csv or parquet."
+    ),
+    summary: str = typer.Option(
+        "top",
+        "--summary",
+        help="Report summary table placement: top, end or index (separate file).",
+    ),
+    stream: bool = typer.Option(
+        False,
+        "--stream",
+        help="Read and validate the input in chunks instead of all at once.",
+    ),
+    chunk_size: Optional[int] = typer.Option(
+        None, "--chunk-size", help="Rows per chunk when --stream is set."
+    ),
+    on_invalid: str = typer.Option(
+        "raise",
+        "--on-invalid",
+        help="What to do with rows that fail validation (raise or quarantine).",
+    ),
+    quarantine_path: str = typer.Option(
+        "outputs/quarantine.jsonl",
+        "--quarantine-path",
+        help="JSONL or CSV file for rejected rows when --on-invalid=quarantine.",
+    ),
+    concurrency: int = typer.Option(
+        1,
+        "--concurrency",
+        help="Message drafts in flight at once (rate limited by the LLM_* settings).",
+    ),
+    batch_size: int = typer.Option(
+        1,
+        "--batch-size",
+        help="Invoices drafted per LLM request (fewer if the token budget is hit).",
+    ),
+    no_cache: bool = typer.Option(
+        False,
+        "--no-cache",
+        help="Regenerate every draft instead of reusing cached ones.",
+    ),
+    llm_policy: str = typer.Option(
+        "llm",
+        "--llm-policy",
+        help="llm, hybrid (templates for standard cases) or templates only.",
+    ),
+    consolidate: bool = typer.Option(
+        False,
+        "--consolidate",
+        help="Draft one message per client and timing instead of per invoice.",
+    ),
+    stream_drafts: bool = typer.Option(
+        False,
+        "--stream-drafts",
+        help="Stream drafts and cut them off as soon as a control phrase appears.",
+    ),
+    checkpoint: bool = typer.Option(
+        False,
+        "--checkpoint",
+        help="Checkpoint every workflow step so an interrupted run can resume.",
+    ),
+    resume: Optional[str] = typer.Option(
+        None,
+        "--resume",
+        help="Run id of an interrupted run to continue from its checkpoints.",
+    ),
+    workers: int = typer.Option(
+        1,
+        "--workers",
+        help="Processes for the deterministic stages (context, decision, control).",
+    ),
+    pipeline: bool = typer.Option(
+        False,
+        "--pipeline",
+        help="Load and apply rules while drafts are in flight (--concurrency drafts).",
     ),
 ) -> None:
     load_dotenv()
-    if format != "md":
-        raise typer.BadParameter("Only --format md is supported.")
+    _check_report_options(format, summary)
+    if on_invalid not in {"raise", "quarantine"}:
+        raise typer.BadParameter("--on-invalid must be raise or quarantine.")
+    if concurrency < 1:
+        raise typer.BadParameter("--concurrency must be at least 1.")
+    if llm_policy not in LLM_POLICIES:
+        raise typer.BadParameter("--llm-policy must be llm, hybrid or templates.")
+    if batch_size < 1:
+        raise typer.BadParameter("--batch-size must be at least 1.")
+    if sum([batch_size > 1, concurrency > 1, consolidate]) > 1:
+        raise typer.BadParameter(
+            "Use only one of --batch-size, --concurrency and --consolidate."
+        )
+    if stream_drafts and (batch_size > 1 or consolidate):
+        raise typer.BadParameter(
+            "--stream-drafts drafts one invoice per request; it cannot be "
+            "combined with --batch-size or --consolidate."
+        )
+    if workers < 1:
+        raise typer.BadParameter("--workers must be at least 1.")
+    if workers > 1 and not dry_run:
+        raise typer.BadParameter("--workers applies to --dry-run runs.")
+    if pipeline and (dry_run or batch_size > 1 or consolidate):
+        raise typer.BadParameter(
+            "--pipeline drafts one invoice per request; it cannot be combined "
+            "with --dry-run, --batch-size or --consolidate."
+        )
+    if (checkpoint or resume) and (
+        dry_run or batch_size > 1 or consolidate or pipeline
+    ):
+        raise typer.BadParameter(
+            "--checkpoint and --resume only apply to per-invoice and "
+            "--concurrency runs."
+        )
 
-    if not dry_run and not os.getenv("OPENAI_API_KEY"):
+    if not dry_run and llm_policy != "templates" and not os.getenv("OPENAI_API_KEY"):
         raise typer.BadParameter(
-            "OPENAI_API_KEY is required unless --dry-run is set."
+            "OPENAI_API_KEY is required unless --dry-run or "
+            "--llm-policy templates is set."
         )
 
-    invoices = load_invoices(path)
-    if limit:
-        invoices = invoices[:limit]
+    quarantine = (
+        QuarantineWriter(quarantine_path) if on_invalid == "quarantine" else None
+    )
+    draft_cache = open_draft_cache() if not dry_run and not no_cache else None
+    generation_stats.reset()
+    report = _open_report(output, format, summary)
+    rows: List[Tuple[str, ...]] = []
+    avoided = 0
 
-    workflow = build_workflow()
-    results: List[FollowupState] = []
-    for invoice in invoices:
-        state: FollowupState = {"invoice_data": invoice}
+    def emit(state: FollowupState) -> None:
+        # states go to the report as they are produced; the console only
+        # keeps the first few summary rows
+        nonlocal avoided
+        report.write(state)
+        if len(rows) < settings.CONSOLE_SUMMARY_ROWS:
+            rows.append(_summary_row(state))
+        if not dry_run:
+            avoided += message_call_avoided(state)
+
+    with quarantine or nullcontext(), draft_cache or nullcontext(), report:
         if dry_run:
-            state = _run_without_message(state)
+            # deterministic stages run column-wise; states are only built for
+            # the report
+            batches = _load_batches(path, stream, chunk_size, limit, quarantine)
+            for batch in _run_deterministic(batches, workers):
+                _emit_all(iter_batch_states(batch), emit)
+        else:
+            invoices: Iterable[InvoiceRow]
+            if stream:
+                invoices = iter_invoices(
+                    path, chunk_size=chunk_size, on_invalid=quarantine
+                )
+                if limit:
+                    invoices = islice(invoices, limit)
+            else:
+                invoices = load_invoices(path, on_invalid=quarantine)
+                if limit:
+                    invoices = invoices[:limit]
+
+            workflow_options = {
+                "draft_cache": draft_cache,
+                "llm_policy": llm_policy,
+                "stream_drafts": stream_drafts,
+            }
+            if consolidate:
+                _emit_all(
+                    run_consolidated(invoices, draft_cache, llm_policy=llm_policy),
+                    emit,
+                )
+            elif pipeline:
+                asyncio.run(
+                    _run_pipeline(invoices, emit, concurrency, workflow_options)
+                )
+            elif batch_size > 1:
+                _emit_all(
+                    run_batched(
+                        invoices, batch_size, draft_cache, llm_policy=llm_policy
+                    ),
+                    emit,
+                )
+            elif checkpoint or resume:
+                fingerprint = input_fingerprint(path, limit)
+                _run_checkpointed(
+                    invoices, emit, concurrency, resume, fingerprint, workflow_options
+                )
+            elif concurrency > 1:
+                asyncio.run(
+                    _run_concurrently(invoices, emit, concurrency, workflow_options)
+                )
+            else:
+                workflow = build_workflow(**workflow_options)
+                for invoice in invoices:
+                    emit(workflow.invoke({"invoice_data": invoice}))
+
+    _render_summary(rows, report)
+    if quarantine is not None:
+        _render_quarantine_summary(quarantine)
+    if not dry_run:
+        console.print(f"LLM calls avoided (decision control failed): {avoided}")
+        console.print(
+            f"LLM drafts: {generation_stats.structured} structured, "
+            f"{generation_stats.parsed_from_text} parsed from text; "
+            f"{generation_stats.parse_failures} parse failures, "
+            f"{generation_stats.retries} retries"
+        )
+        if stream_drafts:
+            console.print(
+                f"Draft streams aborted on a control phrase: "
+                f"{generation_stats.stream_aborts}"
+            )
+    if draft_cache is not None:
+        console.print(
+            f"Draft cache: {draft_cache.hits} hits, {draft_cache.misses} misses "
+            f"({draft_cache.path})"
+        )
+
+
+@app.command(
+    "prepare", help="Run the deterministic stages and export draft requests."
+)
+def prepare_followups(
+    path: str = typer.Argument(..., help="Path to CSV or Excel invoice file."),
+    out_dir: str = typer.Option(
+        "outputs/batch",
+        "--out-dir",
+        help="Directory for requests.jsonl and states.jsonl.",
+    ),
+    limit: Optional[int] = typer.Option(
+        None, help="Limit number of invoice rows processed."
+    ),
+    stream: bool = typer.Option(
+        False,
+        "--stream",
+        help="Read and validate the input in chunks instead of all at once.",
+    ),
+    chunk_size: Optional[int] = typer.Option(
+        None, "--chunk-size", help="Rows per chunk when --stream is set."
+    ),
+    on_invalid: str = typer.Option(
+        "raise",
+        "--on-invalid",
+        help="What to do with rows that fail validation (raise or quarantine).",
+    ),
+    quarantine_path: str = typer.Option(
+        "outputs/quarantine.jsonl",
+        "--quarantine-path",
+        help="JSONL or CSV file for rejected rows when --on-invalid=quarantine.",
+    ),
+    workers: int = typer.Option(
+        1,
+        "--workers",
+        help="Processes for the deterministic stages (context, decision, control).",
+    ),
+) -> None:
+    # offline phase one: deterministic stages plus one batch API request per
+    # draft; submit requests.jsonl and pass the output file to `ingest`
+    if on_invalid not in {"raise", "quarantine"}:
+        raise typer.BadParameter("--on-invalid must be raise or quarantine.")
+    if workers < 1:
+        raise typer.BadParameter("--workers must be at least 1.")
+    quarantine = (
+        QuarantineWriter(quarantine_path) if on_invalid == "quarantine" else None
+    )
+    with quarantine or nullcontext(), BatchJobWriter(out_dir) as writer:
+        batches = _load_batches(path, stream, chunk_size, limit, quarantine)
+        for batch in _run_deterministic(batches, workers):
+            for state in iter_batch_states(batch):
+                writer.write(state)
+
+    console.print(
+        f"Prepared {writer.request_count} draft requests for "
+        f"{writer.state_count} invoices in {writer.directory}"
+    )
+    if quarantine is not None:
+        _render_quarantine_summary(quarantine)
+
+
+@app.command(
+    "ingest", help="Attach drafts from a batch results file and write the report."
+)
+def ingest_followups(
+    prepared_dir: str = typer.Argument(
+        ..., help="Directory written by the prepare command."
+    ),
+    results_path: str = typer.Argument(
+        ..., help="Batch output JSONL holding the generated drafts."
+    ),
+    output: Optional[str] = typer.Option(
+        None, help="Output path for the report (default outputs/report.<format>)."
+    ),
+    format: str = typer.Option(
+        "md", "--format", help="Report format: md, jsonl, csv or parquet."
+    ),
+    summary: str = typer.Option(
+        "top",
+        "--summary",
+        help="Report summary table placement: top, end or index (separate file).",
+    ),
+) -> None:
+    _check_report_options(format, summary)
+    drafts = read_batch_results(results_path)
+    report = _open_report(output, format, summary)
+    rows: List[Tuple[str, ...]] = []
+    failed = 0
+    with report:
+        for custom_id, state in iter_prepared_states(prepared_dir):
+            if custom_id is not None:
+                content = drafts.get(custom_id)
+                try:
+                    if content is None:
+                        raise MessageGenerationError("No draft in the results file.")
+                    state = dict(state)
+                    state["message"] = message_from_content(content)
+                except MessageGenerationError as exc:
+                    # left without a message, the control stage reports it
+                    failed += 1
+                    console.print(f"  {custom_id}: {exc}", markup=False)
+                state = run_control_agent(state, stage="message")
+            report.write(state)
+            if len(rows) < settings.CONSOLE_SUMMARY_ROWS:
+                rows.append(_summary_row(state))
+
+    _render_summary(rows, report)
+    if failed:
+        console.print(f"{failed} drafts were missing or invalid.")
+
+
+@app.command("prune-runs", help="Delete checkpointed runs (--checkpoint).")
+def prune_runs(
+    keep: int = typer.Option(
+        0, "--keep", help="Number of most recent runs to keep."
+    ),
+) -> None:
+    if keep < 0:
+        raise typer.BadParameter("--keep must be at least 0.")
+    with open_run_store() as run_store:
+        removed = run_store.prune(keep)
+    console.print(f"Deleted {len(removed)} checkpointed runs ({run_store.path})")
+
+
+def _load_batches(
+    path: str,
+    stream: bool,
+    chunk_size: Optional[int],
+    limit: Optional[int],
+    quarantine: Optional[QuarantineWriter],
+) -> Iterator[InvoiceBatch]:
+    batches: Iterable[InvoiceBatch]
+    if stream:
+        batches = iter_invoice_batches(
+            path, chunk_size=chunk_size, on_invalid=quarantine
+        )
+    else:
+        batches = [load_invoice_batch(path, on_invalid=quarantine)]
+
+    remaining = limit or None
+    for batch in batches:
+        if remaining is not None:
+            batch = batch.take(slice(0, remaining))
+            remaining -= len(batch)
+        yield batch
+        if remaining is not None and remaining <= 0:
+            return
+
+
+def _run_checkpointed(
+    invoices: Iterable[InvoiceRow],
+    emit: Callable[[FollowupState], None],
+    concurrency: int,
+    resume: Optional[str],
+    fingerprint: str,
+    workflow_options: dict,
+) -> None:
+    # every node's output is checkpointed per run and invoice; on resume,
+    # finished invoices are read back from the store and emitted in input
+    # order along with the ones still being drafted
+    with open_run_store() as run_store:
+        if resume:
+            stored = run_store.run_fingerprint(resume)
+            if stored is None:
+                raise typer.BadParameter(f"No checkpoints for run id {resume}.")
+            if stored != fingerprint:
+                raise typer.BadParameter(
+                    f"Run {resume} was started on different input (file, "
+                    "contents or --limit); start a new run instead."
+                )
+        run_id = resume or new_run_id()
+        if not resume:
+            run_store.start_run(run_id, fingerprint)
+        console.print(f"Run ID: {run_id} (continue with --resume {run_id})")
+        if concurrency > 1:
+            asyncio.run(
+                _run_checkpointed_concurrently(
+                    invoices, emit, concurrency, run_store, run_id, workflow_options
+                )
+            )
         else:
-            state = workflow.invoke(state)
-        results.append(state)
+            workflow = build_workflow(checkpointer=run_store.saver, **workflow_options)
+            for position, invoice in enumerate(invoices):
+                config = run_store.register(run_id, position, invoice.invoice_id)
+                emit(invoke_resumable(workflow, invoice, config))
+
+
+async def _run_concurrently(
+    invoices: Iterable[InvoiceRow],
+    emit: Callable[[FollowupState], None],
+    concurrency: int,
+    workflow_options: dict,
+) -> None:
+    try:
+        workflow = build_workflow(**workflow_options)
+        async for state in aiter_in_order(workflow, invoices, concurrency):
+            emit(state)
+    finally:
+        await aclose_llm_clients()
+
 
-    output_path = Path(output)
+async def _run_checkpointed_concurrently(
+    invoices: Iterable[InvoiceRow],
+    emit: Callable[[FollowupState], None],
+    concurrency: int,
+    run_store: RunStore,
+    run_id: str,
+    workflow_options: dict,
+) -> None:
+    try:
+        async with open_async_saver(str(run_store.path)) as saver:
+            workflow = build_workflow(checkpointer=saver, **workflow_options)
+            states = aiter_in_order(
+                workflow,
+                invoices,
+                concurrency,
+                config_for=partial(run_store.register, run_id),
+            )
+            async for state in states:
+                emit(state)
+    finally:
+        await aclose_llm_clients()
+
+
+async def _run_pipeline(
+    invoices: Iterable[InvoiceRow],
+    sink,
+    concurrency: int,
+    workflow_options: dict,
+) -> None:
+    try:
+        await run_pipeline(
+            invoices, sink, message_workers=concurrency, **workflow_options
+        )
+    finally:
+        await aclose_llm_clients()
+
+
+def _run_deterministic(
+    batches: Iterable[InvoiceBatch], workers: int
+) -> Iterator[InvoiceBatch]:
+    # context, decision and decision control only, skip message generation
+    if workers > 1:
+        return iter_deterministic_parallel(batches, workers)
+    return map(run_deterministic_batch, batches)
+
+
+def _check_report_options(format: str, summary: str) -> None:
+    if format not in REPORT_FORMATS:
+        raise typer.BadParameter("--format must be md, jsonl, csv or parquet.")
+    if summary not in SUMMARY_PLACEMENTS:
+        raise typer.BadParameter("--summary must be top, end or index.")
+    if summary != "top" and format != "md":
+        raise typer.BadParameter("--summary applies to --format md.")
+    if format == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        raise typer.BadParameter(
+            "--format parquet requires pyarrow (pip install pyarrow)."
+        )
+
+
+def _open_report(output: Optional[str], format: str, summary: str) -> ReportWriter:
+    output_path = Path(output or f"outputs/report.{format}")
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    write_markdown_report(results, str(output_path))
-    _render_summary(results, str(output_path))
+    return open_report_writer(str(output_path), format=format, summary=summary)
+
+
+def _emit_all(
+    states: Iterable[FollowupState], emit: Callable[[FollowupState], None]
+) -> None:
+    for state in states:
+        emit(state)
 
 
-def _run_without_message(state: FollowupState) -> FollowupState:
-    # run through context and decision nodes only, skip message generation
-    state = run_context_agent(state)
-    state = run_decision_agent(state)
-    return state
+def _summary_row(state: FollowupState) -> Tuple[str, ...]:
+    invoice = state["invoice_data"]
+    decision = state.get("decision")
+    timing = decision.recommended_timing if decision else "unknown"
+    tone = decision.tone if decision else "unknown"
+    required = (
+        "yes"
+        if decision and decision.followup_required
+        else "no"
+        if decision
+        else "unknown"
+    )
+    return (invoice.invoice_id, invoice.client_name, timing, tone, required)
 
 
-def _render_summary(states: List[FollowupState], output_path: str) -> None:
+def _render_summary(
+    rows: List[Tuple[str, ...]], report: ReportWriter
+) -> None:
     table = Table(title="Follow-up Summary")
     table.add_column("Invoice ID")
     table.add_column("Client")
@@ -76,22 +584,30 @@ def _render_summary(states: List[FollowupState], output_path: str) -> None:
     table.add_column("Tone")
     table.add_column("Follow-up")
 
-    for state in states:
-        invoice = state["invoice_data"]
-        decision = state.get("decision")
-        timing = decision.recommended_timing if decision else "unknown"
-        tone = decision.tone if decision else "unknown"
-        required = (
-            "yes"
-            if decision and decision.followup_required
-            else "no"
-            if decision
-            else "unknown"
-        )
-        table.add_row(invoice.invoice_id, invoice.client_name, timing, tone, required)
+    for row in rows:
+        table.add_row(*row)
 
     console.print(table)
-    console.print(f"Report written to {output_path}")
+    if report.count > len(rows):
+        console.print(f"… and {report.count - len(rows)} more")
+    console.print(f"Report written to {report.path}")
+    if isinstance(report, MarkdownReportWriter) and report.index_path is not None:
+        console.print(f"Summary index written to {report.index_path}")
+
+
+def _render_quarantine_summary(quarantine: QuarantineWriter) -> None:
+    if not quarantine.row_count:
+        console.print("No rows quarantined.")
+        return
+    console.print(
+        f"Quarantined {quarantine.row_count} rows "
+        f"({quarantine.error_count} errors) to {quarantine.path}"
+    )
+    for error in quarantine.summary_errors:
+        console.print(f"  {format_validation_error(error)}", markup=False)
+    hidden = quarantine.error_count - len(quarantine.summary_errors)
+    if hidden > 0:
+        console.print(f"  ... and {hidden} more errors")
 
 
 def main() -> None:
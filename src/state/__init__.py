@@ -1,17 +1,25 @@
 from .state import (
     ControlResult,
+    DraftGeneration,
     FollowupDecision,
     FollowupMessage,
     FollowupState,
     InvoiceContext,
     InvoiceRow,
+    InvoiceSignals,
+    NotesSignals,
 )
+from .batch import InvoiceBatch
 
 __all__ = [
     "ControlResult",
+    "DraftGeneration",
     "FollowupDecision",
     "FollowupMessage",
     "FollowupState",
+    "InvoiceBatch",
     "InvoiceContext",
     "InvoiceRow",
+    "InvoiceSignals",
+    "NotesSignals",
 ]
\ No newline at end of file
@@ -0,0 +1,102 @@
+from __future__ import annotations
+from dataclasses import dataclass, fields, replace
+from typing import Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from .state import InvoiceRow, NotesSignals
+
+RELATIONSHIP_TAGS = ("new", "recurring", "vip", "risky")
+RISK_LEVELS = ("low", "medium", "high")
+TIMINGS = ("now", "wait_3_days", "wait_7_days", "skip")
+TONES = ("soft", "neutral", "firm")
+
+# sentinel for "no previous follow-up" in integer day columns
+NO_FOLLOWUP = -1
+
+
+@dataclass(frozen=True)
+class InvoiceBatch:
+    # one array per InvoiceRow field; string fields stay object arrays, tags
+    # and decision outputs are small integer codes into the tuples above
+    client_name: np.ndarray
+    invoice_id: np.ndarray
+    invoice_amount: np.ndarray
+    currency: np.ndarray
+    invoice_issue_date: np.ndarray
+    days_overdue: np.ndarray
+    last_followup_date: np.ndarray
+    relationship_code: np.ndarray
+    notes: np.ndarray
+
+    # context stage
+    days_since_followup: Optional[np.ndarray] = None
+    notes_code: Optional[np.ndarray] = None
+    notes_signals: Optional[Tuple[NotesSignals, ...]] = None
+    risk_code: Optional[np.ndarray] = None
+    risk_score: Optional[np.ndarray] = None
+
+    # decision stage
+    followup_required: Optional[np.ndarray] = None
+    timing_code: Optional[np.ndarray] = None
+    tone_code: Optional[np.ndarray] = None
+    rules_code: Optional[np.ndarray] = None
+    rule_sets: Optional[Tuple[Tuple[str, ...], ...]] = None
+
+    # decision control stage
+    control_passed: Optional[np.ndarray] = None
+    tone_cap_code: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.invoice_id)
+
+    @classmethod
+    def from_invoices(cls, invoices: Sequence[InvoiceRow]) -> "InvoiceBatch":
+        return cls.from_frame(
+            pd.DataFrame([invoice.model_dump() for invoice in invoices])
+        )
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "InvoiceBatch":
+        # expects loader-normalized, already validated columns
+        relationship_index = {tag: code for code, tag in enumerate(RELATIONSHIP_TAGS)}
+        return cls(
+            client_name=df["client_name"].to_numpy(dtype=object),
+            invoice_id=df["invoice_id"].to_numpy(dtype=object),
+            invoice_amount=df["invoice_amount"].to_numpy(dtype=np.float64),
+            currency=df["currency"].to_numpy(dtype=object),
+            invoice_issue_date=_to_days(df["invoice_issue_date"]),
+            days_overdue=df["days_overdue"].to_numpy(dtype=np.int64),
+            last_followup_date=_to_days(df["last_followup_date"]),
+            relationship_code=df["relationship_tag"]
+            .map(relationship_index)
+            .to_numpy(dtype=np.int8),
+            notes=df["notes"].to_numpy(dtype=object),
+        )
+
+    def take(self, index: slice | np.ndarray) -> "InvoiceBatch":
+        changes = {}
+        for item in fields(self):
+            value = getattr(self, item.name)
+            if isinstance(value, np.ndarray):
+                changes[item.name] = value[index]
+        return replace(self, **changes)
+
+    def invoice(self, index: int) -> InvoiceRow:
+        last_followup = self.last_followup_date[index]
+        return InvoiceRow(
+            client_name=self.client_name[index],
+            invoice_id=self.invoice_id[index],
+            invoice_amount=float(self.invoice_amount[index]),
+            currency=self.currency[index],
+            invoice_issue_date=self.invoice_issue_date[index].item(),
+            days_overdue=int(self.days_overdue[index]),
+            last_followup_date=(
+                None if np.isnat(last_followup) else last_followup.item()
+            ),
+            relationship_tag=RELATIONSHIP_TAGS[self.relationship_code[index]],
+            notes=self.notes[index],
+        )
+
+
+def _to_days(series: pd.Series) -> np.ndarray:
+    return pd.to_datetime(series, errors="coerce").to_numpy(dtype="datetime64[D]")
@@ -0,0 +1,56 @@
+from __future__ import annotations
+from dataclasses import asdict
+from typing import Any, Dict, Type
+from pydantic import BaseModel
+from .state import (
+    ControlResult,
+    DraftGeneration,
+    FollowupDecision,
+    FollowupMessage,
+    FollowupState,
+    InvoiceContext,
+    InvoiceRow,
+    InvoiceSignals,
+    NotesSignals,
+)
+
+STATE_MODELS: Dict[str, Type[BaseModel]] = {
+    "invoice_data": InvoiceRow,
+    "context": InvoiceContext,
+    "decision": FollowupDecision,
+    "message": FollowupMessage,
+    "generation": DraftGeneration,
+    "control_decision": ControlResult,
+    "control_message": ControlResult,
+}
+
+
+def state_to_dict(state: FollowupState) -> Dict[str, Any]:
+    # JSON-safe form of a FollowupState; state_from_dict restores it exactly
+    data: Dict[str, Any] = {}
+    for key, value in state.items():
+        if key == "signals":
+            data[key] = asdict(value)
+        elif key in STATE_MODELS:
+            data[key] = value.model_dump(mode="json")
+        else:
+            raise ValueError(f"Unknown state key: {key}")
+    return data
+
+
+def state_from_dict(data: Dict[str, Any]) -> FollowupState:
+    state: FollowupState = {}
+    for key, value in data.items():
+        if key == "signals":
+            notes = {name: tuple(items) for name, items in value["notes"].items()}
+            state[key] = InvoiceSignals(
+                notes=NotesSignals(**notes),
+                days_since_followup=value["days_since_followup"],
+                risk_level=value["risk_level"],
+                risk_score=value["risk_score"],
+            )
+        elif key in STATE_MODELS:
+            state[key] = STATE_MODELS[key].model_validate(value)
+        else:
+            raise ValueError(f"Unknown state key: {key}")
+    return state
@@ -1,5 +1,6 @@
+from dataclasses import dataclass
 from pydantic import BaseModel, Field
-from typing import List, Optional, Literal
+from typing import List, Optional, Literal, Tuple
 from datetime import date
 from typing_extensions import TypedDict
 
@@ -14,6 +15,24 @@ class InvoiceRow(BaseModel):
     relationship_tag: Literal["new", "recurring", "vip", "risky"]
     notes: str = ""
 
+@dataclass(frozen=True)
+class NotesSignals:
+    # tuples because extracted signals are memoized and shared across invoices
+    high: Tuple[str, ...]
+    low: Tuple[str, ...]
+    soften: Tuple[str, ...]
+    no_followup: Tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class InvoiceSignals:
+    # structured context results, kept so later agents do not recompute them
+    notes: NotesSignals
+    days_since_followup: Optional[int]
+    risk_level: Literal["low", "medium", "high"]
+    risk_score: int
+
+
 class InvoiceContext(BaseModel):
     risk_level: Literal["low", "medium", "high"]
     relationship_summary: str
@@ -34,6 +53,14 @@ class FollowupMessage(BaseModel):
     reasoning: str
 
 
+class DraftGeneration(BaseModel):
+    # streamed drafting: time to the first chunk of the attempt that produced
+    # the draft, and the violation that cut off each aborted attempt
+    first_byte_seconds: Optional[float] = None
+    attempts: int = 0
+    aborted: List[str] = Field(default_factory=list)
+
+
 class ControlResult(BaseModel):
     stage: Literal["decision", "message"]
     passed: bool
@@ -42,7 +69,9 @@ class ControlResult(BaseModel):
 class FollowupState(TypedDict, total=False):
     invoice_data: InvoiceRow
     context: InvoiceContext
+    signals: InvoiceSignals
     decision: FollowupDecision
     message: FollowupMessage
+    generation: DraftGeneration
     control_decision: ControlResult
     control_message: ControlResult
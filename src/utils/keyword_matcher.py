@@ -0,0 +1,83 @@
+from __future__ import annotations
+import re
+from typing import Dict, List, Mapping, Optional, Pattern, Sequence, Tuple
+
+
+class KeywordMatcher:
+    # Matches several keyword categories against a text in one call. Each
+    # distinct keyword is searched once no matter how many categories list it,
+    # and a keyword is skipped outright when a shorter keyword it contains
+    # (e.g. "paid" inside "paid on time") does not occur in the text at all.
+    # With word_boundary only a missing substring prunes: "paid" is not a
+    # whole word in "still unpaid", yet "unpaid" still has to be searched.
+    def __init__(
+        self, categories: Mapping[str, Sequence[str]], word_boundary: bool = False
+    ) -> None:
+        self.word_boundary = word_boundary
+        self._categories: Tuple[Tuple[str, Tuple[str, ...]], ...] = tuple(
+            (name, tuple(keywords))
+            for name, keywords in categories.items()
+        )
+        keywords = sorted(
+            {keyword for _, items in self._categories for keyword in items},
+            key=lambda keyword: (len(keyword), keyword),
+        )
+        self._keywords: Tuple[Tuple[str, Tuple[str, ...]], ...] = tuple(
+            (
+                keyword,
+                tuple(
+                    other
+                    for other in keywords[:position]
+                    if other in keyword and other != keyword
+                ),
+            )
+            for position, keyword in enumerate(keywords)
+        )
+        self._patterns: Dict[str, Pattern[str]] = {
+            keyword: re.compile(rf"(?<!\w){re.escape(keyword)}(?!\w)")
+            for keyword in keywords
+        }
+
+    def match(self, text: str) -> Dict[str, List[str]]:
+        text = (text or "").lower()
+        found = set()
+        absent = set()
+        for keyword, contained in self._keywords:
+            if any(other in absent for other in contained):
+                absent.add(keyword)
+            elif keyword not in text:
+                absent.add(keyword)
+            elif self._contains(text, keyword):
+                found.add(keyword)
+        return {
+            name: [keyword for keyword in keywords if keyword in found]
+            for name, keywords in self._categories
+        }
+
+    def _contains(self, text: str, keyword: str) -> bool:
+        if not self.word_boundary:
+            return True
+        return self._patterns[keyword].search(text) is not None
+
+
+class StreamingPhraseMatcher:
+    # Finds phrases in text that arrives in pieces, such as streamed model
+    # output. Only the last (longest phrase - 1) characters are carried over
+    # between pieces, which is enough to catch a phrase split across them.
+    def __init__(self, categories: Mapping[str, Sequence[str]]) -> None:
+        self._phrases: Tuple[Tuple[str, str], ...] = tuple(
+            (phrase, name)
+            for name, phrases in categories.items()
+            for phrase in phrases
+        )
+        self._keep = max((len(phrase) for phrase, _ in self._phrases), default=1) - 1
+        self._tail = ""
+
+    def feed(self, text: str) -> Optional[Tuple[str, str]]:
+        # (category, phrase) of the first phrase seen so far, else None
+        window = self._tail + text.lower()
+        for phrase, name in self._phrases:
+            if phrase in window:
+                return name, phrase
+        self._tail = window[-self._keep :] if self._keep else ""
+        return None
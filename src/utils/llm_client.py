@@ -0,0 +1,140 @@
+from __future__ import annotations
+import atexit
+import threading
+from typing import Any, Dict, Optional, Type
+import httpx
+from langchain_openai import ChatOpenAI
+from src.config import settings
+
+# one pooled HTTP client and one chat model per configuration, shared by every
+# generation and retry in the process so connections and TLS sessions survive
+_lock = threading.Lock()
+_http_clients: Dict[tuple, httpx.Client] = {}
+_async_http_clients: Dict[tuple, httpx.AsyncClient] = {}
+_chat_models: Dict[tuple, ChatOpenAI] = {}
+# (id(llm), schema, method) -> (llm, structured runnable or None if the
+# backend rejected it)
+_structured_models: Dict[tuple, tuple] = {}
+
+
+def get_chat_model(
+    model: Optional[str] = None,
+    temperature: Optional[float] = None,
+    max_retries: Optional[int] = None,
+) -> ChatOpenAI:
+    # max_retries=None keeps the SDK default; concurrent drafting passes 0 so
+    # rate-limit responses reach the shared limiter instead of being retried
+    # per request
+    model = model or settings.LLM_MESSAGE_MODEL
+    if temperature is None:
+        temperature = settings.LLM_MESSAGE_TEMPERATURE
+    pool_key = _pool_settings_key()
+    key = (model, temperature, max_retries, settings.LLM_BASE_URL, pool_key)
+    with _lock:
+        llm = _chat_models.get(key)
+        if llm is None:
+            options = {} if max_retries is None else {"max_retries": max_retries}
+            llm = ChatOpenAI(
+                model=model,
+                temperature=temperature,
+                base_url=settings.LLM_BASE_URL,
+                http_client=_http_client(pool_key),
+                http_async_client=_async_http_client(pool_key),
+                **options,
+            )
+            _chat_models[key] = llm
+        return llm
+
+
+def get_structured_model(llm: Any, schema: Type) -> Optional[Any]:
+    # None when structured output is disabled, unavailable on this model or
+    # was rejected by the backend earlier in the process
+    method = settings.LLM_STRUCTURED_OUTPUT
+    if method is None or not hasattr(llm, "with_structured_output"):
+        return None
+    key = (id(llm), schema, method)
+    with _lock:
+        entry = _structured_models.get(key)
+        if entry is None or entry[0] is not llm:
+            options = {"strict": True} if method == "json_schema" else {}
+            structured = llm.with_structured_output(
+                schema, method=method, include_raw=True, **options
+            )
+            entry = (llm, structured)
+            _structured_models[key] = entry
+        return entry[1]
+
+
+def disable_structured_output(llm: Any, schema: Type) -> None:
+    key = (id(llm), schema, settings.LLM_STRUCTURED_OUTPUT)
+    with _lock:
+        _structured_models[key] = (llm, None)
+
+
+def close_llm_clients() -> None:
+    with _lock:
+        for client in _http_clients.values():
+            client.close()
+        _http_clients.clear()
+        _async_http_clients.clear()
+        _chat_models.clear()
+        _structured_models.clear()
+
+
+async def aclose_llm_clients() -> None:
+    # async connections belong to the event loop that opened them, so they
+    # are closed when that loop's run finishes; sync pools are kept
+    with _lock:
+        clients = list(_async_http_clients.values())
+        _async_http_clients.clear()
+        _chat_models.clear()
+        _structured_models.clear()
+    for client in clients:
+        await client.aclose()
+
+
+def _http_client(pool_key: tuple) -> httpx.Client:
+    client = _http_clients.get(pool_key)
+    if client is None:
+        client = httpx.Client(**_client_options(pool_key))
+        _http_clients[pool_key] = client
+    return client
+
+
+def _async_http_client(pool_key: tuple) -> httpx.AsyncClient:
+    client = _async_http_clients.get(pool_key)
+    if client is None:
+        client = httpx.AsyncClient(**_client_options(pool_key))
+        _async_http_clients[pool_key] = client
+    return client
+
+
+def _client_options(pool_key: tuple) -> dict:
+    (
+        max_connections,
+        max_keepalive,
+        keepalive_expiry,
+        connect_timeout,
+        read_timeout,
+    ) = pool_key
+    return {
+        "limits": httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        ),
+        "timeout": httpx.Timeout(read_timeout, connect=connect_timeout),
+    }
+
+
+def _pool_settings_key() -> tuple:
+    return (
+        settings.LLM_HTTP_MAX_CONNECTIONS,
+        settings.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        settings.LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        settings.LLM_HTTP_CONNECT_TIMEOUT_SECONDS,
+        settings.LLM_HTTP_READ_TIMEOUT_SECONDS,
+    )
+
+
+atexit.register(close_llm_clients)
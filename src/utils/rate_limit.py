@@ -0,0 +1,114 @@
+from __future__ import annotations
+import asyncio
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Callable, Mapping, Optional
+from src.config import settings
+
+
+class RateLimiter:
+    # requests-per-minute and tokens-per-minute budgets shared by every
+    # in-flight draft. Each acquire reserves its slot up front (GCRA), so no
+    # asyncio primitives are involved and one limiter works across event loops.
+    # pause() is the shared backoff: a Retry-After seen by one request holds
+    # back all of them.
+    def __init__(
+        self,
+        requests_per_minute: Optional[float],
+        tokens_per_minute: Optional[float],
+        burst_seconds: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.burst_seconds = burst_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._requests_tat = 0.0
+        self._tokens_tat = 0.0
+        self._resume_at = 0.0
+
+    async def acquire(self, tokens: int = 0) -> None:
+        await self._wait_for_resume()
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await self._wait_for_resume()
+
+    def reserve(self, tokens: int = 0) -> float:
+        with self._lock:
+            now = self._clock()
+            delay = 0.0
+            if self.requests_per_minute:
+                self._requests_tat, wait = self._advance(
+                    self._requests_tat, now, 60.0 / self.requests_per_minute
+                )
+                delay = max(delay, wait)
+            if self.tokens_per_minute and tokens:
+                self._tokens_tat, wait = self._advance(
+                    self._tokens_tat, now, tokens * 60.0 / self.tokens_per_minute
+                )
+                delay = max(delay, wait)
+            return delay
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._resume_at = max(self._resume_at, self._clock() + seconds)
+
+    def _advance(self, tat: float, now: float, cost: float) -> tuple[float, float]:
+        tat = max(tat, now) + cost
+        return tat, max(tat - self.burst_seconds - now, 0.0)
+
+    async def _wait_for_resume(self) -> None:
+        while True:
+            wait = self._resume_at - self._clock()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+
+def get_rate_limiter() -> RateLimiter:
+    return _rate_limiter(
+        settings.LLM_REQUESTS_PER_MINUTE,
+        settings.LLM_TOKENS_PER_MINUTE,
+        settings.LLM_RATE_LIMIT_BURST_SECONDS,
+    )
+
+
+def retry_after_seconds(headers: Mapping[str, str]) -> Optional[float]:
+    # OpenAI sends retry-after-ms; the standard header is seconds or an
+    # HTTP date
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(float(value) / 1000.0, 0.0)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+
+def estimate_tokens(text: str, completion_tokens: int = 0) -> int:
+    # rough 4-characters-per-token estimate, enough for budgeting
+    return len(text) // 4 + 1 + completion_tokens
+
+
+@lru_cache(maxsize=4)
+def _rate_limiter(
+    requests_per_minute: Optional[float],
+    tokens_per_minute: Optional[float],
+    burst_seconds: float,
+) -> RateLimiter:
+    return RateLimiter(requests_per_minute, tokens_per_minute, burst_seconds)
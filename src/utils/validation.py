@@ -1,16 +1,47 @@
 from __future__ import annotations
 import json
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Iterable, List
+from typing import Any, Iterable, List, Optional, Tuple
+import numpy as np
+import pandas as pd
 from jsonschema import Draft202012Validator
 from pydantic import BaseModel
+from src.state import InvoiceRow
 
+SCHEMA_PATH = (
+    Path(__file__).resolve().parents[2] / "data" / "schemas" / "invoice_schema.json"
+)
 
+# keywords the column masks understand (of the formats, only "date"); anything
+# else makes the masks flag every row so jsonschema stays the source of truth
+_MASKED_KEYWORDS = {"type", "enum", "minimum", "minLength", "format"}
+_ANNOTATION_KEYWORDS = {"default", "title", "description"}
+_DATE_PATTERN = r"\d{4}-\d{2}-\d{2}"
+_ROOT_KEYWORDS = {"$schema", "type", "required", "properties"}
+
+
+@lru_cache(maxsize=1)
 def load_invoice_schema() -> dict:
-    with Path("data/schemas/invoice_schema.json").open("r", encoding="utf-8") as f:
+    with SCHEMA_PATH.open("r", encoding="utf-8") as f:
         return json.load(f)
 
+
+@lru_cache(maxsize=1)
+def _compiled_validator() -> Draft202012Validator:
+    schema = load_invoice_schema()
+    Draft202012Validator.check_schema(schema)
+    return _validator(schema)
+
+
+def _validator(schema: dict) -> Draft202012Validator:
+    # formats are checked too, so a row that passes always builds a model
+    return Draft202012Validator(
+        schema, format_checker=Draft202012Validator.FORMAT_CHECKER
+    )
+
+
 class ValidationErrorInfo(BaseModel):
     row_index: int
     field_path: str
@@ -19,24 +50,53 @@ class ValidationErrorInfo(BaseModel):
 
 
 class InvoiceValidationError(Exception):
+    max_listed_errors = 20
+
     def __init__(self, errors: List[ValidationErrorInfo]) -> None:
         self.errors = errors
         super().__init__(self._build_message())
 
     def _build_message(self) -> str:
         lines = ["Invoice validation failed:"]
-        for error in self.errors:
-            lines.append(
-                f"Row {error.row_index} -> {error.field_path}: {error.message} "
-                f"(got {error.value!r})"
-            )
+        for error in self.errors[: self.max_listed_errors]:
+            lines.append(format_validation_error(error))
+        hidden = len(self.errors) - self.max_listed_errors
+        if hidden > 0:
+            lines.append(f"... and {hidden} more errors")
         return "\n".join(lines)
 
 
+def format_validation_error(error: ValidationErrorInfo) -> str:
+    return (
+        f"Row {error.row_index} -> {error.field_path}: {error.message} "
+        f"(got {error.value!r})"
+    )
+
+
+@dataclass(frozen=True)
+class RejectedRow:
+    row_index: int
+    row: dict
+    errors: List[ValidationErrorInfo]
+
+
 @dataclass(frozen=True)
 class ValidationResult:
     valid_rows: List[dict]
     errors: List[ValidationErrorInfo]
+    rejected_rows: List[RejectedRow] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class _ColumnRule:
+    name: str
+    required: bool
+    types: Tuple[str, ...]
+    enum: Optional[Tuple[Any, ...]]
+    minimum: Optional[float]
+    min_length: Optional[int]
+    date_format: bool
+    opaque: bool
 
 
 def _format_field_path(path_parts: Iterable[Any]) -> str:
@@ -44,8 +104,13 @@ def _format_field_path(path_parts: Iterable[Any]) -> str:
     return path if path else "(root)"
 
 
-def validate_row(row: dict, row_index: int, schema: dict) -> List[ValidationErrorInfo]:
-    validator = Draft202012Validator(schema)
+def validate_row(
+    row: dict, row_index: int, schema: Optional[dict] = None
+) -> List[ValidationErrorInfo]:
+    if schema is None or schema is load_invoice_schema():
+        validator = _compiled_validator()
+    else:
+        validator = _validator(schema)
     errors: List[ValidationErrorInfo] = []
     for error in validator.iter_errors(row):
         errors.append(
@@ -59,14 +124,180 @@ def validate_row(row: dict, row_index: int, schema: dict) -> List[ValidationErro
     return errors
 
 
-def validate_rows(rows: List[dict]) -> ValidationResult:
-    schema = load_invoice_schema()
-    valid_rows: List[dict] = []
-    errors: List[ValidationErrorInfo] = []
-    for index, row in enumerate(rows, start=1):
-        row_errors = validate_row(row, index, schema)
+def validate_rows(rows: List[dict], start: int = 1) -> ValidationResult:
+    if not rows:
+        return ValidationResult(valid_rows=[], errors=[])
+    positions = np.flatnonzero(_flag_rows(pd.DataFrame(rows, dtype=object)))
+    rejected = _confirm_flagged(
+        [rows[position] for position in positions], positions, start
+    )
+    invalid = {item.row_index - start for item in rejected}
+    valid_rows = [row for position, row in enumerate(rows) if position not in invalid]
+    return _build_result(valid_rows, rejected)
+
+
+def invoices_from_rows(rows: List[dict]) -> List[InvoiceRow]:
+    # rows must have passed the schema (validate_rows / validate_columns),
+    # which owns the value constraints; pydantic only converts types
+    return [InvoiceRow(**row) for row in rows]
+
+
+def validate_columns(
+    df: pd.DataFrame, start: int = 1
+) -> Tuple[np.ndarray, List[RejectedRow]]:
+    # schema check for columnar loads that never build per-row models
+    positions = np.flatnonzero(_flag_rows(df))
+    rejected = _confirm_flagged(frame_to_rows(df.iloc[positions]), positions, start)
+    valid = np.ones(len(df), dtype=bool)
+    valid[[item.row_index - start for item in rejected]] = False
+    return valid, rejected
+
+
+def frame_to_rows(df: pd.DataFrame) -> List[dict]:
+    keys = list(df.columns)
+    values = [df[column].tolist() for column in keys]
+    return [dict(zip(keys, row)) for row in zip(*values)]
+
+
+def _confirm_flagged(
+    rows: List[dict], positions: np.ndarray, start: int
+) -> List[RejectedRow]:
+    # the masks may over-flag; jsonschema decides and builds the messages
+    rejected: List[RejectedRow] = []
+    for position, row in zip(positions.tolist(), rows):
+        row_errors = validate_row(row, position + start)
         if row_errors:
-            errors.extend(row_errors)
-        else:
-            valid_rows.append(row)
-    return ValidationResult(valid_rows=valid_rows, errors=errors)
+            rejected.append(
+                RejectedRow(row_index=position + start, row=row, errors=row_errors)
+            )
+    return rejected
+
+
+def _build_result(
+    valid_rows: List[dict], rejected: List[RejectedRow]
+) -> ValidationResult:
+    errors = [error for item in rejected for error in item.errors]
+    return ValidationResult(
+        valid_rows=valid_rows, errors=errors, rejected_rows=rejected
+    )
+
+
+def _flag_rows(df: pd.DataFrame) -> np.ndarray:
+    flagged = np.zeros(len(df), dtype=bool)
+    rules = _compiled_rules()
+    if rules is None:
+        flagged[:] = True
+        return flagged
+    for rule in rules:
+        if rule.name not in df.columns:
+            if rule.required:
+                flagged[:] = True
+            continue
+        flagged |= ~_column_ok(df[rule.name], rule)
+    return flagged
+
+
+@lru_cache(maxsize=1)
+def _compiled_rules() -> Optional[Tuple[_ColumnRule, ...]]:
+    schema = load_invoice_schema()
+    if set(schema) - _ROOT_KEYWORDS or schema.get("type", "object") != "object":
+        return None
+    required = set(schema.get("required", []))
+    properties = schema.get("properties", {})
+    rules: List[_ColumnRule] = []
+    for name in sorted(required | set(properties)):
+        spec = properties.get(name, {})
+        types = spec.get("type", ())
+        enum = spec.get("enum")
+        date_format = spec.get("format")
+        rules.append(
+            _ColumnRule(
+                name=name,
+                required=name in required,
+                types=(types,) if isinstance(types, str) else tuple(types),
+                enum=tuple(enum) if enum is not None else None,
+                minimum=spec.get("minimum"),
+                min_length=spec.get("minLength"),
+                date_format=date_format == "date",
+                # isin() equates True with 1, so only string enums are masked
+                opaque=bool(set(spec) - _MASKED_KEYWORDS - _ANNOTATION_KEYWORDS)
+                or date_format not in (None, "date")
+                or (
+                    enum is not None
+                    and not all(isinstance(item, str) for item in enum)
+                ),
+            )
+        )
+    return tuple(rules)
+
+
+def _column_ok(series: pd.Series, rule: _ColumnRule) -> np.ndarray:
+    if rule.opaque:
+        return np.zeros(len(series), dtype=bool)
+    values = series.to_numpy(dtype=object)
+    kinds = pd.Series(values, dtype=object).map(type).to_numpy(dtype=object)
+    is_str = kinds == str
+    # NaN only shows up when a frame filled a gap, leave those to jsonschema
+    is_number = ((kinds == int) | (kinds == float)) & ~_float_nans(values, kinds)
+    ok = np.ones(len(values), dtype=bool)
+
+    if rule.types:
+        type_ok = np.zeros(len(values), dtype=bool)
+        for json_type in rule.types:
+            if json_type == "string":
+                type_ok |= is_str
+            elif json_type == "number":
+                type_ok |= is_number
+            elif json_type == "integer":
+                type_ok |= (kinds == int) | _integral_floats(values, kinds)
+            elif json_type == "null":
+                type_ok |= kinds == type(None)
+            elif json_type == "boolean":
+                type_ok |= kinds == bool
+            else:
+                return np.zeros(len(values), dtype=bool)
+        ok &= type_ok
+
+    if rule.enum is not None:
+        ok &= pd.Series(values, dtype=object).isin(rule.enum).to_numpy(dtype=bool)
+
+    if rule.minimum is not None and is_number.any():
+        numbers = pd.to_numeric(pd.Series(values[is_number]), errors="coerce")
+        below = np.zeros(len(values), dtype=bool)
+        below[is_number] = (numbers < rule.minimum).to_numpy(dtype=bool)
+        ok &= ~below
+
+    if rule.min_length is not None and is_str.any():
+        lengths = pd.Series(values[is_str], dtype=object).str.len().to_numpy()
+        short = np.zeros(len(values), dtype=bool)
+        short[is_str] = lengths < rule.min_length
+        ok &= ~short
+
+    if rule.date_format and is_str.any():
+        strings = pd.Series(values[is_str], dtype=object)
+        shaped = strings.str.fullmatch(_DATE_PATTERN).to_numpy(dtype=bool)
+        parsed = pd.to_datetime(
+            strings.where(shaped, None), format="%Y-%m-%d", errors="coerce"
+        )
+        bad = np.zeros(len(values), dtype=bool)
+        bad[is_str] = parsed.isna().to_numpy(dtype=bool)
+        ok &= ~bad
+
+    return ok
+
+
+def _float_nans(values: np.ndarray, kinds: np.ndarray) -> np.ndarray:
+    is_float = kinds == float
+    result = np.zeros(len(values), dtype=bool)
+    if is_float.any():
+        result[is_float] = np.isnan(values[is_float].astype(np.float64))
+    return result
+
+
+def _integral_floats(values: np.ndarray, kinds: np.ndarray) -> np.ndarray:
+    is_float = kinds == float
+    result = np.zeros(len(values), dtype=bool)
+    if is_float.any():
+        floats = values[is_float].astype(np.float64)
+        result[is_float] = np.isfinite(floats) & (np.floor(floats) == floats)
+    return result
@@ -0,0 +1,74 @@
+import random
+from datetime import date, timedelta
+
+from src.agents import (
+    iter_batch_states,
+    run_context_agent,
+    run_context_agent_batch,
+    run_control_agent,
+    run_control_agent_batch,
+    run_decision_agent,
+    run_decision_agent_batch,
+)
+from src.state import InvoiceBatch, InvoiceRow
+
+TODAY = date(2025, 3, 1)
+NOTES = [
+    "",
+    "Late payment, ignored prior reminders.",
+    "Billing issue reported.",
+    "Paid in full yesterday.",
+    "Long-term client, apologized for delay.",
+    "Dispute over incorrect invoice; collection risk.",
+]
+
+
+def build_invoices(count: int, seed: int = 7) -> list[InvoiceRow]:
+    rng = random.Random(seed)
+    invoices = []
+    for index in range(count):
+        last_followup = None
+        if rng.random() < 0.6:
+            last_followup = TODAY - timedelta(days=rng.randint(0, 12))
+        invoices.append(
+            InvoiceRow(
+                client_name=f"Client {index % 7}",
+                invoice_id=f"INV-{index}",
+                invoice_amount=rng.choice([0.0, 120.5, 500.0, 1999.99, 50000.0]),
+                currency=rng.choice(["USD", "EUR"]),
+                invoice_issue_date=date(2025, 1, 1) + timedelta(days=index % 30),
+                days_overdue=rng.choice([0, 1, 3, 5, 7, 8, 29, 30, 31, 60, 61, 120]),
+                last_followup_date=last_followup,
+                relationship_tag=rng.choice(["new", "recurring", "vip", "risky"]),
+                notes=rng.choice(NOTES),
+            )
+        )
+    return invoices
+
+
+def test_batch_agents_match_per_invoice_agents() -> None:
+    invoices = build_invoices(400)
+
+    expected = []
+    for invoice in invoices:
+        state = run_context_agent({"invoice_data": invoice}, today=TODAY)
+        state = run_decision_agent(state, today=TODAY)
+        expected.append(run_control_agent(state, stage="decision"))
+
+    batch = run_context_agent_batch(InvoiceBatch.from_invoices(invoices), today=TODAY)
+    batch = run_decision_agent_batch(batch, today=TODAY)
+    batch = run_control_agent_batch(batch, stage="decision")
+
+    assert list(iter_batch_states(batch)) == expected
+
+
+def test_batch_decision_without_context_matches_per_invoice() -> None:
+    invoices = build_invoices(100, seed=11)
+
+    expected = [
+        run_decision_agent({"invoice_data": invoice}, today=TODAY)
+        for invoice in invoices
+    ]
+    batch = run_decision_agent_batch(InvoiceBatch.from_invoices(invoices), today=TODAY)
+
+    assert list(iter_batch_states(batch)) == expected
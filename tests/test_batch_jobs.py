@@ -0,0 +1,80 @@
+import json
+
+from typer.testing import CliRunner
+from src.agents.batch import iter_batch_states
+from src.agents.context_agent import run_context_agent_batch
+from src.agents.control_agent import run_control_agent_batch
+from src.agents.decision_agent import run_decision_agent_batch
+from src.io.batch_jobs import iter_prepared_states
+from src.io.loader import load_invoice_batch
+from src.main import app
+from src.state.serialization import state_from_dict, state_to_dict
+
+SAMPLE = "data/samples/invoices_sample.csv"
+
+
+def test_state_serialization_round_trips() -> None:
+    batch = run_context_agent_batch(load_invoice_batch(SAMPLE))
+    batch = run_control_agent_batch(run_decision_agent_batch(batch), stage="decision")
+    for state in iter_batch_states(batch):
+        data = json.loads(json.dumps(state_to_dict(state)))
+        assert state_from_dict(data) == state
+
+
+def test_prepare_then_ingest_with_fake_results(tmp_path) -> None:
+    runner = CliRunner()
+    out_dir = tmp_path / "batch"
+    result = runner.invoke(app, ["prepare", SAMPLE, "--out-dir", str(out_dir)])
+    assert result.exit_code == 0, result.output
+
+    requests = [
+        json.loads(line)
+        for line in (out_dir / "requests.jsonl").read_text().splitlines()
+    ]
+    assert requests
+    assert len({request["custom_id"] for request in requests}) == len(requests)
+    assert requests[0]["url"] == "/v1/chat/completions"
+    assert requests[0]["body"]["messages"][0]["role"] == "system"
+
+    # a second prepare over the same input yields the same ids
+    runner.invoke(app, ["prepare", SAMPLE, "--out-dir", str(tmp_path / "again")])
+    again = (tmp_path / "again" / "requests.jsonl").read_text()
+    assert again == (out_dir / "requests.jsonl").read_text()
+
+    results_path = tmp_path / "results.jsonl"
+    with results_path.open("w") as handle:
+        for index, request in enumerate(requests):
+            if index == 0:
+                record = {
+                    "custom_id": request["custom_id"],
+                    "response": None,
+                    "error": {"code": "server_error", "message": "boom"},
+                }
+            else:
+                content = json.dumps(
+                    {"subject": f"Draft {index}", "body": "Hello", "reasoning": "ok"}
+                )
+                record = {
+                    "custom_id": request["custom_id"],
+                    "response": {
+                        "status_code": 200,
+                        "body": {"choices": [{"message": {"content": content}}]},
+                    },
+                    "error": None,
+                }
+            handle.write(json.dumps(record) + "\n")
+
+    report = tmp_path / "report.md"
+    result = runner.invoke(
+        app,
+        ["ingest", str(out_dir), str(results_path), "--output", str(report)],
+    )
+    assert result.exit_code == 0, result.output
+    assert "1 drafts were missing or invalid." in result.output
+    assert report.exists()
+
+    prepared = list(iter_prepared_states(str(out_dir)))
+    assert sum(custom_id is not None for custom_id, _ in prepared) == len(requests)
+    text = report.read_text()
+    assert "Draft 1" in text
+    assert "MESSAGE_MISSING" in text
@@ -0,0 +1,149 @@
+import json
+from datetime import date
+from types import SimpleNamespace
+
+from src.agents import message_agent
+from src.config import prompts, settings
+from src.graph import build_workflow, run_batched
+from src.io.draft_cache import DraftCache, draft_key
+from src.state import InvoiceRow
+from src.utils.rate_limit import estimate_tokens
+
+
+class FakeBatchLLM:
+    # answers batched prompts; the first call drops one item and returns an
+    # invalid draft for another
+    def __init__(self) -> None:
+        self.requests = []
+
+    def invoke(self, messages):
+        prompt = messages[-1].content
+        if "Items:" not in prompt:
+            invoice_id = json.loads(prompt.split("\n")[1])["invoice"]["invoice_id"]
+            return SimpleNamespace(content=json.dumps(_draft(invoice_id)))
+        items = json.loads(prompt.split("Items:\n", 1)[1].split("\n\nGuidance", 1)[0])
+        self.requests.append([item["id"] for item in items])
+        drafts = [
+            {"id": item["id"], **_draft(item["invoice"]["invoice_id"])}
+            for item in items
+        ]
+        if len(self.requests) == 1:
+            drafts = drafts[1:]
+            del drafts[0]["body"]
+        return SimpleNamespace(content="Here you go:\n" + json.dumps(drafts))
+
+
+def _draft(invoice_id: str) -> dict:
+    return {"subject": f"About {invoice_id}", "body": "Hello", "reasoning": "test"}
+
+
+def _invoices(count: int) -> list:
+    return [
+        InvoiceRow(
+            client_name=f"Client {index}",
+            invoice_id=f"INV-{index}",
+            invoice_amount=100.0 + index,
+            invoice_issue_date=date(2025, 1, 1),
+            days_overdue=0 if index % 4 == 3 else 20,
+            relationship_tag="recurring",
+        )
+        for index in range(count)
+    ]
+
+
+def test_batched_drafts_match_per_invoice_workflow_and_retry_failed_items(
+    monkeypatch,
+) -> None:
+    llm = FakeBatchLLM()
+    monkeypatch.setattr(message_agent, "get_chat_model", lambda **kwargs: llm)
+    monkeypatch.setattr(settings, "LLM_MESSAGE_BACKOFF_MIN_SECONDS", 0)
+    invoices = _invoices(10)
+
+    expected = [build_workflow().invoke({"invoice_data": item}) for item in invoices]
+    results = list(run_batched(invoices, batch_size=4, window=8))
+
+    assert results == expected
+    # invoices 3 and 7 are not overdue, so the window of 8 drafts 6 invoices
+    # in groups of 4 and 2 and the last window drafts 2; only the two items
+    # broken by the first response are re-requested
+    assert llm.requests == [
+        ["0", "1", "2", "3"],
+        ["0", "1"],
+        ["4", "5"],
+        ["0", "1"],
+    ]
+
+
+def test_plan_message_batches_respects_token_budget() -> None:
+    items = ["x" * 400] * 6
+    assert message_agent.plan_message_batches([], 4) == []
+    assert message_agent.plan_message_batches(items, 4, token_budget=10**6) == [
+        [0, 1, 2, 3],
+        [4, 5],
+    ]
+    # an item that alone exceeds the budget still gets its own request
+    assert message_agent.plan_message_batches(items, 4, token_budget=1) == [
+        [0],
+        [1],
+        [2],
+        [3],
+        [4],
+        [5],
+    ]
+    overhead = estimate_tokens(
+        prompts.MESSAGE_AGENT_BATCH_SYSTEM_PROMPT
+        + prompts.MESSAGE_AGENT_BATCH_USER_PROMPT
+        + json.dumps(settings.ESCALATION_THRESHOLDS)
+    )
+    item_cost = estimate_tokens(
+        items[0], settings.LLM_MESSAGE_COMPLETION_TOKENS_ESTIMATE
+    )
+    budget = overhead + 2 * item_cost
+    assert message_agent.plan_message_batches(items, 10, token_budget=budget) == [
+        [0, 1],
+        [2, 3],
+        [4, 5],
+    ]
+
+
+class DroppingBatchLLM(FakeBatchLLM):
+    # never returns a draft for INV-1 in a batch
+    def invoke(self, messages):
+        prompt = messages[-1].content
+        if "Items:" not in prompt:
+            return super().invoke(messages)
+        items = json.loads(prompt.split("Items:\n", 1)[1].split("\n\nGuidance", 1)[0])
+        self.requests.append([item["id"] for item in items])
+        drafts = [
+            {"id": item["id"], **_draft(item["invoice"]["invoice_id"])}
+            for item in items
+            if item["invoice"]["invoice_id"] != "INV-1"
+        ]
+        return SimpleNamespace(content=json.dumps(drafts))
+
+
+def test_batched_failures_keep_group_drafts_and_thresholds_key_the_cache(
+    tmp_path, monkeypatch
+) -> None:
+    llm = DroppingBatchLLM()
+    monkeypatch.setattr(message_agent, "get_chat_model", lambda **kwargs: llm)
+    monkeypatch.setattr(settings, "LLM_MESSAGE_BACKOFF_MIN_SECONDS", 0)
+    invoices = _invoices(3)
+    with DraftCache(str(tmp_path / "drafts.sqlite")) as cache:
+        results = list(run_batched(invoices, batch_size=3, draft_cache=cache))
+        # INV-1 falls back to a single-draft request, the others are kept
+        assert [state["message"].subject for state in results] == [
+            f"About INV-{index}" for index in range(3)
+        ]
+        assert cache.misses == 4
+        # the fallback is cached under the single-invoice prompt's key
+        single_key = draft_key(message_agent.build_message_input(results[1]))
+        assert cache.get(single_key) == results[1]["message"]
+
+        list(run_batched(invoices, batch_size=3, draft_cache=cache))
+        assert (cache.hits, cache.misses) == (4, 5)
+
+        thresholds = {**settings.ESCALATION_THRESHOLDS, "urgent_days_overdue": 99}
+        monkeypatch.setattr(settings, "ESCALATION_THRESHOLDS", thresholds)
+        list(run_batched(invoices, batch_size=3, draft_cache=cache))
+        assert (cache.hits, cache.misses) == (4, 9)
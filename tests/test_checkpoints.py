@@ -0,0 +1,99 @@
+import re
+
+from typer.testing import CliRunner
+from src.agents import message_agent
+from src.config import settings
+from src.io.checkpoints import open_run_store
+from src.main import app
+
+SAMPLE = "data/samples/invoices_sample.csv"
+
+
+def test_resume_redoes_only_unfinished_invoices(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "CHECKPOINT_PATH", str(tmp_path / "runs.sqlite"))
+    render = message_agent.render_template_message
+    drafted = []
+
+    def failing_render(state):
+        if len(drafted) == 2:
+            raise RuntimeError("worker died")
+        drafted.append(state["invoice_data"].invoice_id)
+        return render(state)
+
+    monkeypatch.setattr(message_agent, "render_template_message", failing_render)
+    runner = CliRunner()
+    report = tmp_path / "report.md"
+    args = [
+        "run",
+        SAMPLE,
+        "--output",
+        str(report),
+        "--llm-policy",
+        "templates",
+        "--no-cache",
+        "--checkpoint",
+    ]
+    result = runner.invoke(app, args)
+    assert isinstance(result.exception, RuntimeError)
+    run_id = re.search(r"Run ID: (\S+)", result.output).group(1)
+    first = list(drafted)
+
+    drafted.clear()
+    monkeypatch.setattr(
+        message_agent,
+        "render_template_message",
+        lambda state: drafted.append(state["invoice_data"].invoice_id)
+        or render(state),
+    )
+    result = runner.invoke(app, args + ["--resume", run_id])
+    assert result.exit_code == 0, result.output
+    assert drafted
+    assert not set(first) & set(drafted)
+
+    # the resumed report matches a run that was never interrupted
+    fresh = tmp_path / "fresh.md"
+    result = runner.invoke(app, args[:3] + [str(fresh)] + args[4:])
+    assert result.exit_code == 0, result.output
+    assert report.read_text() == fresh.read_text()
+    concurrent = tmp_path / "concurrent.md"
+    result = runner.invoke(
+        app, args[:3] + [str(concurrent)] + args[4:] + ["--concurrency", "3"]
+    )
+    assert result.exit_code == 0, result.output
+    assert concurrent.read_text() == fresh.read_text()
+
+    result = runner.invoke(app, args + ["--resume", "missing"])
+    assert result.exit_code != 0
+
+
+def test_checkpoints_are_opt_in_and_tied_to_the_input(tmp_path, monkeypatch) -> None:
+    store_path = tmp_path / "runs.sqlite"
+    monkeypatch.setattr(settings, "CHECKPOINT_PATH", str(store_path))
+    runner = CliRunner()
+    args = ["run", SAMPLE, "--llm-policy", "templates", "--no-cache", "--output"]
+    result = runner.invoke(app, args + [str(tmp_path / "plain.md")])
+    assert result.exit_code == 0, result.output
+    assert "Run ID" not in result.output
+    assert not store_path.exists()
+
+    run_ids = []
+    for name in ("first", "second"):
+        result = runner.invoke(
+            app, args + [str(tmp_path / f"{name}.md"), "--checkpoint"]
+        )
+        assert result.exit_code == 0, result.output
+        run_ids.append(re.search(r"Run ID: (\S+)", result.output).group(1))
+
+    # a resume on other input is rejected instead of reporting stale invoices
+    result = runner.invoke(
+        app, args + [str(tmp_path / "r.md"), "--resume", run_ids[0], "--limit", "2"]
+    )
+    assert result.exit_code != 0
+    assert "different input" in result.output
+
+    result = runner.invoke(app, ["prune-runs", "--keep", "1"])
+    assert result.exit_code == 0, result.output
+    with open_run_store() as store:
+        assert store.run_ids() == run_ids[1:]
+        assert store.thread_ids(run_ids[0]) == []
+        assert store.thread_ids(run_ids[1])
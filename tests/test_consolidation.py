@@ -0,0 +1,87 @@
+import json
+from datetime import date
+from types import SimpleNamespace
+
+from src.agents import message_agent
+from src.agents.control_agent import consolidated_tone
+from src.graph import run_consolidated
+from src.state import FollowupDecision, InvoiceRow
+
+
+class FakeLLM:
+    def __init__(self) -> None:
+        self.prompts = []
+
+    def invoke(self, messages):
+        prompt = messages[-1].content
+        self.prompts.append(prompt)
+        payload = json.loads(prompt.split("\n")[1])
+        items = payload.get("invoices", [payload])
+        ids = [item["invoice"]["invoice_id"] for item in items]
+        draft = {
+            "subject": f"About {len(ids)} invoices",
+            "body": ", ".join(ids),
+            "reasoning": payload["decision"]["tone"],
+        }
+        return SimpleNamespace(content=json.dumps(draft))
+
+
+def build_invoice(client: str, invoice_id: str, days_overdue: int) -> InvoiceRow:
+    return InvoiceRow(
+        client_name=client,
+        invoice_id=invoice_id,
+        invoice_amount=250.0,
+        invoice_issue_date=date(2025, 1, 1),
+        days_overdue=days_overdue,
+        relationship_tag="recurring",
+    )
+
+
+def test_consolidated_tone_is_firmest_within_strictest_cap() -> None:
+    def state(days_overdue: int, tone: str) -> dict:
+        return {
+            "invoice_data": build_invoice("Acme", f"INV-{days_overdue}", days_overdue),
+            "decision": FollowupDecision(
+                followup_required=True,
+                recommended_timing="now",
+                tone=tone,
+                explanation="test",
+            ),
+        }
+
+    assert consolidated_tone([state(40, "firm"), state(30, "neutral")]) == "firm"
+    # 5 days overdue caps the whole group at neutral
+    assert consolidated_tone([state(40, "firm"), state(5, "neutral")]) == "neutral"
+    assert consolidated_tone([state(2, "soft"), state(40, "firm")]) == "soft"
+
+
+def test_one_draft_per_client_fanned_out_to_invoices(monkeypatch) -> None:
+    llm = FakeLLM()
+    monkeypatch.setattr(message_agent, "get_chat_model", lambda **kwargs: llm)
+    invoices = [
+        build_invoice("Acme", "INV-1", 40),
+        build_invoice("Globex", "INV-2", 40),
+        build_invoice("Acme", "INV-3", 45),
+        build_invoice("Acme", "INV-4", 0),
+        build_invoice("Acme", "INV-5", 50),
+    ]
+    results = list(run_consolidated(invoices, window=3))
+
+    assert [state["invoice_data"].invoice_id for state in results] == [
+        "INV-1",
+        "INV-2",
+        "INV-3",
+        "INV-4",
+        "INV-5",
+    ]
+    # the first window holds two Acme invoices and one Globex invoice; INV-4
+    # needs no follow-up and INV-5 is alone in the second window
+    assert sum("covering all" in prompt for prompt in llm.prompts) == 1
+    assert len(llm.prompts) == 3
+    assert results[0]["message"] is results[2]["message"]
+    assert results[0]["message"].body == "INV-1, INV-3"
+    assert results[1]["message"].body != results[0]["message"].body
+    assert "message" not in results[3]
+    assert results[4]["message"].subject == "About 1 invoices"
+    for state in (results[0], results[2]):
+        assert state["control_message"].passed
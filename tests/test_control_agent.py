@@ -1,6 +1,9 @@
 from datetime import date
 
+from src.agents import message_agent, message_call_avoided
 from src.agents.control_agent import run_control_agent
+from src.config import settings
+from src.graph import build_workflow
 from src.state import FollowupDecision, FollowupMessage, InvoiceRow
 
 
@@ -71,3 +74,33 @@ def test_control_message_passes_when_followup_not_required() -> None:
     control = result["control_message"]
     assert control.passed is True
     assert control.violations == []
+
+
+def test_workflow_skips_drafting_when_decision_control_fails(monkeypatch) -> None:
+    drafted = []
+
+    def generate(input_json: str) -> FollowupMessage:
+        drafted.append(input_json)
+        return FollowupMessage(subject="Invoice", body="Hello", reasoning="ok")
+
+    monkeypatch.setattr(message_agent, "_generate_message", generate)
+    monkeypatch.setattr(
+        settings, "CONTROL_TONE_CAPS_BY_RELATIONSHIP", {"risky": "soft"}
+    )
+    workflow = build_workflow()
+
+    failed = workflow.invoke(
+        {"invoice_data": build_invoice(days_overdue=20, relationship_tag="risky")}
+    )
+    assert failed["control_decision"].passed is False
+    assert "message" not in failed and "control_message" not in failed
+    assert message_call_avoided(failed)
+
+    skipped = workflow.invoke({"invoice_data": build_invoice(days_overdue=0)})
+    assert skipped["decision"].recommended_timing == "skip"
+    assert "control_message" not in skipped
+    assert not message_call_avoided(skipped)
+
+    drafted_state = workflow.invoke({"invoice_data": build_invoice(days_overdue=20)})
+    assert drafted_state["control_message"].passed is True
+    assert len(drafted) == 1
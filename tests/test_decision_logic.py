@@ -1,6 +1,9 @@
 from datetime import date, timedelta
+from itertools import islice
 
 import pandas as pd
+import pytest
+from src.agents import decision_agent
 from src.agents.context_agent import extract_notes_signals, run_context_agent
 from src.agents.decision_agent import (
     determine_decision,
@@ -8,8 +11,9 @@ from src.agents.decision_agent import (
     determine_tone,
     run_decision_agent,
 )
-from src.io.loader import load_invoices
+from src.io.loader import _normalize_frame, iter_invoices, load_invoices
 from src.state import InvoiceContext, InvoiceRow
+from src.utils.validation import InvoiceValidationError, frame_to_rows
 
 
 def build_invoice(**overrides) -> InvoiceRow:
@@ -69,6 +73,24 @@ def test_decision_skips_when_paid_keyword_present() -> None:
     assert decision.recommended_timing == "skip"
 
 
+def test_decision_reuses_context_signals(monkeypatch) -> None:
+    today = date(2025, 3, 1)
+    invoice = build_invoice(notes="Billing issue reported.")
+    state = run_context_agent({"invoice_data": invoice}, today=today)
+    signals = state["signals"]
+    assert signals.notes.soften == ("billing issue",)
+    assert signals.risk_level == state["context"].risk_level
+    assert extract_notes_signals("Billing issue reported.") is signals.notes
+
+    def fail(*args, **kwargs):
+        raise AssertionError("decision agent recomputed context work")
+
+    monkeypatch.setattr(decision_agent, "extract_notes_signals", fail)
+    monkeypatch.setattr(decision_agent, "compute_days_since_followup", fail)
+    decision = run_decision_agent(state, today=today)["decision"]
+    assert "SOFTEN_NOTES" in decision.explanation
+
+
 def test_determine_timing_returns_now_when_urgent() -> None:
     invoice = build_invoice(days_overdue=40)
     rules: list[str] = []
@@ -179,3 +201,50 @@ def test_load_invoices_excel_normalizes_fields(tmp_path) -> None:
     assert row.invoice_amount == 950.0
     assert row.days_overdue == 12
     assert row.last_followup_date == date(2025, 2, 15)
+
+
+def test_iter_invoices_streams_chunks_with_global_row_index(tmp_path) -> None:
+    data = {
+        "client_name": ["Acme Co", "Beta LLC", "Gamma Inc"],
+        "invoice_id": ["INV-1", "INV-2", "INV-3"],
+        "invoice_amount": ["100", "200", "300"],
+        "invoice_issue_date": ["2025-01-01", "2025-01-02", "2025-01-03"],
+        "days_overdue": ["5", "6", "7"],
+        "relationship_tag": ["new", "vip", "unknown"],
+    }
+    path = tmp_path / "invoices.csv"
+    pd.DataFrame(data).to_csv(path, index=False)
+
+    stream = iter_invoices(str(path), chunk_size=2)
+    assert [row.invoice_id for row in islice(stream, 2)] == ["INV-1", "INV-2"]
+    with pytest.raises(InvoiceValidationError) as excinfo:
+        next(stream)
+    assert [error.row_index for error in excinfo.value.errors] == [3]
+
+
+def test_normalize_frame_handles_messy_cells_column_wise() -> None:
+    df = pd.DataFrame(
+        {
+            "Invoice Amount": ["$1,200.50", "1.2.3", "-", " 12 ", None, "-.5"],
+            "Days Overdue": ["12.9", "-3.7", "n/a", "", "7 days", "1,000"],
+            "Currency": [" eur ", "", None, "USD", "   ", "gbp"],
+            "Relationship Tag": [" VIP ", "Risky", "", None, "new", "recurring"],
+            "Notes": ["  hi  ", None, "", "x", "  ", "y"],
+        },
+        dtype=str,
+    )
+    rows = frame_to_rows(_normalize_frame(df))
+
+    assert [row["invoice_amount"] for row in rows] == [
+        1200.5, None, None, 12.0, None, -0.5,
+    ]
+    assert [row["days_overdue"] for row in rows] == [12, -3, None, None, 7, 1000]
+    assert [row["currency"] for row in rows] == [
+        "eur", "USD", "USD", "USD", "USD", "gbp",
+    ]
+    assert [row["relationship_tag"] for row in rows] == [
+        "vip", "risky", None, None, "new", "recurring",
+    ]
+    assert [row["notes"] for row in rows] == ["hi", "", "", "x", "", "y"]
+    assert all(row["client_name"] is None for row in rows)
+    assert all(type(row["days_overdue"]) in {int, type(None)} for row in rows)
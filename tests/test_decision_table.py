@@ -0,0 +1,81 @@
+import itertools
+
+import numpy as np
+import pytest
+from src.agents.decision_agent import decide, decision_table
+from src.config import settings
+from src.state.batch import (
+    NO_FOLLOWUP,
+    RELATIONSHIP_TAGS,
+    RISK_LEVELS,
+    TIMINGS,
+    TONES,
+)
+
+FLAGS = [False, True]
+
+
+def _assert_table_matches_decide() -> None:
+    table = decision_table()
+    timing_rules = settings.FOLLOWUP_TIMING_RULES
+    top = max(timing_rules.values()) + 5
+    cases = list(
+        itertools.product(
+            range(0, top),
+            RELATIONSHIP_TAGS,
+            (None, *RISK_LEVELS),
+            (None, *range(0, top)),
+            FLAGS,
+            FLAGS,
+        )
+    )
+    for days, tag, risk, since, soften, no_followup in cases:
+        expected = decide(days, tag, risk, since, soften, no_followup)
+        assert table.lookup(days, tag, risk, since, soften, no_followup) == expected
+
+    days, tags, risks, since, soften, no_followup = map(list, zip(*cases))
+    with_context = [risk is not None for risk in risks]
+    index = table.index_batch(
+        days_overdue=np.array(days, dtype=np.int64)[with_context],
+        relationship_code=np.array(
+            [RELATIONSHIP_TAGS.index(tag) for tag in tags], dtype=np.int8
+        )[with_context],
+        risk_code=np.array(
+            [RISK_LEVELS.index(risk) if risk else 0 for risk in risks], dtype=np.int8
+        )[with_context],
+        days_since_followup=np.array(
+            [NO_FOLLOWUP if value is None else value for value in since],
+            dtype=np.int64,
+        )[with_context],
+        soften=np.array(soften)[with_context],
+        no_followup=np.array(no_followup)[with_context],
+    )
+    looked_up = zip(
+        table.followup_required[index].tolist(),
+        [TIMINGS[code] for code in table.timing_code[index]],
+        [TONES[code] for code in table.tone_code[index]],
+        [list(table.rule_sets[code]) for code in table.rules_code[index]],
+    )
+    expected = [decide(*case) for case, keep in zip(cases, with_context) if keep]
+    assert list(looked_up) == expected
+
+
+def test_decision_table_matches_branching_decide() -> None:
+    _assert_table_matches_decide()
+
+
+@pytest.mark.parametrize(
+    "overrides",
+    [
+        {"urgent_days_overdue": 10, "standard_days_overdue": 10},
+        {"standard_days_overdue": 1, "min_days_between_followups": 9},
+        {"min_days_between_followups": 12, "wait_short_days": 0},
+    ],
+)
+def test_decision_table_recompiles_for_new_settings(monkeypatch, overrides) -> None:
+    monkeypatch.setattr(
+        settings,
+        "FOLLOWUP_TIMING_RULES",
+        {**settings.FOLLOWUP_TIMING_RULES, **overrides},
+    )
+    _assert_table_matches_decide()
@@ -0,0 +1,115 @@
+import asyncio
+import time
+from datetime import date
+
+from src.agents import message_agent
+from src.agents.decision_agent import run_decision_agent
+from src.config import settings
+from src.io.draft_cache import DraftCache, draft_key
+from src.state import FollowupMessage, InvoiceRow
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _message(subject: str) -> FollowupMessage:
+    return FollowupMessage(subject=subject, body="Hello", reasoning="test")
+
+
+def test_draft_cache_ttl_and_lru_eviction(tmp_path) -> None:
+    clock = FakeClock()
+    path = tmp_path / "drafts.sqlite"
+    with DraftCache(str(path), ttl_seconds=100, max_entries=2, clock=clock) as cache:
+        cache.put("a", _message("A"))
+        cache.put("b", _message("B"))
+        clock.now += 10
+        assert cache.get("a") == _message("A")
+        cache.put("c", _message("C"))
+        assert cache.get("missing") is None
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    # reopening prunes to the two most recently used entries
+    with DraftCache(str(path), ttl_seconds=100, max_entries=2, clock=clock) as cache:
+        assert cache.count() == 2
+        assert cache.get("b") is None
+        assert cache.get("a") == _message("A")
+        clock.now += 200
+        assert cache.get("c") is None
+
+
+def test_draft_key_covers_model_and_prompts(monkeypatch) -> None:
+    key = draft_key('{"invoice": 1}')
+    assert draft_key('{"invoice": 1}') == key
+    assert draft_key('{"invoice": 2}') != key
+    monkeypatch.setattr(settings, "LLM_MESSAGE_MODEL", "other-model")
+    assert draft_key('{"invoice": 1}') != key
+
+
+def test_run_message_agent_reuses_cached_draft(tmp_path, monkeypatch) -> None:
+    calls = []
+
+    def generate(input_json: str) -> FollowupMessage:
+        calls.append(input_json)
+        return _message("Drafted")
+
+    monkeypatch.setattr(message_agent, "_generate_message", generate)
+    invoice = InvoiceRow(
+        client_name="Acme Co",
+        invoice_id="INV-100",
+        invoice_amount=2500.0,
+        invoice_issue_date=date(2025, 1, 1),
+        days_overdue=20,
+        relationship_tag="recurring",
+    )
+    state = run_decision_agent({"invoice_data": invoice}, today=date(2025, 3, 1))
+
+    with DraftCache(str(tmp_path / "drafts.sqlite")) as cache:
+        first = message_agent.run_message_agent(state, cache=cache)
+        second = message_agent.run_message_agent(state, cache=cache)
+
+    assert first["message"] == second["message"] == _message("Drafted")
+    assert len(calls) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_async_agent_does_not_block_the_loop_on_cache_io(tmp_path) -> None:
+    class SlowCache(DraftCache):
+        def get(self, key):
+            time.sleep(0.05)
+            return super().get(key)
+
+    states = []
+    for index in range(5):
+        invoice = InvoiceRow(
+            client_name="Acme Co",
+            invoice_id=f"INV-{index}",
+            invoice_amount=2500.0,
+            invoice_issue_date=date(2025, 1, 1),
+            days_overdue=20,
+            relationship_tag="recurring",
+        )
+        states.append(
+            run_decision_agent({"invoice_data": invoice}, today=date(2025, 3, 1))
+        )
+
+    async def draft_all(cache):
+        return await asyncio.gather(
+            *(message_agent.arun_message_agent(state, cache=cache) for state in states)
+        )
+
+    with SlowCache(str(tmp_path / "drafts.sqlite")) as cache:
+        for state in states:
+            key = draft_key(message_agent.build_message_input(state))
+            cache.put(key, _message("A"))
+        started = time.perf_counter()
+        results = asyncio.run(draft_all(cache))
+        elapsed = time.perf_counter() - started
+
+    assert [state["message"] for state in results] == [_message("A")] * 5
+    # five lookups of 50 ms each overlap instead of running back to back
+    assert elapsed < 0.2
@@ -0,0 +1,82 @@
+import random
+
+from src.agents.context_agent import extract_notes_signals
+from src.config import settings
+from src.utils.keyword_matcher import KeywordMatcher, StreamingPhraseMatcher
+
+
+def _scan(text, keywords):
+    text = text.lower()
+    return [keyword for keyword in keywords if keyword in text]
+
+
+def test_keyword_matcher_matches_per_keyword_scan() -> None:
+    rng = random.Random(8)
+    categories = settings.RISK_SCORE_NOTES_KEYWORDS
+    matcher = KeywordMatcher(categories)
+    vocabulary = [
+        keyword for keywords in categories.values() for keyword in keywords
+    ] + ["unpaid", "PAID", "on time", "Collections", "late", "x", "", " "]
+    for _ in range(500):
+        text = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(0, 8)))
+        expected = {name: _scan(text, keywords) for name, keywords in categories.items()}
+        assert matcher.match(text) == expected
+    assert matcher.match(None) == {name: [] for name in categories}
+
+
+def test_notes_signals_word_boundary_setting(monkeypatch) -> None:
+    notes = "Unpaid since March; paid on time before, collections pending"
+    signals = extract_notes_signals(notes)
+    assert signals.no_followup == ("paid",)
+    assert signals.high == ("collection",)
+    assert signals.low == ("paid on time",)
+
+    monkeypatch.setattr(settings, "RISK_SCORE_NOTES_WORD_BOUNDARY", True)
+    signals = extract_notes_signals(notes)
+    assert signals.no_followup == ("paid",)
+    assert signals.high == ()
+    assert signals.low == ("paid on time",)
+    assert extract_notes_signals("still unpaid").no_followup == ()
+
+
+def test_word_boundary_keeps_keywords_containing_a_partial_word() -> None:
+    matcher = KeywordMatcher(
+        {"no_followup": ["paid"], "high": ["unpaid", "collateral"], "low": ["late"]},
+        word_boundary=True,
+    )
+    assert matcher.match("still unpaid") == {
+        "no_followup": [],
+        "high": ["unpaid"],
+        "low": [],
+    }
+    assert matcher.match("collateral is late") == {
+        "no_followup": [],
+        "high": ["collateral"],
+        "low": ["late"],
+    }
+    assert matcher.match("collateral pending")["high"] == ["collateral"]
+
+
+def test_streaming_matcher_finds_phrases_split_across_pieces() -> None:
+    rng = random.Random(20)
+    categories = {
+        "FORBIDDEN_PHRASE": settings.CONTROL_FORBIDDEN_PHRASES,
+        "UNSUPPORTED_CLAIM": settings.CONTROL_UNSUPPORTED_CLAIMS,
+    }
+    phrases = [phrase for items in categories.values() for phrase in items]
+    words = ["please", "pay", "Invoice", "the", "late", "legal", "court"]
+    for _ in range(300):
+        text = " ".join(rng.choice(words + phrases[:3]) for _ in range(12))
+        matcher = StreamingPhraseMatcher(categories)
+        hit = None
+        position = 0
+        while position < len(text) and hit is None:
+            size = rng.randint(1, 6)
+            hit = matcher.feed(text[position : position + size])
+            position += size
+        expected = [phrase for phrase in phrases if phrase in text.lower()]
+        assert (hit is not None) == bool(expected)
+        if hit is not None:
+            assert hit[1] in expected
+            # nothing past the piece that completed the phrase was needed
+            assert hit[1] not in text[: position - size].lower()
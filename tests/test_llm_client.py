@@ -0,0 +1,307 @@
+import asyncio
+import json
+import re
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from src.agents.message_agent import _generate_message, generation_stats
+from src.config import settings
+from src.graph import ainvoke_in_order, build_workflow
+from src.state import InvoiceRow
+from src.utils.llm_client import aclose_llm_clients, close_llm_clients, get_chat_model
+
+MESSAGE = {"subject": "Invoice INV-1", "body": "Hello", "reasoning": "test"}
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self) -> None:
+        request = self.rfile.read(int(self.headers["Content-Length"])).decode()
+        server = self.server
+        with server.lock:
+            server.connections.add(self.client_address)
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            rate_limited = server.rate_limit_next > 0
+            server.rate_limit_next -= 1
+            failing = server.fail_next > 0
+            server.fail_next -= 1
+            server.bodies.append(json.loads(request))
+        try:
+            if rate_limited:
+                self._send(429, b"{}", {"Retry-After": "0.2"})
+                return
+            if failing:
+                error = {"error": {"message": "upstream failure"}}
+                self._send(500, json.dumps(error).encode())
+                return
+            if json.loads(request).get("stream"):
+                self._stream(server.streams.pop(0))
+                return
+            if server.reject_response_format and "response_format" in request:
+                error = {
+                    "error": {
+                        "message": "This model does not support this parameter",
+                        "param": "response_format",
+                    }
+                }
+                self._send(400, json.dumps(error).encode())
+                return
+            time.sleep(server.delay)
+            match = re.search(r"INV-\d+", request)
+            message = dict(MESSAGE, subject=match.group(0)) if match else MESSAGE
+            self._send(200, self._completion(message))
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _stream(self, content: str) -> None:
+        # server-sent events, eight characters per chunk
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        pieces = [content[i : i + 8] for i in range(0, len(content), 8)]
+        events = [{"content": piece} for piece in pieces] + [None]
+        try:
+            for delta in events:
+                chunk = {
+                    "id": "chatcmpl-1",
+                    "object": "chat.completion.chunk",
+                    "created": 0,
+                    "model": "stand-in",
+                    "choices": [
+                        {
+                            "index": 0,
+                            "delta": delta or {},
+                            "finish_reason": None if delta else "stop",
+                        }
+                    ],
+                }
+                self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+                time.sleep(self.server.delay)
+            self._write_chunk(b"data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+            self.server.streams_completed += 1
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send(self, status: int, body: bytes, headers: dict = {}) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _completion(self, message: dict) -> bytes:
+        return json.dumps(
+            {
+                "id": "chatcmpl-1",
+                "object": "chat.completion",
+                "created": 0,
+                "model": "stand-in",
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {
+                            "role": "assistant",
+                            "content": json.dumps(message),
+                        },
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": 1,
+                    "completion_tokens": 1,
+                    "total_tokens": 2,
+                },
+            }
+        ).encode()
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def stand_in_server(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StandInHandler)
+    server.lock = threading.Lock()
+    server.connections = set()
+    server.requests = 0
+    server.in_flight = 0
+    server.max_in_flight = 0
+    server.rate_limit_next = 0
+    server.fail_next = 0
+    server.delay = 0.0
+    server.bodies = []
+    server.reject_response_format = False
+    server.streams = []
+    server.streams_completed = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(
+        settings, "LLM_BASE_URL", f"http://127.0.0.1:{server.server_port}/v1"
+    )
+    close_llm_clients()
+    yield server
+    close_llm_clients()
+    server.shutdown()
+    server.server_close()
+
+
+def test_generations_share_one_pooled_connection(stand_in_server) -> None:
+    for _ in range(3):
+        message = _generate_message(input_json="{}")
+        assert message.subject == MESSAGE["subject"]
+
+    assert stand_in_server.requests == 3
+    assert len(stand_in_server.connections) == 1
+    assert get_chat_model() is get_chat_model()
+
+
+def test_structured_output_with_text_fallback(stand_in_server) -> None:
+    generation_stats.reset()
+    assert _generate_message(input_json="{}").subject == MESSAGE["subject"]
+    response_format = stand_in_server.bodies[0]["response_format"]
+    assert response_format["type"] == "json_schema"
+    assert generation_stats.structured == 1
+
+    close_llm_clients()
+    stand_in_server.reject_response_format = True
+    for _ in range(2):
+        assert _generate_message(input_json="{}").subject == MESSAGE["subject"]
+    # rejected once, then plain requests only
+    assert ["response_format" in body for body in stand_in_server.bodies] == [
+        True,
+        True,
+        False,
+        False,
+    ]
+    assert generation_stats.parsed_from_text == 2
+    assert generation_stats.parse_failures == generation_stats.retries == 0
+
+
+def test_pool_settings_change_builds_new_client(stand_in_server, monkeypatch) -> None:
+    first = get_chat_model()
+    monkeypatch.setattr(settings, "LLM_HTTP_READ_TIMEOUT_SECONDS", 5)
+    second = get_chat_model()
+    assert second is not first
+    assert second.http_client is not first.http_client
+    assert second.http_client.timeout.read == 5
+
+
+def test_concurrent_drafts_keep_input_order_and_honour_retry_after(
+    stand_in_server, monkeypatch
+) -> None:
+    monkeypatch.setattr(settings, "LLM_TOKENS_PER_MINUTE", None)
+    stand_in_server.delay = 0.05
+    stand_in_server.rate_limit_next = 1
+    invoices = [
+        InvoiceRow(
+            client_name=f"Client {index}",
+            invoice_id=f"INV-{index}",
+            invoice_amount=100.0 + index,
+            invoice_issue_date=date(2025, 1, 1),
+            days_overdue=20,
+            relationship_tag="recurring",
+        )
+        for index in range(16)
+    ]
+
+    async def run():
+        try:
+            return await ainvoke_in_order(build_workflow(), invoices, concurrency=6)
+        finally:
+            await aclose_llm_clients()
+
+    started = time.monotonic()
+    results = asyncio.run(run())
+    elapsed = time.monotonic() - started
+
+    assert [state["message"].subject for state in results] == [
+        invoice.invoice_id for invoice in invoices
+    ]
+    assert stand_in_server.requests == 17
+    assert 1 < stand_in_server.max_in_flight <= 6
+    assert elapsed >= 0.2
+
+
+def test_concurrent_drafts_retry_a_server_error(stand_in_server, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "LLM_MESSAGE_BACKOFF_MIN_SECONDS", 0)
+    stand_in_server.fail_next = 1
+    invoices = [
+        InvoiceRow(
+            client_name=f"Client {index}",
+            invoice_id=f"INV-{index}",
+            invoice_amount=100.0 + index,
+            invoice_issue_date=date(2025, 1, 1),
+            days_overdue=20,
+            relationship_tag="recurring",
+        )
+        for index in range(3)
+    ]
+
+    async def run():
+        try:
+            return await ainvoke_in_order(build_workflow(), invoices, concurrency=3)
+        finally:
+            await aclose_llm_clients()
+
+    generation_stats.reset()
+    results = asyncio.run(run())
+
+    assert [state["message"].subject for state in results] == [
+        invoice.invoice_id for invoice in invoices
+    ]
+    assert stand_in_server.requests == 4
+    assert generation_stats.retries == 1
+
+
+def test_streamed_drafts_abort_on_control_phrase(stand_in_server) -> None:
+    stand_in_server.delay = 0.02
+    padding = " Thank you for your business." * 10
+    bad = dict(MESSAGE, body="We will start a lawsuit." + padding)
+    good = dict(MESSAGE, body="Please arrange payment." + padding)
+    stand_in_server.streams = [json.dumps(bad), json.dumps(good)]
+    invoice = InvoiceRow(
+        client_name="Client",
+        invoice_id="INV-1",
+        invoice_amount=100.0,
+        invoice_issue_date=date(2025, 1, 1),
+        days_overdue=20,
+        relationship_tag="recurring",
+    )
+    generation_stats.reset()
+    workflow = build_workflow(stream_drafts=True)
+    result = workflow.invoke({"invoice_data": invoice})
+
+    assert result["message"].body == good["body"]
+    assert result["control_message"].passed
+    generation = result["generation"]
+    assert generation.attempts == 2
+    assert generation.aborted == ["FORBIDDEN_PHRASE:lawsuit"]
+    assert generation.first_byte_seconds is not None
+    assert generation_stats.stream_aborts == 1
+    # the aborted stream was cut off before the server finished sending it
+    time.sleep(0.2)
+    assert stand_in_server.streams_completed == 1
+
+    stand_in_server.streams = [json.dumps(bad)] * settings.LLM_MESSAGE_MAX_RETRIES
+    result = workflow.invoke({"invoice_data": invoice})
+    assert "message" not in result
+    assert result["control_message"].violations == [
+        "MESSAGE_MISSING",
+        "STREAM_ABORTED:FORBIDDEN_PHRASE:lawsuit",
+    ]
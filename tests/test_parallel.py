@@ -0,0 +1,20 @@
+from src.agents import iter_batch_states
+from src.agents.parallel import iter_deterministic_parallel, run_deterministic_batch
+from src.io.loader import load_invoice_batch
+
+SAMPLE = "data/samples/invoices_sample.csv"
+
+
+def test_process_pool_matches_serial_run_in_order() -> None:
+    batch = load_invoice_batch(SAMPLE)
+    batches = [batch, batch.take(slice(1, None)), batch.take(slice(0, 1))]
+    expected = [
+        state
+        for item in batches
+        for state in iter_batch_states(run_deterministic_batch(item))
+    ]
+    chunks = list(iter_deterministic_parallel(iter(batches), workers=2, chunk_size=3))
+    assert all(len(chunk) <= 3 for chunk in chunks)
+    states = [state for chunk in chunks for state in iter_batch_states(chunk)]
+    assert states == expected
+    assert all("control_decision" in state for state in states)
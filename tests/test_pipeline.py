@@ -0,0 +1,60 @@
+import asyncio
+import random
+
+from src.graph import build_workflow, pipeline, run_pipeline
+from src.io.loader import load_invoices
+
+SAMPLE = "data/samples/invoices_sample.csv"
+
+
+def test_pipeline_matches_workflow_in_input_order() -> None:
+    invoices = load_invoices(SAMPLE)
+    workflow = build_workflow(llm_policy="templates")
+    expected = [workflow.invoke({"invoice_data": invoice}) for invoice in invoices]
+
+    results = []
+    written = asyncio.run(
+        run_pipeline(
+            invoices, results.append, llm_policy="templates", message_workers=3
+        )
+    )
+    assert written == len(invoices)
+    assert [state["invoice_data"] for state in results] == invoices
+    for state, reference in zip(results, expected):
+        for key in ("decision", "control_decision", "message", "control_message"):
+            assert state.get(key) == reference.get(key)
+
+
+def test_pipeline_decides_ahead_of_slow_drafts_within_bounds(monkeypatch) -> None:
+    invoices = load_invoices(SAMPLE) * 20
+    drafting = {"now": 0, "max": 0}
+    loaded = []
+
+    async def slow_draft(state, **kwargs):
+        drafting["now"] += 1
+        drafting["max"] = max(drafting["max"], drafting["now"])
+        await asyncio.sleep(random.uniform(0, 0.003))
+        drafting["now"] -= 1
+        return dict(state)
+
+    def counting(items):
+        for invoice in items:
+            loaded.append(invoice)
+            yield invoice
+
+    monkeypatch.setattr(pipeline, "arun_message_agent", slow_draft)
+    monkeypatch.setattr(pipeline.settings, "PIPELINE_LOAD_CHUNK_SIZE", 5)
+    results = []
+    ahead = []
+
+    def sink(state):
+        # loaded minus written stays within the in-flight window
+        ahead.append(len(loaded) - len(results))
+        results.append(state)
+
+    asyncio.run(run_pipeline(counting(invoices), sink, message_workers=4, queue_size=2))
+    assert [state["invoice_data"] for state in results] == invoices
+    assert drafting["max"] == 4
+    # window of 2 * 4 + 4 invoices plus the loader's current and prefetched chunks
+    assert max(ahead) <= 2 * 4 + 4 + 2 * 5
+    assert len(invoices) > 2 * 4 + 4 + 2 * 5
@@ -0,0 +1,35 @@
+from src.utils.rate_limit import RateLimiter, retry_after_seconds
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_rate_limiter_spaces_requests_and_tokens() -> None:
+    clock = FakeClock()
+    limiter = RateLimiter(
+        requests_per_minute=60, tokens_per_minute=600, burst_seconds=1.0, clock=clock
+    )
+    # one request per second with a one-second burst
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == 1.0
+    assert limiter.reserve() == 2.0
+
+    clock.now += 60
+    # 600 tokens per minute is 10 per second, so 50 tokens cost 5 seconds
+    assert limiter.reserve(tokens=50) == 4.0
+
+    limiter.pause(30)
+    assert limiter._resume_at == clock.now + 30
+
+
+def test_retry_after_seconds_parses_header_variants() -> None:
+    assert retry_after_seconds({"retry-after-ms": "1500"}) == 1.5
+    assert retry_after_seconds({"retry-after": "3"}) == 3.0
+    assert retry_after_seconds({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}) == 0
+    assert retry_after_seconds({"retry-after": "soon"}) is None
+    assert retry_after_seconds({}) is None
@@ -0,0 +1,77 @@
+import itertools
+import random
+from datetime import date
+
+import numpy as np
+from src.agents.context_agent import compute_risk_level
+from src.agents.risk_scoring import score_risk_batch
+from src.config import settings
+from src.state import InvoiceRow, NotesSignals
+from src.state.batch import RELATIONSHIP_TAGS, RISK_LEVELS
+
+
+def _boundary_values(rules, spread):
+    values = {0, spread}
+    for max_value, _ in rules:
+        values.update({max_value - 1, max_value - 0.01, max_value, max_value + 0.01})
+        values.add(max_value + 1)
+    return sorted(value for value in values if value >= 0)
+
+
+def _assert_matches_scalar(days_values, amount_values) -> None:
+    cases = list(
+        itertools.product(
+            days_values, amount_values, RELATIONSHIP_TAGS, [False, True], [False, True]
+        )
+    )
+    days = np.array([int(case[0]) for case in cases], dtype=np.int64)
+    amounts = np.array([float(case[1]) for case in cases], dtype=np.float64)
+    codes = np.array([RELATIONSHIP_TAGS.index(case[2]) for case in cases], np.int8)
+    high = np.array([case[3] for case in cases])
+    low = np.array([case[4] for case in cases])
+
+    risk_code, risk_score = score_risk_batch(days, amounts, codes, high, low)
+
+    for index, (day, amount, tag, has_high, has_low) in enumerate(cases):
+        invoice = InvoiceRow(
+            client_name="Acme Co",
+            invoice_id="INV-500",
+            invoice_amount=float(amount),
+            invoice_issue_date=date(2025, 1, 1),
+            days_overdue=int(day),
+            relationship_tag=tag,
+        )
+        signals = NotesSignals(
+            high=["overdue"] if has_high else [],
+            low=["good standing"] if has_low else [],
+            soften=[],
+            no_followup=[],
+        )
+        expected = compute_risk_level(invoice, signals)
+        assert (RISK_LEVELS[risk_code[index]], int(risk_score[index])) == expected
+
+
+def test_batch_risk_scoring_matches_compute_risk_level() -> None:
+    _assert_matches_scalar(
+        _boundary_values(settings.RISK_SCORE_DAYS_OVERDUE, 20_000),
+        _boundary_values(settings.RISK_SCORE_AMOUNT, 2_000_000),
+    )
+
+
+def test_batch_risk_scoring_matches_random_and_reordered_settings(
+    monkeypatch,
+) -> None:
+    rng = random.Random(3)
+    monkeypatch.setattr(
+        settings,
+        "RISK_SCORE_DAYS_OVERDUE",
+        [(30, 2), (7, 0), (60, 1), (45, 5), (90, 4)],
+    )
+    monkeypatch.setattr(settings, "RISK_SCORE_AMOUNT", [(1_000, 1), (1_000, 3)])
+    monkeypatch.setattr(
+        settings, "RISK_LEVEL_THRESHOLDS", {"low_max": 1, "medium_max": 4}
+    )
+    _assert_matches_scalar(
+        sorted({rng.randint(0, 150) for _ in range(40)} | {7, 30, 45, 60, 90}),
+        sorted({round(rng.uniform(0, 3_000), 2) for _ in range(15)} | {1_000}),
+    )
@@ -0,0 +1,75 @@
+from datetime import date
+from itertools import product
+
+import pytest
+from src.agents import message_agent
+from src.agents.control_agent import run_control_agent
+from src.agents.templates import TEMPLATE_BODIES, render_template_message
+from src.graph import build_workflow
+from src.state import FollowupDecision, FollowupMessage, InvoiceRow
+
+
+def build_invoice(**overrides) -> InvoiceRow:
+    base = dict(
+        client_name="Acme Co",
+        invoice_id="INV-500",
+        invoice_amount=12500.5,
+        currency="USD",
+        invoice_issue_date=date(2025, 1, 1),
+        days_overdue=10,
+        last_followup_date=None,
+        relationship_tag="recurring",
+        notes="",
+    )
+    base.update(overrides)
+    return InvoiceRow(**base)
+
+
+@pytest.mark.parametrize(
+    "key, relationship",
+    list(product(TEMPLATE_BODIES, ["vip", "recurring", "new", "risky"])),
+)
+def test_templates_pass_message_control(key, relationship) -> None:
+    tone, timing = key
+    invoice = build_invoice(relationship_tag=relationship)
+    decision = FollowupDecision(
+        followup_required=True,
+        recommended_timing=timing,
+        tone=tone,
+        explanation="test",
+    )
+    state = {"invoice_data": invoice, "decision": decision}
+    message = render_template_message(state)
+    if message is None:
+        return
+    assert "12,500.50 USD" in message.body
+    state["message"] = message
+    control = run_control_agent(state, stage="message")["control_message"]
+    assert control.passed, control.violations
+
+
+def test_llm_policies_route_between_templates_and_model(monkeypatch) -> None:
+    calls = []
+
+    def generate(input_json: str) -> FollowupMessage:
+        calls.append(input_json)
+        return FollowupMessage(subject="Model", body="Model body", reasoning="llm")
+
+    monkeypatch.setattr(message_agent, "_generate_message", generate)
+    plain = build_invoice()
+    with_notes = build_invoice(invoice_id="INV-501", notes="apologized for the delay")
+
+    hybrid = build_workflow(llm_policy="hybrid")
+    templated = hybrid.invoke({"invoice_data": plain})
+    assert templated["message"].reasoning.startswith("Template")
+    assert templated["control_message"].passed
+    assert not calls
+    drafted = hybrid.invoke({"invoice_data": with_notes})
+    assert drafted["message"].subject == "Model"
+    assert len(calls) == 1
+
+    templates_only = build_workflow(llm_policy="templates")
+    result = templates_only.invoke({"invoice_data": with_notes})
+    assert "message" not in result
+    assert not result["control_message"].passed
+    assert len(calls) == 1
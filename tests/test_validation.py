@@ -0,0 +1,151 @@
+import json
+from datetime import date
+
+import pandas as pd
+from src.io.loader import load_invoice_batch, load_invoices
+from src.io.quarantine import QuarantineWriter
+from src.state import InvoiceRow
+from src.utils.validation import (
+    InvoiceValidationError,
+    ValidationErrorInfo,
+    invoices_from_rows,
+    validate_rows,
+)
+
+
+def build_row(**overrides) -> dict:
+    base = dict(
+        client_name="Acme Co",
+        invoice_id="INV-400",
+        invoice_amount=1200.0,
+        currency="USD",
+        invoice_issue_date="2025-01-01",
+        days_overdue=12,
+        last_followup_date=None,
+        relationship_tag="vip",
+        notes="",
+    )
+    base.update(overrides)
+    return base
+
+
+def test_validate_rows_reports_only_rows_that_break_the_schema() -> None:
+    rows = [
+        build_row(),
+        build_row(invoice_amount=-5.0),
+        build_row(days_overdue=3.0),
+        build_row(relationship_tag="partner", client_name=""),
+        build_row(days_overdue=None),
+    ]
+    result = validate_rows(rows, start=10)
+
+    assert result.valid_rows == [rows[0], rows[2]]
+    assert [(error.row_index, error.field_path) for error in result.errors] == [
+        (11, "invoice_amount"),
+        (13, "client_name"),
+        (13, "relationship_tag"),
+        (14, "days_overdue"),
+    ]
+
+
+def test_validate_rows_does_not_depend_on_working_directory(
+    tmp_path, monkeypatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    result = validate_rows([build_row(), build_row(invoice_id="")])
+
+    assert len(result.valid_rows) == 1
+    assert result.errors[0].row_index == 2
+
+
+def test_load_invoices_quarantines_invalid_rows(tmp_path) -> None:
+    rows = [
+        build_row(invoice_id="INV-1"),
+        build_row(invoice_id="INV-2", relationship_tag="partner"),
+        build_row(invoice_id="INV-3"),
+    ]
+    path = tmp_path / "invoices.csv"
+    pd.DataFrame(rows).to_csv(path, index=False)
+    quarantine_path = tmp_path / "rejected.jsonl"
+
+    with QuarantineWriter(str(quarantine_path), max_summary_errors=1) as writer:
+        invoices = load_invoices(str(path), on_invalid=writer)
+
+    assert [invoice.invoice_id for invoice in invoices] == ["INV-1", "INV-3"]
+    assert writer.row_count == 1
+    records = [json.loads(line) for line in quarantine_path.read_text().splitlines()]
+    assert records[0]["row_index"] == 2
+    assert records[0]["row"]["invoice_id"] == "INV-2"
+    assert records[0]["errors"][0]["field_path"] == "relationship_tag"
+
+
+def test_row_and_column_loaders_accept_the_same_rows(tmp_path) -> None:
+    rows = [
+        build_row(invoice_id="INV-1", invoice_amount="1,200.50"),
+        build_row(invoice_id="INV-2", days_overdue="-3"),
+        build_row(invoice_id="INV-3", invoice_issue_date="not a date"),
+        build_row(invoice_id=" ", relationship_tag="VIP"),
+        build_row(invoice_id="INV-5", relationship_tag=" Risky ", currency=""),
+        build_row(invoice_id="INV-6", last_followup_date="2025-02-03"),
+    ]
+    path = tmp_path / "invoices.csv"
+    pd.DataFrame(rows).to_csv(path, index=False)
+
+    per_row, columns = [], []
+    invoices = load_invoices(str(path), on_invalid=per_row.append)
+    batch = load_invoice_batch(str(path), on_invalid=columns.append)
+
+    assert [item.row_index for item in per_row] == [2, 3, 4]
+    assert [item.errors for item in per_row] == [item.errors for item in columns]
+    assert invoices == [batch.invoice(index) for index in range(len(batch))]
+    assert invoices[0].invoice_amount == 1200.5
+    assert invoices[2].last_followup_date == date(2025, 2, 3)
+
+
+def test_validate_rows_checks_date_format() -> None:
+    rows = [build_row(), build_row(invoice_issue_date="2025-02-30")]
+    result = validate_rows(rows)
+    invoices, rejected = invoices_from_rows(result.valid_rows), result.rejected_rows
+
+    assert invoices[0].invoice_issue_date == date(2025, 1, 1)
+    assert invoices == [InvoiceRow(**rows[0])]
+    assert [item.row_index for item in rejected] == [2]
+    assert "is not a 'date'" in rejected[0].errors[0].message
+
+
+def test_quarantine_removes_rejects_of_an_earlier_run(tmp_path) -> None:
+    path = tmp_path / "invoices.csv"
+    pd.DataFrame([build_row()]).to_csv(path, index=False)
+    quarantine_path = tmp_path / "rejected.jsonl"
+    quarantine_path.write_text('{"row_index": 2}\n')
+
+    with QuarantineWriter(str(quarantine_path)) as writer:
+        load_invoices(str(path), on_invalid=writer)
+
+    assert writer.row_count == 0
+    assert not quarantine_path.exists()
+
+
+def test_invoice_validation_error_message_is_capped() -> None:
+    errors = [
+        ValidationErrorInfo(
+            row_index=index, field_path="days_overdue", message="bad", value=None
+        )
+        for index in range(1, 51)
+    ]
+    message = str(InvoiceValidationError(errors))
+
+    assert message.count("-> days_overdue") == InvoiceValidationError.max_listed_errors
+    assert message.endswith("... and 30 more errors")
+
+
+def test_valid_rows_build_models_and_rejects_are_reported() -> None:
+    rows = [build_row(), build_row(days_overdue=-2), build_row(invoice_id="")]
+    result = validate_rows(rows, start=5)
+    invoices, rejected = invoices_from_rows(result.valid_rows), result.rejected_rows
+
+    assert [invoice.invoice_id for invoice in invoices] == ["INV-400"]
+    assert [item.row_index for item in rejected] == [6, 7]
+    assert rejected[0].errors[0].field_path == "days_overdue"
+    assert "less than the minimum" in rejected[0].errors[0].message
+    assert rejected[1].row is rows[2]
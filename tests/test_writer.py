@@ -0,0 +1,153 @@
+import csv
+import json
+
+import pytest
+from typer.testing import CliRunner
+from src.agents import message_agent
+from src.config import settings
+from src.graph import build_workflow
+from src.io.loader import load_invoices
+from src.io.writer import (
+    RECORD_COLUMNS,
+    MarkdownReportWriter,
+    ParquetReportWriter,
+    open_report_writer,
+    write_markdown_report,
+)
+from src.main import app
+
+SAMPLE = "data/samples/invoices_sample.csv"
+
+
+def _states():
+    workflow = build_workflow(llm_policy="templates")
+    return [
+        workflow.invoke({"invoice_data": invoice})
+        for invoice in load_invoices(SAMPLE)
+    ]
+
+
+def test_summary_placements_hold_the_same_sections(tmp_path) -> None:
+    states = _states()
+    write_markdown_report(states, str(tmp_path / "top.md"))
+    write_markdown_report(states, str(tmp_path / "end.md"), summary="end")
+    write_markdown_report(states, str(tmp_path / "index.md"), summary="index")
+
+    top = (tmp_path / "top.md").read_text(encoding="utf-8")
+    end = (tmp_path / "end.md").read_text(encoding="utf-8")
+    sections = (tmp_path / "index.md").read_text(encoding="utf-8")
+    index = (tmp_path / "index.index.md").read_text(encoding="utf-8")
+
+    title, _, rest = top.partition("## Summary")
+    table = "## Summary" + rest.partition("\n## Invoice 1:")[0]
+    assert title == "# Follow-up Recommendations\n\n"
+    assert top.count("## Invoice ") == len(states)
+    assert top == title + table + sections.removeprefix(title.rstrip() + "\n")
+    assert end == sections + "\n" + table
+    assert index == title + table
+
+def test_sections_are_on_disk_before_close(tmp_path) -> None:
+    state = _states()[0]
+    path = tmp_path / "report.md"
+    with MarkdownReportWriter(str(path), summary="end") as writer:
+        writer.write(state)
+        assert state["invoice_data"].invoice_id in path.read_text(encoding="utf-8")
+        assert "## Summary" not in path.read_text(encoding="utf-8")
+    assert writer.count == 1
+    assert "## Summary" in path.read_text(encoding="utf-8")
+
+
+def test_flat_formats_hold_the_same_records(tmp_path) -> None:
+    states = _states()
+    for format in ("jsonl", "csv"):
+        with open_report_writer(str(tmp_path / f"report.{format}"), format) as writer:
+            for state in states:
+                writer.write(state)
+
+    lines = (tmp_path / "report.jsonl").read_text(encoding="utf-8").splitlines()
+    records = [json.loads(line) for line in lines]
+    with (tmp_path / "report.csv").open(encoding="utf-8", newline="") as handle:
+        rows = list(csv.DictReader(handle))
+    assert [record["invoice_id"] for record in records] == [
+        state["invoice_data"].invoice_id for state in states
+    ]
+    assert list(rows[0]) == list(RECORD_COLUMNS)
+    for record, row in zip(records, rows):
+        assert set(record) == set(RECORD_COLUMNS)
+        assert row["message_control_violations"] == "; ".join(
+            record["message_control_violations"]
+        )
+        assert (record["message_subject"] is None) == (
+            record["message_withheld_reason"] is not None
+        )
+    assert any(record["message_control_status"] == "fail" for record in records)
+
+
+def test_parquet_writes_row_groups_incrementally(tmp_path) -> None:
+    pq = pytest.importorskip("pyarrow.parquet")
+    states = _states()
+    path = tmp_path / "report.parquet"
+    with ParquetReportWriter(str(path), row_group_size=2) as writer:
+        for state in states:
+            writer.write(state)
+
+    parquet = pq.ParquetFile(str(path))
+    assert parquet.metadata.num_rows == len(states)
+    assert parquet.metadata.num_row_groups == -(-len(states) // 2)
+    table = parquet.read()
+    assert table.column_names == list(RECORD_COLUMNS)
+    assert table.column("invoice_issue_date").to_pylist() == [
+        state["invoice_data"].invoice_issue_date for state in states
+    ]
+
+
+
+def test_run_writes_each_section_before_the_next_draft(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "CHECKPOINT_PATH", str(tmp_path / "runs.sqlite"))
+    report = tmp_path / "report.md"
+    invoice_ids = [invoice.invoice_id for invoice in load_invoices(SAMPLE)]
+    render = message_agent.render_template_message
+    on_disk = []
+
+    def recording_render(state):
+        text = report.read_text(encoding="utf-8")
+        position = invoice_ids.index(state["invoice_data"].invoice_id)
+        on_disk.append((position, text.count("\n## Invoice ")))
+        return render(state)
+
+    monkeypatch.setattr(message_agent, "render_template_message", recording_render)
+    args = ["run", SAMPLE, "--llm-policy", "templates", "--no-cache"]
+    args += ["--summary", "end", "--output", str(report)]
+    for extra in ([], ["--checkpoint"]):
+        on_disk.clear()
+        result = CliRunner().invoke(app, args + extra)
+        assert result.exit_code == 0, result.output
+        assert len(on_disk) > 1
+        assert all(sections == position for position, sections in on_disk)
+
+
+def test_parquet_without_pyarrow_is_a_usage_error(tmp_path, monkeypatch) -> None:
+    import importlib.util
+
+    find_spec = importlib.util.find_spec
+    monkeypatch.setattr(
+        importlib.util,
+        "find_spec",
+        lambda name, *args: None if name == "pyarrow" else find_spec(name, *args),
+    )
+    output = tmp_path / "report.parquet"
+    args = ["run", SAMPLE, "--dry-run", "--format", "parquet"]
+    result = CliRunner().invoke(app, args + ["--output", str(output)])
+    assert result.exit_code == 2
+    assert "requires pyarrow" in result.output
+    assert not output.exists()
+
+
+def test_console_summary_lists_a_sample_of_rows(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "CONSOLE_SUMMARY_ROWS", 2)
+    output = tmp_path / "report.jsonl"
+    args = ["run", SAMPLE, "--dry-run", "--format", "jsonl"]
+    result = CliRunner().invoke(app, args + ["--output", str(output)])
+    assert result.exit_code == 0, result.output
+    assert "… and 4 more" in result.output
+    assert len(output.read_text(encoding="utf-8").splitlines()) == 6